@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Optional
 from functools import lru_cache
 
 class Settings(BaseSettings):
@@ -12,9 +12,39 @@ class Settings(BaseSettings):
     
     # Security
     SECRET_KEY: str
-    ALGORITHM: str = "HS256"
+    ALGORITHM: str = "HS256"  # HS256/HS384/HS512, or EdDSA with the native codec
+    JWT_CODEC: str = "jose"  # jose, native (stdlib HMAC / Ed25519)
+    JWT_PRIVATE_KEY: str = ""  # PEM, asymmetric algorithms only
+    JWT_PUBLIC_KEY: str = ""  # PEM, derived from the private key if empty
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    AUTH_MODE: str = "database"  # database, stateless (role checks answered from token claims)
+    AUTH_TOKEN_CLAIMS: bool = True  # Embed is_active/is_verified/is_superuser in access tokens
+    
+    # Server (python -m app.serve)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: Optional[int] = None  # Defaults to the number of available CPUs
+    SERVER_RELOAD: bool = False  # Single auto-reloading process, for development only
+    SERVER_MAX_REQUESTS: int = 10000  # Requests before a worker is replaced (0 disables)
+    SERVER_MAX_REQUESTS_JITTER: int = 1000  # Random extra requests, so workers recycle one at a time
+    SERVER_WORKER_TIMEOUT: int = 30  # Seconds a silent worker lives before being killed
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # Seconds a recycled worker gets to finish requests
+    SERVER_KEEPALIVE: int = 5
+    SERVER_FORWARDED_ALLOW_IPS: List[str] = ["127.0.0.1"]  # Proxies trusted for X-Forwarded-*
+    
+    # JSON responses
+    JSON_ENCODER: str = "orjson"  # orjson (falls back to pydantic if not installed), pydantic, json (stdlib)
+    
+    # Response compression
+    COMPRESSION_ENCODINGS: List[str] = ["br", "gzip"]  # Server preference; br needs brotli installed; [] disables
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # Smaller bodies are sent uncompressed
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 0-11; higher qualities are too slow for dynamic responses
+    COMPRESSION_EXCLUDED_TYPES: List[str] = [  # Content type prefixes that are already compressed
+        "image/", "video/", "audio/", "font/woff",
+        "application/zip", "application/gzip", "application/x-gzip", "application/pdf",
+    ]
     
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:5173", "http://localhost:3000"]
@@ -22,6 +52,21 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
     DATABASE_TYPE: str = "postgresql"  # postgresql, mysql, sqlite, mongodb
+    DATABASE_REPLICA_URLS: List[str] = []  # Read replicas, same format as DATABASE_URL
+    REPLICA_EJECT_SECONDS: float = 30.0  # How long a failing replica is skipped
+    
+    # SQL connection pool (unset values use per-dialect defaults)
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a connection before failing
+    DB_POOL_RECYCLE: Optional[int] = None  # Seconds; -1 disables
+    DB_POOL_PRE_PING: Optional[bool] = None
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements per connection; 0 for pgbouncer
+    
+    # Bulk user endpoints (superuser)
+    USER_EXPORT_FETCH_SIZE: int = 1000  # Rows fetched per server-side cursor round trip
+    USER_IMPORT_CHUNK_SIZE: int = 500  # Rows checked, hashed and inserted together
+    USER_BATCH_MAX_IDS: int = 100  # Ids accepted by one batch lookup
     
     # Email Configuration
     SMTP_HOST: str = "smtp.gmail.com"
@@ -30,6 +75,25 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str = ""
     SMTP_FROM_EMAIL: str = ""
     SMTP_FROM_NAME: str = "FastAPI Backend"
+    SMTP_USE_TLS: bool = True
+    SMTP_REQUIRE_AUTH: bool = True  # Set False for a local SMTP server without credentials
+    SMTP_TIMEOUT_SECONDS: float = 30.0
+    SMTP_POOL_SIZE: int = 2  # Persistent connections per worker
+    SMTP_POOL_IDLE_SECONDS: float = 60.0  # Close connections idle for longer
+    SMTP_POOL_HEALTHCHECK_SECONDS: float = 10.0  # NOOP before reusing connections idle for longer
+    EMAIL_TEMPLATE_CACHE_DIR: str = ".jinja_cache"  # Compiled template bytecode; empty disables
+    
+    # Email outbox dispatcher
+    EMAIL_DISPATCH_CONCURRENCY: int = 4
+    EMAIL_DISPATCH_BATCH_SIZE: int = 50
+    EMAIL_DISPATCH_POLL_SECONDS: float = 5.0
+    EMAIL_MAX_ATTEMPTS: int = 5  # Then the message is dead-lettered
+    EMAIL_RETRY_BACKOFF_SECONDS: float = 30.0  # Doubled after every failed attempt
+    EMAIL_RETRY_BACKOFF_MAX_SECONDS: float = 3600.0
+    
+    # Last login write-behind
+    LAST_LOGIN_FLUSH_SECONDS: float = 10.0  # Maximum staleness of users.last_login
+    LAST_LOGIN_MAX_PENDING: int = 5000  # Flush early once this many users are buffered
     
     # OAuth (optional)
     GOOGLE_CLIENT_ID: str = ""
@@ -40,12 +104,49 @@ class Settings(BaseSettings):
     GITHUB_CLIENT_SECRET: str = ""
     GITHUB_REDIRECT_URI: str = "http://localhost:8000/api/auth/github/callback"
     
+    # Principal cache (resolved users for authenticated requests)
+    PRINCIPAL_CACHE_SIZE: int = 10000  # 0 disables the cache
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    
+    # Verified token cache
+    TOKEN_CACHE_SIZE: int = 10000  # 0 disables the cache
+    TOKEN_CACHE_NEGATIVE_TTL_SECONDS: int = 5  # How long invalid tokens stay rejected without re-verifying
+    
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
+    # Token buckets per path prefix (longest match); other paths get RATE_LIMIT_PER_MINUTE
+    RATE_LIMITS: Dict[str, str] = {
+        "/api/auth/login": "10/minute",
+        "/api/auth/register": "5/minute",
+        "/api/auth/forgot-password": "3/minute",
+        "/api/auth/reset-password": "5/minute",
+        "/api/auth/me": "120/minute",  # Polled by clients, often answered with 304
+        "/api/auth": "30/minute",
+        "/api/users": "120/minute",
+    }
+    RATE_LIMIT_BUCKETS_PATH: str = ".ratelimit-buckets"  # Memory-mapped file shared by workers
+    RATE_LIMIT_BUCKET_SLOTS: int = 65536  # Clients tracked per host before the least recent are evicted
     
     # Password
     MIN_PASSWORD_LENGTH: int = 8
     
+    # Password hashing cost
+    PASSWORD_HASH_SCHEME: str = "bcrypt"  # bcrypt, argon2 (requires argon2-cffi)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_CALIBRATE: bool = False  # Pick the cost at startup from the target latency
+    PASSWORD_HASH_TARGET_MS: int = 250
+    
+    # Password hashing pool
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # thread, process
+    PASSWORD_HASH_WORKERS: int = 0  # 0 = number of CPUs
+    PASSWORD_HASH_QUEUE_SIZE: int = 64  # Pending hashes allowed beyond the workers
+    
+    # Metrics (Prometheus text format at /metrics)
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str = ""  # Bearer token required to scrape; empty requires a superuser token
+    METRICS_DIR: str = ".metrics"  # Snapshots shared by workers on the host; empty reports this worker only
+    METRICS_PUBLISH_SECONDS: float = 5.0  # How stale other workers' numbers may be in a scrape
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -2,30 +2,193 @@
 Database configuration and session management
 Supports both SQL (PostgreSQL, MySQL, SQLite) and MongoDB
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import declarative_base, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Dict, List, Optional
 from app.config import settings
+from app.utils.metrics import Histogram, registry
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 # SQLAlchemy Base
 Base = declarative_base()
 
+# Pool defaults per dialect, overridden by the DB_* settings
+POOL_DEFAULTS = {
+    "postgresql": {"pool_size": 10, "max_overflow": 10, "pool_recycle": 1800, "pool_pre_ping": True},
+    "mysql": {"pool_size": 10, "max_overflow": 10, "pool_recycle": 900, "pool_pre_ping": True},
+    "sqlite": {"pool_size": 5, "max_overflow": 0, "pool_recycle": -1, "pool_pre_ping": False},
+}
+
+
+class PoolStats:
+    """Checkout wait times and timeouts of the SQL connection pool"""
+    
+    def __init__(self):
+        self.wait_seconds = Histogram()
+        self.checkout_timeouts = 0
+        self.round_trips_saved = 0
+        self.commits_skipped = 0
+
+
+pool_stats = PoolStats()
+
+db_execute_seconds = registry.histogram(
+    "db_execute_seconds",
+    "Time the database driver spent executing statements, by engine and statement type",
+    labels=("engine", "statement"),
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+_STATEMENT_TYPES = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Time every statement executed through an engine (cursor execute to result)"""
+    
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = time.perf_counter()
+    
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _observe(conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip()[:6].upper()
+        db_execute_seconds.labels(name, verb if verb in _STATEMENT_TYPES else "OTHER").observe(
+            time.perf_counter() - context._metrics_start
+        )
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each checkout waited"""
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.checkout_timeouts += 1
+            raise
+        pool_stats.wait_seconds.observe(time.perf_counter() - start)
+        return connection
+
+
+def _setting_or_default(value: Any, default: Any) -> Any:
+    return default if value is None else value
+
+
+def engine_options(database_type: str, database_url: str) -> Dict[str, Any]:
+    """
+    Build create_async_engine keyword arguments for a dialect
+    
+    Args:
+        database_type: postgresql, mysql or sqlite
+        database_url: Async database URL
+        
+    Returns:
+        Engine options with pool sizing, pre-ping, recycle, timeout and,
+        for asyncpg, statement cache sizes
+    """
+    options: Dict[str, Any] = {"echo": settings.DEBUG, "future": True}
+    
+    # In-memory SQLite must keep its single shared connection
+    if database_type == "sqlite" and ":memory:" in database_url:
+        return options
+    
+    defaults = POOL_DEFAULTS[database_type]
+    options.update({
+        "poolclass": InstrumentedAsyncQueuePool,
+        "pool_size": _setting_or_default(settings.DB_POOL_SIZE, defaults["pool_size"]),
+        "max_overflow": _setting_or_default(settings.DB_MAX_OVERFLOW, defaults["max_overflow"]),
+        "pool_recycle": _setting_or_default(settings.DB_POOL_RECYCLE, defaults["pool_recycle"]),
+        "pool_pre_ping": _setting_or_default(settings.DB_POOL_PRE_PING, defaults["pool_pre_ping"]),
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    })
+    
+    if database_type == "postgresql":
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+    
+    return options
+
+
+def async_database_url(url: str, database_type: str) -> str:
+    """Convert a sync database URL to its async driver"""
+    if database_type == "postgresql":
+        return url.replace("postgresql://", "postgresql+asyncpg://")
+    elif database_type == "mysql":
+        return url.replace("mysql://", "mysql+aiomysql://")
+    return url.replace("sqlite:///", "sqlite+aiosqlite:///")
+
+
+class ReplicaPool:
+    """
+    Round-robin selection of read replica engines with health-based ejection
+    
+    A replica that fails with a connection-level error is skipped for
+    eject_seconds, then tried again on its next turn.
+    """
+    
+    def __init__(self, engines: List[AsyncEngine], eject_seconds: float):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self._ejected_until = [0.0] * len(engines)
+        self._next = 0
+        self.ejections = 0
+    
+    def choose(self) -> Optional[int]:
+        """Index of the next healthy replica, or None if none is available"""
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            index = self._next
+            self._next = (self._next + 1) % len(self.engines)
+            if self._ejected_until[index] <= now:
+                return index
+        return None
+    
+    def eject(self, index: int) -> None:
+        """Take a replica out of rotation for eject_seconds"""
+        self._ejected_until[index] = time.monotonic() + self.eject_seconds
+        self.ejections += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Replica health counters"""
+        now = time.monotonic()
+        return {
+            "replicas": len(self.engines),
+            "healthy": sum(1 for until in self._ejected_until if until <= now),
+            "ejections": self.ejections,
+        }
+
+
+class RoutingSession(Session):
+    """
+    Read-only session that binds to a replica, or to the primary once the
+    request has committed on the primary (read-your-writes)
+    
+    The bind is resolved when a transaction starts, so no connection is
+    chosen until the first query.
+    """
+    
+    def get_bind(self, mapper=None, **kwargs):
+        request_state = self.info.get("request_state")
+        if request_state is not None and getattr(request_state, "read_your_writes", False):
+            self.info["replica_index"] = None
+            return self.info["primary_engine"].sync_engine
+        return self.info["read_engine"].sync_engine
+
+
 # SQL Database Engine (for SQLAlchemy)
 if settings.DATABASE_TYPE in ["postgresql", "mysql", "sqlite"]:
-    # Convert sync database URL to async
-    if settings.DATABASE_TYPE == "postgresql":
-        database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
-    elif settings.DATABASE_TYPE == "mysql":
-        database_url = settings.DATABASE_URL.replace("mysql://", "mysql+aiomysql://")
-    else:  # sqlite
-        database_url = settings.DATABASE_URL.replace("sqlite:///", "sqlite+aiosqlite:///")
-    
-    engine = create_async_engine(
-        database_url,
-        echo=settings.DEBUG,
-        future=True
-    )
+    database_url = async_database_url(settings.DATABASE_URL, settings.DATABASE_TYPE)
+    engine = create_async_engine(database_url, **engine_options(settings.DATABASE_TYPE, database_url))
     
     AsyncSessionLocal = async_sessionmaker(
         engine,
@@ -33,17 +196,184 @@ if settings.DATABASE_TYPE in ["postgresql", "mysql", "sqlite"]:
         expire_on_commit=False
     )
     
-    async def get_db() -> AsyncGenerator[AsyncSession, None]:
-        """Dependency for getting async database session"""
-        async with AsyncSessionLocal() as session:
+    # Read replicas
+    replica_pool = ReplicaPool(
+        [
+            create_async_engine(
+                async_database_url(url, settings.DATABASE_TYPE),
+                **engine_options(settings.DATABASE_TYPE, async_database_url(url, settings.DATABASE_TYPE))
+            )
+            for url in settings.DATABASE_REPLICA_URLS
+        ],
+        eject_seconds=settings.REPLICA_EJECT_SECONDS
+    )
+    
+    # Statement timings (engines derived with execution_options inherit the listeners)
+    instrument_engine(engine, "primary")
+    for replica_engine in replica_pool.engines:
+        instrument_engine(replica_engine, "replica")
+    
+    # Reads run in autocommit: no BEGIN/ROLLBACK round trips around them
+    primary_read_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+    replica_read_engines = [
+        replica_engine.execution_options(isolation_level="AUTOCOMMIT")
+        for replica_engine in replica_pool.engines
+    ]
+    
+    ReadSessionLocal = async_sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        expire_on_commit=False
+    )
+    
+    @event.listens_for(Session, "after_flush")
+    def _mark_flushed(session: Session, flush_context):
+        """Flushed rows must be committed even though the session looks clean"""
+        session.info["has_writes"] = True
+    
+    @event.listens_for(Session, "do_orm_execute")
+    def _mark_write_statement(orm_execute_state):
+        """Core/ORM UPDATE, INSERT and DELETE statements need a commit"""
+        if not orm_execute_state.is_select:
+            orm_execute_state.session.info["has_writes"] = True
+    
+    @event.listens_for(Session, "after_begin")
+    def _count_read_transaction(session: Session, transaction, connection):
+        """An autocommit read avoids the BEGIN and ROLLBACK a transaction needs"""
+        if session.info.get("autocommit"):
+            session.info["round_trips_saved"] = session.info.get("round_trips_saved", 0) + 2
+    
+    @event.listens_for(Session, "after_commit")
+    def _mark_request_wrote(session: Session):
+        """Route later reads of the same request to the primary"""
+        session.info["has_writes"] = False
+        request_state = session.info.get("request_state")
+        if request_state is not None:
+            request_state.read_your_writes = True
+    
+    @event.listens_for(Session, "after_soft_rollback")
+    def _clear_writes(session: Session, previous_transaction):
+        session.info["has_writes"] = False
+    
+    def has_pending_writes(session: AsyncSession) -> bool:
+        """Whether the session holds changes that still need a commit"""
+        return bool(session.new or session.dirty or session.deleted or session.info.get("has_writes"))
+    
+    def _record_savings(request: Request, round_trips: int = 0, commits: int = 0) -> None:
+        """Add to the per-request and per-worker savings, logged per request at DEBUG"""
+        if not round_trips and not commits:
+            return
+        
+        state = request.state
+        state.db_round_trips_saved = getattr(state, "db_round_trips_saved", 0) + round_trips
+        state.db_commits_skipped = getattr(state, "db_commits_skipped", 0) + commits
+        pool_stats.round_trips_saved += round_trips
+        pool_stats.commits_skipped += commits
+        logger.debug(
+            f"{request.method} {request.url.path}: {state.db_round_trips_saved} round trips saved, "
+            f"{state.db_commits_skipped} commits skipped"
+        )
+    
+    async def release(session: AsyncSession) -> None:
+        """
+        Return a session's connection to the pool before the response is serialized
+        
+        Loaded objects stay readable (expire_on_commit is off) and the session
+        checks out a new connection if it is used again.
+        """
+        if has_pending_writes(session):
+            await session.commit()
+        await session.close()
+    
+    async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+        """
+        Dependency for getting async database session
+        
+        No connection is checked out until the first query, and the trailing
+        commit only runs when the session holds unflushed or uncommitted
+        writes, so handlers that commit themselves do not pay for a second one.
+        """
+        async with AsyncSessionLocal(info={"request_state": request.state}) as session:
             try:
                 yield session
-                await session.commit()
+                if has_pending_writes(session):
+                    await session.commit()
+                elif session.in_transaction():
+                    # A read-only transaction: closing rolls it back instead
+                    _record_savings(request, commits=1)
             except Exception:
                 await session.rollback()
                 raise
             finally:
                 await session.close()
+    
+    async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+        """
+        Dependency for a read-only session on a healthy replica
+        
+        Falls back to the primary when no replica is configured or healthy,
+        and after a commit on the primary in the same request. The session
+        is never committed. A replica that fails with a connection error is
+        ejected from rotation.
+        """
+        index = replica_pool.choose() if replica_pool.engines else None
+        read_engine = primary_read_engine if index is None else replica_read_engines[index]
+        
+        async with ReadSessionLocal(info={
+            "request_state": request.state,
+            "primary_engine": primary_read_engine,
+            "read_engine": read_engine,
+            "replica_index": index,
+            "autocommit": True,
+        }) as session:
+            try:
+                yield session
+            except (OperationalError, InterfaceError):
+                if session.info.get("replica_index") is not None:
+                    replica_pool.eject(index)
+                raise
+            finally:
+                await session.close()
+                _record_savings(request, round_trips=session.info.get("round_trips_saved", 0))
+    
+    def stream_session(request: Request) -> AsyncSession:
+        """
+        Read session for streaming results through a server-side cursor
+        
+        Unlike get_read_db it runs in a transaction, which asyncpg cursors
+        require, and it is opened by the response body itself so it outlives
+        the request dependencies.
+        """
+        index = replica_pool.choose() if replica_pool.engines else None
+        return ReadSessionLocal(info={
+            "request_state": request.state,
+            "primary_engine": engine,
+            "read_engine": engine if index is None else replica_pool.engines[index],
+            "replica_index": index,
+        })
+    
+    def get_pool_stats() -> Dict[str, Any]:
+        """Live connection pool counters for this worker"""
+        pool = engine.pool
+        stats: Dict[str, Any] = {"pool_class": type(pool).__name__}
+        
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+            })
+        
+        stats.update({
+            "checkout_timeouts": pool_stats.checkout_timeouts,
+            "checkout_wait_seconds": pool_stats.wait_seconds.snapshot(),
+            "round_trips_saved": pool_stats.round_trips_saved,
+            "commits_skipped": pool_stats.commits_skipped,
+            "read_replicas": replica_pool.stats(),
+        })
+        return stats
 
 # MongoDB Client
 elif settings.DATABASE_TYPE == "mongodb":
@@ -67,5 +397,7 @@ async def close_db():
     """Close database connections"""
     if settings.DATABASE_TYPE in ["postgresql", "mysql", "sqlite"]:
         await engine.dispose()
+        for replica_engine in replica_pool.engines:
+            await replica_engine.dispose()
     elif settings.DATABASE_TYPE == "mongodb":
         mongodb_client.close()
@@ -5,43 +5,90 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+from app.config import settings
 from app.database import get_db
 from app.models import User
+from app.utils.cache import TTLCache
 from app.utils.security import decode_token
 from app.schemas import TokenData
-from typing import Optional
+from typing import Any, Dict, Optional
+import hmac
 
 security = HTTPBearer()
 
+# Resolved users keyed by id, stored as column snapshots
+principal_cache: TTLCache[Dict[str, Any]] = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
-) -> User:
+
+def invalidate_principal(user_id: str) -> None:
     """
-    Dependency to get current authenticated user from JWT token
+    Drop a user from the principal cache
     
-    Args:
-        credentials: HTTP Bearer token credentials
-        db: Database session
-        
-    Returns:
-        Current authenticated user
-        
-    Raises:
-        HTTPException: If token is invalid or user not found
+    Call after committing any change to the user row. Other workers keep
+    their copy until PRINCIPAL_CACHE_TTL_SECONDS elapses.
+    """
+    principal_cache.pop(user_id)
+
+
+def revoke_tokens(user: User) -> None:
+    """
+    Bump a user's token version, revoking every token issued so far
+    
+    The increment is computed by the database as part of the user's UPDATE
+    (SET token_version = token_version + 1), so a stale cached snapshot of
+    the user cannot write back a version the row already has. Commit
+    afterwards and call invalidate_principal.
+    """
+    user.token_version = User.token_version + 1
+
+
+def _snapshot_user(user: User) -> Dict[str, Any]:
+    """Copy the column values of a loaded user"""
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+
+def _restore_user(snapshot: Dict[str, Any], db: AsyncSession) -> User:
+    """
+    Rebuild a cached user and attach it to the request session
+    
+    The instance is marked as persistent without a SELECT, so handlers can
+    modify and commit it exactly like a freshly loaded row.
     """
-    credentials_exception = HTTPException(
+    existing = db.identity_map.get(identity_key(User, snapshot["id"]))
+    if existing is not None:
+        return existing
+    
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+
+def _credentials_exception() -> HTTPException:
+    """401 raised for any token that cannot be validated"""
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_access_token(token: str) -> TokenData:
+    """
+    Decode an access token into its subject and authorization claims
     
-    token = credentials.credentials
+    Raises:
+        HTTPException: If the token is invalid, of the wrong type or incomplete
+    """
     payload = decode_token(token)
     
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     # Verify token type
     if payload.get("type") != "access":
@@ -54,94 +101,275 @@ async def get_current_user(
     user_id: Optional[str] = payload.get("user_id")
     
     if email is None or user_id is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    
+    return TokenData(
+        email=email,
+        user_id=user_id,
+        is_active=payload.get("is_active"),
+        is_verified=payload.get("is_verified"),
+        is_superuser=payload.get("is_superuser"),
+        token_version=payload.get("ver")
+    )
+
+
+async def _load_user(user_id: str, db: AsyncSession) -> User:
+    """
+    Resolve a user from the principal cache, falling back to the primary
+    
+    The user decides authorization and is the object handlers modify and
+    commit, so it is never read from a lagging replica.
+    
+    Raises:
+        HTTPException: If the user does not exist
+    """
+    snapshot = principal_cache.get(user_id)
+    if snapshot is not None:
+        return _restore_user(snapshot, db)
     
-    # Query user from database
-    result = await db.execute(select(User).where(User.id == user_id))
+    # populate_existing refreshes a stale copy already attached to the session
+    result = await db.execute(
+        select(User).where(User.id == user_id).execution_options(populate_existing=True)
+    )
     user = result.scalar_one_or_none()
     
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    
+    principal_cache.set(user_id, _snapshot_user(user))
+    return user
+
+
+async def _reload_user(user_id: str, db: AsyncSession) -> User:
+    """
+    Replace a cached user with the current row from the primary
+    
+    Raises:
+        HTTPException: If the user does not exist
+    """
+    invalidate_principal(user_id)
+    return await _load_user(user_id, db)
+
+
+def _is_newer(token_data: TokenData, cached_version: Optional[int]) -> bool:
+    """
+    Whether a token was issued after the cached token version
+    
+    Another worker bumped the version and issued the token; this worker's
+    cached copy of the user is stale and must be reloaded.
+    """
+    return token_data.token_version is not None and token_data.token_version > (cached_version or 0)
+
+
+def _check_token_version(token_data: TokenData, current_version: Optional[int]) -> None:
+    """
+    Reject tokens issued before the user's token version was bumped
+    
+    Call with the current version: after reloading the user when the token
+    is newer than the cached one (see _is_newer).
     
-    if not user.is_active:
+    Raises:
+        HTTPException: If the token has been revoked
+    """
+    if token_data.token_version is not None and token_data.token_version != (current_version or 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def _ensure_active(is_active: Optional[bool]) -> None:
+    """Raise 403 for deactivated accounts"""
+    if not is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Inactive user"
         )
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """
+    Dependency to get current authenticated user from JWT token
+    
+    Args:
+        credentials: HTTP Bearer token credentials
+        db: Database session
+        
+    Returns:
+        Current authenticated user
+        
+    Raises:
+        HTTPException: If token is invalid or user not found
+    """
+    token_data = _decode_access_token(credentials.credentials)
+    user = await _load_user(token_data.user_id, db)
+    if _is_newer(token_data, user.token_version):
+        user = await _reload_user(token_data.user_id, db)
+    
+    _check_token_version(token_data, user.token_version)
+    _ensure_active(user.is_active)
     
     return user
 
 
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> TokenData:
+    """
+    Dependency to get the authorization data of the current request
+    
+    In stateless auth mode the flags come straight from the token claims and
+    only the token version is checked, against the principal cache (the
+    database is queried on a cache miss, or when the token is newer than the
+    cached version). Otherwise, or for tokens
+    issued without claims, the flags are read from the user row.
+    
+    Args:
+        credentials: HTTP Bearer token credentials
+        db: Database session
+        
+    Returns:
+        Token data with is_active, is_verified and is_superuser set
+        
+    Raises:
+        HTTPException: If token is invalid, revoked or the user is inactive
+    """
+    token_data = _decode_access_token(credentials.credentials)
+    
+    if settings.AUTH_MODE == "stateless" and token_data.is_superuser is not None:
+        snapshot = principal_cache.get(token_data.user_id)
+        if snapshot is not None:
+            current_version = snapshot["token_version"]
+        else:
+            current_version = (await _load_user(token_data.user_id, db)).token_version
+        if _is_newer(token_data, current_version):
+            current_version = (await _reload_user(token_data.user_id, db)).token_version
+        
+        _check_token_version(token_data, current_version)
+    else:
+        user = await _load_user(token_data.user_id, db)
+        if _is_newer(token_data, user.token_version):
+            user = await _reload_user(token_data.user_id, db)
+        _check_token_version(token_data, user.token_version)
+        
+        token_data = TokenData(
+            email=user.email,
+            user_id=user.id,
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+            is_superuser=user.is_superuser,
+            token_version=user.token_version
+        )
+    
+    _ensure_active(token_data.is_active)
+    return token_data
+
+
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    principal: TokenData = Depends(get_current_principal)
+) -> TokenData:
     """
     Dependency to ensure user is active
     
     Args:
-        current_user: Current user from token
+        principal: Authorization data of the current user
         
     Returns:
-        Active user
+        Active user's authorization data
         
     Raises:
         HTTPException: If user is inactive
     """
-    if not current_user.is_active:
+    if not principal.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Inactive user"
         )
-    return current_user
+    return principal
 
 
 async def get_current_verified_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    principal: TokenData = Depends(get_current_principal)
+) -> TokenData:
     """
     Dependency to ensure user is verified
     
     Args:
-        current_user: Current user from token
+        principal: Authorization data of the current user
         
     Returns:
-        Verified user
+        Verified user's authorization data
         
     Raises:
         HTTPException: If user is not verified
     """
-    if not current_user.is_verified:
+    if not principal.is_verified:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Email not verified"
         )
-    return current_user
+    return principal
 
 
 async def get_current_superuser(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    principal: TokenData = Depends(get_current_principal)
+) -> TokenData:
     """
     Dependency to ensure user is a superuser
     
     Args:
-        current_user: Current user from token
+        principal: Authorization data of the current user
         
     Returns:
-        Superuser
+        Superuser's authorization data
         
     Raises:
         HTTPException: If user is not a superuser
     """
-    if not current_user.is_superuser:
+    if not principal.is_superuser:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
-    return current_user
+    return principal
+
+
+async def verify_metrics_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    db: AsyncSession = Depends(get_db)
+) -> None:
+    """
+    Dependency guarding /metrics with the static METRICS_TOKEN
+    
+    Scrapers cannot log in, so they send the shared token as a bearer
+    token. Without a METRICS_TOKEN the endpoint is not left open: a
+    superuser's access token is required instead.
+    
+    Raises:
+        HTTPException: If the token is missing or wrong, or the user is not a superuser
+    """
+    if not settings.METRICS_TOKEN:
+        if credentials is None:
+            raise _credentials_exception()
+        await get_current_superuser(await get_current_principal(credentials, db))
+        return
+    
+    if credentials is None or not hmac.compare_digest(
+        credentials.credentials.encode(), settings.METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
 
 
-def get_optional_current_user(
+async def get_optional_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
     db: AsyncSession = Depends(get_db)
 ) -> Optional[User]:
@@ -159,6 +387,6 @@ def get_optional_current_user(
         return None
     
     try:
-        return get_current_user(credentials, db)
+        return await get_current_user(credentials, db)
     except HTTPException:
         return None
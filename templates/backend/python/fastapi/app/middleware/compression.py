@@ -0,0 +1,204 @@
+"""
+Response compression as pure ASGI middleware
+
+Bodies are compressed with the first of COMPRESSION_ENCODINGS the client
+accepts: brotli (when the brotli package is installed) or gzip. Responses
+are left alone when they are smaller than COMPRESSION_MINIMUM_SIZE, already
+encoded, or of a type in COMPRESSION_EXCLUDED_TYPES. Streaming responses are
+compressed chunk by chunk and flushed after every chunk, so they are never
+buffered whole and clients receive data as it is produced.
+"""
+from typing import Dict, List, Optional, Sequence
+import zlib
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Statuses that never carry a body
+_NO_BODY_STATUSES = {204, 304}
+
+
+class GzipEncoder:
+    """Incremental gzip stream"""
+    
+    def __init__(self, level: int):
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """Compress a chunk and flush it (finish the stream with final=True)"""
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliEncoder:
+    """Incremental brotli stream"""
+    
+    def __init__(self, quality: int):
+        self._brotli = brotli.Compressor(quality=quality)
+    
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """Compress a chunk and flush it (finish the stream with final=True)"""
+        return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Codings of an Accept-Encoding header with their q-values"""
+    codings = {}
+    for item in header.split(","):
+        coding, *params = item.strip().lower().split(";")
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding.strip()] = quality
+    return codings
+
+
+def select_encoding(header: str, available: Sequence[str]) -> Optional[str]:
+    """First available coding (server preference) the client accepts, or None"""
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+    for coding in available:
+        if codings.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+class CompressionMiddleware:
+    """Compresses response bodies according to Accept-Encoding"""
+    
+    def __init__(
+        self,
+        app,
+        encodings: Optional[Sequence[str]] = None,
+        minimum_size: Optional[int] = None,
+        excluded_types: Optional[Sequence[str]] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None
+    ):
+        """
+        Args:
+            app: ASGI application
+            encodings: Codings in order of preference, defaults to COMPRESSION_ENCODINGS;
+                "br" is dropped when brotli is not installed
+            minimum_size: Smallest body compressed, defaults to COMPRESSION_MINIMUM_SIZE
+            excluded_types: Content type prefixes never compressed, defaults to COMPRESSION_EXCLUDED_TYPES
+            gzip_level: zlib level, defaults to COMPRESSION_GZIP_LEVEL
+            brotli_quality: Brotli quality, defaults to COMPRESSION_BROTLI_QUALITY
+        """
+        self.app = app
+        encodings = settings.COMPRESSION_ENCODINGS if encodings is None else encodings
+        self.encodings: List[str] = [e for e in encodings if e == "gzip" or (e == "br" and brotli is not None)]
+        self.minimum_size = settings.COMPRESSION_MINIMUM_SIZE if minimum_size is None else minimum_size
+        excluded_types = settings.COMPRESSION_EXCLUDED_TYPES if excluded_types is None else excluded_types
+        self.excluded_types = tuple(t.lower() for t in excluded_types)
+        self.gzip_level = settings.COMPRESSION_GZIP_LEVEL if gzip_level is None else gzip_level
+        self.brotli_quality = settings.COMPRESSION_BROTLI_QUALITY if brotli_quality is None else brotli_quality
+    
+    def _encoder(self, encoding: str):
+        if encoding == "br":
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+    
+    def _compressible(self, message) -> bool:
+        """Whether a response start allows compression, before its size is known"""
+        if message["status"] in _NO_BODY_STATUSES:
+            return False
+        
+        content_type = b""
+        for name, value in message.get("headers", []):
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+            if name == b"content-length" and int(value) < self.minimum_size:
+                return False
+        
+        content_type = content_type.decode("latin-1").lower()
+        return not content_type.startswith(self.excluded_types)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+        
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        
+        encoding = select_encoding(accept_encoding, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message = None
+        encoder = None
+        passthrough = False
+        
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            
+            if passthrough:
+                await send(message)
+                return
+            
+            if message["type"] == "http.response.start":
+                if self._compressible(message):
+                    start_message = message  # Held until the first body chunk shows the size
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                
+                encoder = self._encoder(encoding)
+                headers = []
+                for name, value in start_message.get("headers", []):
+                    lowered = name.lower()
+                    if lowered == b"content-length":
+                        continue
+                    if lowered == b"etag" and not value.startswith(b"W/"):
+                        value = b"W/" + value  # The encoded body is not byte-for-byte identical
+                    headers.append((name, value))
+                headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+                
+                compressed = encoder.compress(body, final=not more_body)
+                if not more_body:
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                
+                await send({**start_message, "headers": headers})
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+            
+            await send({
+                "type": "http.response.body",
+                "body": encoder.compress(body, final=not more_body),
+                "more_body": more_body
+            })
+        
+        await self.app(scope, receive, send_compressed)
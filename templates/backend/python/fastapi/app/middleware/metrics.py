@@ -0,0 +1,67 @@
+"""
+HTTP request metrics as pure ASGI middleware
+
+Records, per method and route template (so /api/users/{user_id} is one
+series however many users exist), a latency histogram and a counter per
+response status, plus a gauge of requests in flight. Requests that match no
+route, including those rejected by outer middleware before routing, are
+labelled "unmatched".
+"""
+import time
+
+from app.utils.metrics import registry
+
+UNMATCHED_ROUTE = "unmatched"
+
+# Other methods share one label value, so clients cannot create series at will
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+http_requests_in_progress = registry.gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being handled"
+).labels()
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response is complete",
+    labels=("method", "route")
+)
+http_requests_total = registry.counter(
+    "http_requests_total",
+    "HTTP responses by status code",
+    labels=("method", "route", "status")
+)
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and counts responses by status"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500  # Unless a response is started
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        http_requests_in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_progress.dec()
+            
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            template = getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+            http_request_duration_seconds.labels(method, template).observe(elapsed)
+            http_requests_total.labels(method, template, str(status_code)).inc()
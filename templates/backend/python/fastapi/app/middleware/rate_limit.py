@@ -0,0 +1,164 @@
+"""
+Token-bucket rate limiting as pure ASGI middleware
+
+Every request takes a token from the bucket of its route group and client
+IP and, when a valid access token is sent, also from the bucket of its route
+group and user id; it is rejected when either is empty. A user cannot escape
+the limit by switching addresses, nor a client by rotating tokens. Route
+groups are the path prefixes of RATE_LIMITS (longest match wins); other
+paths share the RATE_LIMIT_PER_MINUTE default. Buckets live in a
+SharedCounterTable, so all workers on the host draw from the same ones.
+"""
+from typing import Dict, List, Optional, Tuple
+import json
+import math
+import re
+import time
+
+from app.config import settings
+from app.utils.security import decode_token
+from app.utils.shared_counters import open_counter_table
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RATE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """
+    Parse a rate such as "10/minute" or "100/5minutes"
+    
+    Returns:
+        Bucket capacity and the seconds it takes to refill completely
+    
+    Raises:
+        ValueError: If the rate is malformed
+    """
+    match = _RATE.match(rate)
+    if match is None:
+        raise ValueError(f"Invalid rate limit: {rate!r}")
+    amount, multiple, period = match.groups()
+    return int(amount), int(multiple or 1) * _PERIODS[period]
+
+
+class TokenBuckets:
+    """Token buckets stored in a (shared) counter table"""
+    
+    def __init__(self, table):
+        self.table = table
+    
+    def take(self, key: str, capacity: int, period: float, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        Take one token from a bucket, refilling it for the time passed
+        
+        Returns:
+            Whether a token was available, and the tokens left
+        """
+        now = time.time() if now is None else now
+        rate = capacity / period
+        allowed = False
+        
+        def refill_and_take(tokens: float, updated_at: float, found: bool):
+            nonlocal allowed
+            tokens = capacity if not found else min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            return (tokens - 1 if allowed else tokens), now
+        
+        tokens, _ = self.table.update(key, refill_and_take)
+        return allowed, tokens
+
+
+class RateLimitMiddleware:
+    """Applies token-bucket limits and adds X-RateLimit-* headers"""
+    
+    def __init__(
+        self,
+        app,
+        limits: Optional[Dict[str, str]] = None,
+        default: Optional[str] = None,
+        buckets: Optional[TokenBuckets] = None
+    ):
+        """
+        Args:
+            app: ASGI application
+            limits: Path prefix -> rate, defaults to RATE_LIMITS
+            default: Rate of paths without a prefix, defaults to RATE_LIMIT_PER_MINUTE/minute
+            buckets: Bucket store, defaults to the table at RATE_LIMIT_BUCKETS_PATH
+        """
+        self.app = app
+        limits = settings.RATE_LIMITS if limits is None else limits
+        self.routes: List[Tuple[str, int, float]] = sorted(
+            ((prefix, *parse_rate(rate)) for prefix, rate in limits.items()),
+            key=lambda route: len(route[0]),
+            reverse=True
+        )
+        self.default = ("*", *parse_rate(default or f"{settings.RATE_LIMIT_PER_MINUTE}/minute"))
+        self.buckets = buckets or TokenBuckets(
+            open_counter_table(settings.RATE_LIMIT_BUCKETS_PATH, slots=settings.RATE_LIMIT_BUCKET_SLOTS)
+        )
+    
+    def _route(self, path: str) -> Tuple[str, int, float]:
+        for route in self.routes:
+            prefix = route[0]
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return route
+        return self.default
+    
+    @staticmethod
+    def _clients(scope) -> List[str]:
+        """Client IP, followed by the user id from a valid access token"""
+        client = scope.get("client")
+        clients = [f"ip:{client[0] if client else 'unknown'}"]
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    payload = decode_token(token)
+                    if payload and payload.get("type") == "access" and payload.get("user_id"):
+                        clients.append(f"user:{payload['user_id']}")
+                break
+        return clients
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        
+        prefix, capacity, period = self._route(scope["path"])
+        now = time.time()
+        # Headers report the emptiest bucket; a rejected request spends no further tokens
+        allowed, tokens = True, float(capacity)
+        for client in self._clients(scope):
+            allowed, left = self.buckets.take(f"{prefix}|{client}", capacity, period, now)
+            tokens = left if not allowed else min(tokens, left)
+            if not allowed:
+                break
+        
+        # Epoch second at which the bucket is full again
+        reset = math.ceil(now + (capacity - tokens) * period / capacity)
+        headers = [
+            (b"x-ratelimit-limit", str(capacity).encode()),
+            (b"x-ratelimit-remaining", str(int(tokens)).encode()),
+            (b"x-ratelimit-reset", str(reset).encode()),
+        ]
+        
+        if not allowed:
+            retry_after = math.ceil((1 - tokens) * period / capacity)
+            body = json.dumps({"detail": f"Rate limit exceeded: {capacity} per {period:g} seconds"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
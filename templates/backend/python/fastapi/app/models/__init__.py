@@ -1,4 +1,5 @@
 # Models package
 from app.models.user import User
+from app.models.email_outbox import EmailOutbox
 
-__all__ = ["User"]
+__all__ = ["User", "EmailOutbox"]
@@ -0,0 +1,34 @@
+"""
+Email outbox model for SQL databases (SQLAlchemy)
+"""
+from sqlalchemy import Column, String, DateTime, Integer, Text, Index
+from sqlalchemy.sql import func
+from app.database import Base
+from datetime import datetime
+import uuid
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    to_email = Column(String(255), nullable=False)
+    template = Column(String(50), nullable=False)  # 'verification', 'password_reset'
+    payload = Column(Text, nullable=False, default="{}")  # JSON template context
+    
+    # Delivery state: 'pending', 'sending', 'sent', 'dead'
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+    
+    def __repr__(self):
+        return f"<EmailOutbox {self.template} to {self.to_email} ({self.status})>"
@@ -1,14 +1,22 @@
 """
 User model for SQL databases (SQLAlchemy)
 """
-from sqlalchemy import Column, String, Boolean, DateTime, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, Index
 from sqlalchemy.sql import func
 from app.database import Base
+from datetime import datetime, timezone
 import uuid
 
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination order of GET /api/users
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
+    # Fetch server-generated columns with INSERT/UPDATE ... RETURNING where
+    # the dialect supports it, so writes need no refresh() round trip
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     email = Column(String(255), unique=True, index=True, nullable=False)
@@ -21,13 +29,24 @@ class User(Base):
     is_verified = Column(Boolean, default=False)
     is_superuser = Column(Boolean, default=False)
     
+    # Bumped to revoke all outstanding tokens (password change, deactivation)
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
+    
     # OAuth fields
     oauth_provider = Column(String(50), nullable=True)  # 'google', 'github', None
     oauth_id = Column(String(255), nullable=True)
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set client-side so stored values compare equal to pagination cursors
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        nullable=False
+    )
+    # Set client-side on every UPDATE (including bulk ones) with microsecond
+    # resolution; profile ETags are derived from it
+    updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
     last_login = Column(DateTime(timezone=True), nullable=True)
     
     def __repr__(self):
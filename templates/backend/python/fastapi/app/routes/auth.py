@@ -1,13 +1,14 @@
 """
 Authentication routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from typing import Optional
+import logging
 
-from app.database import get_db
+from app.database import get_db, AsyncSessionLocal
 from app.models import User
 from app.schemas import (
     UserCreate,
@@ -20,20 +21,48 @@ from app.schemas import (
     PasswordResetConfirm
 )
 from app.utils.security import (
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
+    password_needs_rehash,
     create_access_token,
     create_refresh_token,
+    build_token_data,
     decode_token,
     create_email_verification_token,
     create_password_reset_token
 )
-from app.utils.email import send_verification_email, send_password_reset_email
-from app.middleware.auth import get_current_user
+from app.utils.outbox import enqueue_email, email_dispatcher
+from app.utils.db_errors import user_conflict_exception
+from app.utils.last_login import last_login_buffer
+from app.utils.conditional import NOT_MODIFIED_RESPONSES, not_modified_response, user_validators
+from app.middleware.auth import get_current_user, invalidate_principal, revoke_tokens
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+async def _rehash_password(user_id: str, old_hash: str, password: str):
+    """
+    Upgrade a stored password hash to the current scheme and cost
+    
+    Runs after the login response has been sent. The update only applies if
+    the hash has not changed in the meantime (e.g. a concurrent password reset).
+    """
+    try:
+        new_hash = await hash_password_async(password)
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(User)
+                .where(User.id == user_id, User.hashed_password == old_hash)
+                .values(hashed_password=new_hash)
+            )
+            await session.commit()
+        invalidate_principal(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to rehash password for user {user_id}: {e}")
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(
     user_data: UserCreate,
@@ -42,34 +71,13 @@ async def register(
     """
     Register a new user
     
-    - Validates email uniqueness
+    - Validates email and username uniqueness (unique constraints, no lookup queries)
     - Hashes password securely
-    - Sends verification email (if configured)
+    - Queues verification email (delivered by the outbox dispatcher)
     - Returns user data
     """
-    # Check if user already exists
-    result = await db.execute(select(User).where(User.email == user_data.email))
-    existing_user = result.scalar_one_or_none()
-    
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
-    # Check username uniqueness if provided
-    if user_data.username:
-        result = await db.execute(select(User).where(User.username == user_data.username))
-        existing_username = result.scalar_one_or_none()
-        
-        if existing_username:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already taken"
-            )
-    
     # Create new user
-    hashed_pwd = hash_password(user_data.password)
+    hashed_pwd = await hash_password_async(user_data.password)
     
     new_user = User(
         email=user_data.email,
@@ -81,16 +89,18 @@ async def register(
     )
     
     db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
     
-    # Send verification email
+    # Queue verification email in the same transaction as the user
+    verification_token = create_email_verification_token(new_user.email)
+    enqueue_email(db, new_user.email, "verification", {"token": verification_token})
+    
+    # Email and username uniqueness is enforced by the table constraints
     try:
-        verification_token = create_email_verification_token(new_user.email)
-        await send_verification_email(new_user.email, verification_token)
-    except Exception as e:
-        # Don't fail registration if email fails
-        print(f"Failed to send verification email: {e}")
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise user_conflict_exception(e)
+    email_dispatcher.notify()
     
     return new_user
 
@@ -98,6 +108,7 @@ async def register(
 @router.post("/login", response_model=Token)
 async def login(
     credentials: UserLogin,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -105,13 +116,14 @@ async def login(
     
     - Validates credentials
     - Returns access and refresh tokens
-    - Updates last login timestamp
+    - Records last login timestamp (written within LAST_LOGIN_FLUSH_SECONDS)
+    - Upgrades outdated password hashes in the background
     """
     # Find user by email
     result = await db.execute(select(User).where(User.email == credentials.email))
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not user or not await verify_password_async(credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -124,12 +136,15 @@ async def login(
             detail="Account is inactive"
         )
     
-    # Update last login
-    user.last_login = datetime.utcnow()
-    await db.commit()
+    # Written in bulk by the last login buffer, not on the request path
+    last_login_buffer.record(user.id)
+    
+    # Move the stored hash to the current cost without a migration
+    if password_needs_rehash(user.hashed_password):
+        background_tasks.add_task(_rehash_password, user.id, user.hashed_password, credentials.password)
     
     # Create tokens
-    token_data = {"sub": user.email, "user_id": user.id}
+    token_data = build_token_data(user)
     access_token = create_access_token(token_data)
     refresh_token = create_refresh_token(token_data)
     
@@ -177,8 +192,16 @@ async def refresh_token(
             detail="User not found or inactive"
         )
     
-    # Create new tokens
-    token_data = {"sub": user.email, "user_id": user.id}
+    # Reject refresh tokens issued before a password change or revocation
+    token_version = payload.get("ver")
+    if token_version is not None and token_version != user.token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
+    
+    # Create new tokens with fresh claims
+    token_data = build_token_data(user)
     new_access_token = create_access_token(token_data)
     new_refresh_token = create_refresh_token(token_data)
     
@@ -230,6 +253,7 @@ async def verify_email(
     
     user.is_verified = True
     await db.commit()
+    invalidate_principal(user.id)
     
     return {"message": "Email verified successfully"}
 
@@ -242,7 +266,7 @@ async def forgot_password(
     """
     Request password reset
     
-    - Sends password reset email if user exists
+    - Queues password reset email if user exists
     - Returns success regardless (security best practice)
     """
     # Find user
@@ -251,11 +275,10 @@ async def forgot_password(
     
     # Always return success to prevent email enumeration
     if user and user.is_active:
-        try:
-            reset_token = create_password_reset_token(user.email)
-            await send_password_reset_email(user.email, reset_token)
-        except Exception as e:
-            print(f"Failed to send password reset email: {e}")
+        reset_token = create_password_reset_token(user.email)
+        enqueue_email(db, user.email, "password_reset", {"token": reset_token})
+        await db.commit()
+        email_dispatcher.notify()
     
     return {"message": "If the email exists, a password reset link has been sent"}
 
@@ -298,8 +321,10 @@ async def reset_password(
         )
     
     # Update password
-    user.hashed_password = hash_password(request.new_password)
+    user.hashed_password = await hash_password_async(request.new_password)
+    revoke_tokens(user)
     await db.commit()
+    invalidate_principal(user.id)
     
     return {"message": "Password reset successfully"}
 
@@ -315,9 +340,15 @@ async def logout(current_user: User = Depends(get_current_user)):
     return {"message": "Logged out successfully"}
 
 
-@router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+@router.get("/me", response_model=UserResponse, responses=NOT_MODIFIED_RESPONSES)
+async def get_current_user_info(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
     """
     Get current authenticated user information
+    
+    - Sends ETag and Last-Modified; answers 304 for an unchanged user
     """
-    return current_user
+    return not_modified_response(request, response, *user_validators(current_user)) or current_user
@@ -1,26 +1,53 @@
 """
 User routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_db, get_read_db, release, stream_session
 from app.models import User
-from app.schemas import UserResponse, UserUpdate, ChangePassword
-from app.middleware.auth import get_current_user, get_current_superuser
-from app.utils.security import hash_password, verify_password
-from typing import List
+from app.schemas import (
+    UserResponse,
+    UserUpdate,
+    UserPage,
+    UserImportReport,
+    UserBatchRequest,
+    UserBatchResponse,
+    ChangePassword,
+    TokenData
+)
+from app.middleware.auth import get_current_user, get_current_superuser, invalidate_principal, revoke_tokens
+from app.utils.security import hash_password_async, verify_password_async
+from app.utils.pagination import InvalidCursorError, decode_cursor, keyset_page, page_cursor
+from app.utils.export import EXPORT_MEDIA_TYPES, stream_export
+from app.utils.user_import import IMPORT_FORMATS, UserImporter, iter_records
+from app.utils.db_errors import user_conflict_exception
+from app.utils.conditional import NOT_MODIFIED_RESPONSES, not_modified_response, user_validators
+from typing import Optional
+
+# Key of the users listing, backed by ix_users_created_at_id
+USER_PAGE_KEYS = (User.created_at, User.id)
 
 router = APIRouter()
 
 
-@router.get("/me", response_model=UserResponse)
-async def get_current_user_profile(current_user: User = Depends(get_current_user)):
+@router.get("/me", response_model=UserResponse, responses=NOT_MODIFIED_RESPONSES)
+async def get_current_user_profile(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
     """
     Get current user's profile
+    
+    - Sends ETag and Last-Modified; answers 304 to If-None-Match / If-Modified-Since
+      for an unchanged profile
     """
-    return current_user
+    return not_modified_response(request, response, *user_validators(current_user)) or current_user
 
 
 @router.put("/me", response_model=UserResponse)
@@ -33,39 +60,27 @@ async def update_current_user(
     Update current user's profile
     
     - Update username, full name, or email
-    - Validates uniqueness of username/email
+    - Validates uniqueness of username/email (unique constraints, no lookup queries)
     """
-    # Check if username is being updated and is unique
     if user_update.username and user_update.username != current_user.username:
-        result = await db.execute(select(User).where(User.username == user_update.username))
-        existing_user = result.scalar_one_or_none()
-        
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already taken"
-            )
         current_user.username = user_update.username
     
-    # Check if email is being updated and is unique
     if user_update.email and user_update.email != current_user.email:
-        result = await db.execute(select(User).where(User.email == user_update.email))
-        existing_user = result.scalar_one_or_none()
-        
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
         current_user.email = user_update.email
         current_user.is_verified = False  # Require re-verification
+        revoke_tokens(current_user)  # Drop stale claims
     
     # Update full name if provided
     if user_update.full_name is not None:
         current_user.full_name = user_update.full_name
     
-    await db.commit()
-    await db.refresh(current_user)
+    # Username and email uniqueness is enforced by the table constraints
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise user_conflict_exception(e)
+    invalidate_principal(current_user.id)
     
     return current_user
 
@@ -83,15 +98,17 @@ async def change_password(
     - Updates to new password
     """
     # Verify current password
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    if not await verify_password_async(password_data.current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect current password"
         )
     
     # Update password
-    current_user.hashed_password = hash_password(password_data.new_password)
+    current_user.hashed_password = await hash_password_async(password_data.new_password)
+    revoke_tokens(current_user)
     await db.commit()
+    invalidate_principal(current_user.id)
     
     return {"message": "Password changed successfully"}
 
@@ -105,41 +122,144 @@ async def delete_current_user(
     Delete current user's account (soft delete - deactivate)
     """
     current_user.is_active = False
+    revoke_tokens(current_user)
     await db.commit()
+    invalidate_principal(current_user.id)
     
     return None
 
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=UserPage)
 async def list_users(
-    skip: int = 0,
-    limit: int = 100,
-    current_user: User = Depends(get_current_superuser),
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    skip: int = Query(0, ge=0, deprecated=True),
+    current_user: TokenData = Depends(get_current_superuser),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     List all users (superuser only)
     
-    - Pagination support
+    - Ordered by creation time, paginated with an opaque cursor
+    - Pass `next_cursor` of a page as `cursor` to get the following page
+    - `skip` is kept for compatibility; it uses OFFSET and slows down on deep pages
     - Requires superuser permissions
     """
-    result = await db.execute(select(User).offset(skip).limit(limit))
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor, datetime_positions=(0,))
+        except InvalidCursorError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    
+    stmt = keyset_page(select(User), USER_PAGE_KEYS, after, limit)
+    if skip and after is None:
+        stmt = stmt.offset(skip)
+    
+    result = await db.execute(stmt)
     users = result.scalars().all()
+    await release(db)
     
-    return users
+    items, next_cursor = page_cursor(users, [key.key for key in USER_PAGE_KEYS], limit)
+    return {"items": items, "next_cursor": next_cursor}
+
 
+@router.get("/export")
+async def export_users(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Export all users as NDJSON or CSV (superuser only)
+    
+    - Streamed through a server-side cursor, USER_EXPORT_FETCH_SIZE rows at a time
+    - Same fields as UserResponse, ordered by creation time
+    - Requires superuser permissions
+    """
+    async def body():
+        async with stream_session(request) as session:
+            stmt = select(User).order_by(*USER_PAGE_KEYS)
+            async for chunk in stream_export(session, stmt, UserResponse, format, settings.USER_EXPORT_FETCH_SIZE):
+                yield chunk
+    
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'}
+    )
 
-@router.get("/{user_id}", response_model=UserResponse)
+
+@router.post("/import", response_model=UserImportReport)
+async def import_users(
+    request: Request,
+    current_user: TokenData = Depends(get_current_superuser),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create users in bulk from an NDJSON or CSV upload (superuser only)
+    
+    - Body is read as it streams; one record per line with the UserCreate fields
+    - CSV uploads start with a header row
+    - Rows are validated like registrations and committed in chunks of USER_IMPORT_CHUNK_SIZE
+    - Returns a result per row; invalid or duplicate rows do not stop the import
+    - Requires superuser permissions
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    import_format = IMPORT_FORMATS.get(content_type)
+    
+    if import_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Upload must be one of: {', '.join(IMPORT_FORMATS)}"
+        )
+    
+    importer = UserImporter(db, settings.USER_IMPORT_CHUNK_SIZE)
+    return await importer.run(iter_records(request.stream(), import_format))
+
+
+@router.post("/batch", response_model=UserBatchResponse)
+async def get_users_by_ids(
+    batch: UserBatchRequest,
+    current_user: TokenData = Depends(get_current_superuser),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get several users by ID in one query (superuser only)
+    
+    - Accepts up to USER_BATCH_MAX_IDS ids
+    - Returns the users keyed by id and the ids that do not exist
+    - Requires superuser permissions
+    """
+    result = await db.execute(select(User).where(User.id.in_(batch.ids)))
+    users = {user.id: user for user in result.scalars().all()}
+    await release(db)
+    
+    return {
+        "users": users,
+        "missing": [user_id for user_id in batch.ids if user_id not in users]
+    }
+
+
+@router.get("/{user_id}", response_model=UserResponse, responses=NOT_MODIFIED_RESPONSES)
 async def get_user_by_id(
     user_id: str,
-    current_user: User = Depends(get_current_superuser),
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: TokenData = Depends(get_current_superuser),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get user by ID (superuser only)
+    
+    - Sends ETag and Last-Modified; answers 304 for an unchanged user
     """
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
+    await release(db)
     
     if not user:
         raise HTTPException(
@@ -147,4 +267,4 @@ async def get_user_by_id(
             detail="User not found"
         )
     
-    return user
+    return not_modified_response(request, response, *user_validators(user)) or user
@@ -1,6 +1,25 @@
 # Schemas package
-from app.schemas.user import UserCreate, UserLogin, UserUpdate, UserResponse, UserInDB
-from app.schemas.auth import Token, TokenData, RefreshTokenRequest, EmailVerificationRequest, PasswordResetRequest
+from app.schemas.user import (
+    UserCreate,
+    UserLogin,
+    UserUpdate,
+    UserResponse,
+    UserInDB,
+    UserPage,
+    UserImportResult,
+    UserImportReport,
+    UserBatchRequest,
+    UserBatchResponse
+)
+from app.schemas.auth import (
+    Token,
+    TokenData,
+    RefreshTokenRequest,
+    EmailVerificationRequest,
+    PasswordResetRequest,
+    PasswordResetConfirm,
+    ChangePassword
+)
 
 __all__ = [
     "UserCreate",
@@ -8,9 +27,16 @@ __all__ = [
     "UserUpdate",
     "UserResponse",
     "UserInDB",
+    "UserPage",
+    "UserImportResult",
+    "UserImportReport",
+    "UserBatchRequest",
+    "UserBatchResponse",
     "Token",
     "TokenData",
     "RefreshTokenRequest",
     "EmailVerificationRequest",
-    "PasswordResetRequest"
+    "PasswordResetRequest",
+    "PasswordResetConfirm",
+    "ChangePassword"
 ]
@@ -16,6 +16,10 @@ class TokenData(BaseModel):
     """Data extracted from JWT token"""
     email: Optional[str] = None
     user_id: Optional[str] = None
+    is_active: Optional[bool] = None
+    is_verified: Optional[bool] = None
+    is_superuser: Optional[bool] = None
+    token_version: Optional[int] = None
 
 
 class RefreshTokenRequest(BaseModel):
@@ -2,7 +2,7 @@
 Pydantic schemas for user data validation
 """
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from app.config import settings
 
@@ -62,3 +62,43 @@ class UserResponse(UserBase):
 class UserInDB(UserResponse):
     """Schema for user in database"""
     hashed_password: str
+
+
+class UserPage(BaseModel):
+    """Schema for a page of users"""
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+
+class UserImportResult(BaseModel):
+    """Schema for the outcome of one bulk import row"""
+    row: int
+    status: str  # created, error
+    email: Optional[str] = None
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class UserImportReport(BaseModel):
+    """Schema for a bulk import report"""
+    created: int
+    failed: int
+    results: List[UserImportResult]
+
+
+class UserBatchRequest(BaseModel):
+    """Schema for looking up several users by id"""
+    ids: List[str] = Field(..., min_length=1)
+    
+    @validator('ids')
+    def validate_ids(cls, v):
+        """Limit the batch size and drop duplicate ids"""
+        if len(v) > settings.USER_BATCH_MAX_IDS:
+            raise ValueError(f'At most {settings.USER_BATCH_MAX_IDS} ids can be looked up at once')
+        return list(dict.fromkeys(v))
+
+
+class UserBatchResponse(BaseModel):
+    """Schema for a batch lookup: users keyed by id and the ids not found"""
+    users: Dict[str, UserResponse]
+    missing: List[str]
@@ -0,0 +1,137 @@
+"""
+Production server entry point
+
+Runs the application under gunicorn with uvicorn workers:
+
+- One worker per available CPU unless SERVER_WORKERS is set
+- uvloop and httptools when installed (uvicorn[standard]), asyncio and h11 otherwise
+- The application is imported once in the master and inherited by the
+  forked workers (preload), so import errors fail fast and memory is shared
+- Each worker is replaced after SERVER_MAX_REQUESTS (+ jitter) requests, so
+  workers recycle one at a time and memory growth stays bounded
+
+Run with: python -m app.serve (or python main.py)
+"""
+from typing import Any, Dict, Optional
+import importlib.util
+import logging
+import os
+
+from app.config import settings
+from app.utils.metrics import MetricsDirectory
+
+logger = logging.getLogger(__name__)
+
+APP_PATH = "main:app"
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (respects affinity and container cpusets)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    """Number of worker processes to run"""
+    return settings.SERVER_WORKERS or available_cpus()
+
+
+def event_loop_options() -> Dict[str, str]:
+    """Fastest event loop and HTTP parser that are installed"""
+    return {
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+    }
+
+
+def gunicorn_options() -> Dict[str, Any]:
+    """Gunicorn settings derived from the SERVER_* settings"""
+    return {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": worker_count(),
+        "worker_class": "app.serve.UvicornWorker",
+        "preload_app": True,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "timeout": settings.SERVER_WORKER_TIMEOUT,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+        "keepalive": settings.SERVER_KEEPALIVE,
+        "forwarded_allow_ips": ",".join(settings.SERVER_FORWARDED_ALLOW_IPS),
+        "accesslog": "-" if settings.DEBUG else None,
+    }
+
+
+try:
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker as _BaseUvicornWorker
+    
+    class UvicornWorker(_BaseUvicornWorker):
+        """Uvicorn worker pinned to the fastest installed loop and parser"""
+        CONFIG_KWARGS = {**_BaseUvicornWorker.CONFIG_KWARGS, **event_loop_options()}
+    
+    class Server(BaseApplication):
+        """Gunicorn application serving an already imported ASGI app"""
+        
+        def __init__(self, application, options: Dict[str, Any]):
+            self.application = application
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+        
+        def load(self):
+            return self.application
+except ImportError:  # gunicorn is POSIX only
+    BaseApplication = None
+
+
+def serve(application: Optional[Any] = None) -> None:
+    """
+    Start the server: gunicorn in production, a reloading uvicorn with SERVER_RELOAD
+    
+    Args:
+        application: ASGI app served by gunicorn, imported from APP_PATH if not
+            given. Pass it when the app module is already running as __main__,
+            otherwise importing APP_PATH would build a second app.
+    """
+    import uvicorn
+    
+    # Snapshots left by the workers of a previous run
+    if settings.METRICS_DIR:
+        MetricsDirectory(settings.METRICS_DIR).clear()
+    
+    if settings.SERVER_RELOAD:
+        uvicorn.run(APP_PATH, host=settings.SERVER_HOST, port=settings.SERVER_PORT, reload=True)
+        return
+    
+    if BaseApplication is None:
+        # Uvicorn does not replace workers that exit, so no request-based recycling here
+        logger.warning("gunicorn is not installed, serving without worker recycling")
+        uvicorn.run(
+            APP_PATH,
+            host=settings.SERVER_HOST,
+            port=settings.SERVER_PORT,
+            workers=worker_count(),
+            proxy_headers=True,
+            forwarded_allow_ips=",".join(settings.SERVER_FORWARDED_ALLOW_IPS),
+            **event_loop_options()
+        )
+        return
+    
+    if application is None:
+        from main import app as application
+    
+    options = gunicorn_options()
+    logger.info(
+        f"Serving on {options['bind']} with {options['workers']} workers "
+        f"({event_loop_options()}), recycling after {options['max_requests']} requests"
+    )
+    Server(application, options).run()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,114 @@
+"""
+Conditional GET support (ETag / Last-Modified)
+
+Handlers compute validators from what they already have in hand (for users,
+the id and updated_at of the principal cache snapshot) and answer 304 Not
+Modified before anything is serialized when the client's copy is current.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+import hashlib
+
+from fastapi import Request, Response, status
+
+from app.config import settings
+from app.models import User
+
+# Authenticated representations: browsers may keep them, but must revalidate
+CACHE_CONTROL = "private, no-cache"
+
+# OpenAPI documentation for routes answering conditional requests
+NOT_MODIFIED_RESPONSES = {status.HTTP_304_NOT_MODIFIED: {"description": "Not Modified"}}
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite returns naive datetimes; all stored timestamps are UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def user_validators(user: User) -> Tuple[str, datetime]:
+    """
+    ETag and Last-Modified of a user's representation
+    
+    Every write to the user row sets updated_at (microsecond resolution), so
+    the pair changes whenever the representation does. The app version is
+    mixed in so schema changes across deploys invalidate cached copies.
+    
+    Returns:
+        Weak ETag and modification time (UTC)
+    """
+    modified = _as_utc(user.updated_at or user.created_at)
+    digest = hashlib.blake2b(
+        f"{settings.VERSION}:{user.id}:{modified.isoformat()}".encode(),
+        digest_size=12
+    ).hexdigest()
+    return f'W/"{digest}"', modified
+
+
+def _opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison against an If-None-Match list"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == opaque for tag in if_none_match.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """
+    Whether the client's cached copy is current
+    
+    If-None-Match takes precedence; If-Modified-Since is only considered
+    without it (RFC 9110, section 13.2.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution
+        return int(last_modified.timestamp()) <= int(_as_utc(since).timestamp())
+    
+    return False
+
+
+def not_modified_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: datetime
+) -> Optional[Response]:
+    """
+    Add validators to the response and short-circuit current clients
+    
+    Args:
+        request: Incoming request
+        response: The handler's response parameter; validators are added to it
+        etag: Current ETag of the resource
+        last_modified: Current modification time of the resource
+    
+    Returns:
+        An empty 304 response to return from the handler, or None to
+        continue with the full response
+    """
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": CACHE_CONTROL
+    }
+    
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
+    return None
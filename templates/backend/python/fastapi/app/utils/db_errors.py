@@ -0,0 +1,53 @@
+"""
+Mapping of database constraint violations to API errors
+
+Uniqueness is enforced by the unique constraints on the tables instead of
+SELECT-before-write checks: the write is attempted once and an
+IntegrityError names the column that collided.
+"""
+from typing import Dict, Optional, Sequence
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+import re
+
+# Unique User column -> error detail returned to the client
+USER_UNIQUE_MESSAGES: Dict[str, str] = {
+    "email": "Email already registered",
+    "username": "Username already taken"
+}
+
+
+def violated_unique_column(error: IntegrityError, columns: Sequence[str]) -> Optional[str]:
+    """
+    Find which of the given unique columns an IntegrityError is about
+    
+    Drivers report the column (SQLite: "UNIQUE constraint failed:
+    users.email") or the index (PostgreSQL/MySQL: "ix_users_email").
+    
+    Returns:
+        The column name, or None if the error is not about these columns
+    """
+    # The first line names the constraint; later lines may echo the value
+    message = str(error.orig).lower().split("\n")[0]
+    if "unique" not in message and "duplicate" not in message:
+        return None
+    for column in columns:
+        if re.search(rf"(users\.|ix_users_){column}\b", message):
+            return column
+    return None
+
+
+def user_conflict_exception(error: IntegrityError) -> HTTPException:
+    """
+    Turn a unique violation on users into the matching 400 response
+    
+    Raises:
+        IntegrityError: If the error is not a user uniqueness violation
+    """
+    column = violated_unique_column(error, list(USER_UNIQUE_MESSAGES))
+    if column is None:
+        raise error
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=USER_UNIQUE_MESSAGES[column]
+    )
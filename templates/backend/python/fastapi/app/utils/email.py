@@ -1,15 +1,28 @@
 """
 Email utilities for sending emails
 """
-import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from jinja2 import Template
 from app.config import settings
+from app.utils.email_templates import render_email_template
+from app.utils.metrics import registry
+from app.utils.smtp_pool import smtp_pool
+from typing import Optional
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+email_send_seconds = registry.histogram(
+    "email_send_seconds",
+    "Time to hand a message to the SMTP server, by outcome",
+    labels=("outcome",)
+)
+
+
+class EmailNotConfiguredError(Exception):
+    """Raised when SMTP credentials are required but not configured"""
+
 
 async def send_email(
     to_email: str,
@@ -25,10 +38,12 @@ async def send_email(
         subject: Email subject
         html_content: HTML email body
         text_content: Plain text email body (optional)
+    
+    Raises:
+        EmailNotConfiguredError: SMTP_REQUIRE_AUTH is set without SMTP_USER and SMTP_PASSWORD
     """
-    if not settings.SMTP_USER or not settings.SMTP_PASSWORD:
-        logger.warning("SMTP credentials not configured, email not sent")
-        return
+    if settings.SMTP_REQUIRE_AUTH and (not settings.SMTP_USER or not settings.SMTP_PASSWORD):
+        raise EmailNotConfiguredError("SMTP credentials not configured, email not sent")
     
     message = MIMEMultipart("alternative")
     message["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_FROM_EMAIL}>"
@@ -44,17 +59,13 @@ async def send_email(
     html_part = MIMEText(html_content, "html")
     message.attach(html_part)
     
+    start = time.perf_counter()
     try:
-        await aiosmtplib.send(
-            message,
-            hostname=settings.SMTP_HOST,
-            port=settings.SMTP_PORT,
-            username=settings.SMTP_USER,
-            password=settings.SMTP_PASSWORD,
-            use_tls=True
-        )
+        await smtp_pool.send(message)
+        email_send_seconds.labels("sent").observe(time.perf_counter() - start)
         logger.info(f"Email sent successfully to {to_email}")
     except Exception as e:
+        email_send_seconds.labels("failed").observe(time.perf_counter() - start)
         logger.error(f"Failed to send email to {to_email}: {str(e)}")
         raise
 
@@ -68,44 +79,7 @@ async def send_verification_email(email: str, token: str):
         token: Verification token
     """
     verification_url = f"http://localhost:5173/verify-email?token={token}"
-    
-    html_template = Template("""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-            .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-            .button { 
-                display: inline-block; 
-                padding: 12px 24px; 
-                background-color: #007bff; 
-                color: white; 
-                text-decoration: none; 
-                border-radius: 4px; 
-                margin: 20px 0;
-            }
-            .footer { margin-top: 30px; font-size: 12px; color: #666; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h2>Verify Your Email Address</h2>
-            <p>Thank you for registering! Please click the button below to verify your email address:</p>
-            <a href="{{ verification_url }}" class="button">Verify Email</a>
-            <p>Or copy and paste this link into your browser:</p>
-            <p>{{ verification_url }}</p>
-            <div class="footer">
-                <p>This link will expire in 24 hours.</p>
-                <p>If you didn't create an account, please ignore this email.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """)
-    
-    html_content = html_template.render(verification_url=verification_url)
-    text_content = f"Verify your email by clicking: {verification_url}"
+    html_content, text_content = render_email_template("verification", verification_url=verification_url)
     
     await send_email(
         to_email=email,
@@ -124,44 +98,7 @@ async def send_password_reset_email(email: str, token: str):
         token: Password reset token
     """
     reset_url = f"http://localhost:5173/reset-password?token={token}"
-    
-    html_template = Template("""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-            .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-            .button { 
-                display: inline-block; 
-                padding: 12px 24px; 
-                background-color: #dc3545; 
-                color: white; 
-                text-decoration: none; 
-                border-radius: 4px; 
-                margin: 20px 0;
-            }
-            .footer { margin-top: 30px; font-size: 12px; color: #666; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h2>Reset Your Password</h2>
-            <p>We received a request to reset your password. Click the button below to proceed:</p>
-            <a href="{{ reset_url }}" class="button">Reset Password</a>
-            <p>Or copy and paste this link into your browser:</p>
-            <p>{{ reset_url }}</p>
-            <div class="footer">
-                <p>This link will expire in 1 hour.</p>
-                <p>If you didn't request a password reset, please ignore this email.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """)
-    
-    html_content = html_template.render(reset_url=reset_url)
-    text_content = f"Reset your password by clicking: {reset_url}"
+    html_content, text_content = render_email_template("password_reset", reset_url=reset_url)
     
     await send_email(
         to_email=email,
@@ -0,0 +1,74 @@
+"""
+Email template registry
+
+Templates live in app/templates/email as <name>.html with an optional
+<name>.txt plain text variant. They are compiled once per worker (at
+startup via warm_email_templates) and the compiled bytecode is cached on
+disk, so later workers skip parsing as well.
+"""
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+from jinja2.exceptions import TemplateNotFound
+from pathlib import Path
+from typing import Optional, Tuple
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+
+def _bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    """On-disk bytecode cache, or None if EMAIL_TEMPLATE_CACHE_DIR is empty"""
+    if not settings.EMAIL_TEMPLATE_CACHE_DIR:
+        return None
+    
+    cache_dir = Path(settings.EMAIL_TEMPLATE_CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return FileSystemBytecodeCache(str(cache_dir))
+
+
+email_templates = Environment(
+    loader=FileSystemLoader(str(TEMPLATE_DIR)),
+    bytecode_cache=_bytecode_cache(),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=settings.DEBUG,
+    cache_size=-1  # Never evict compiled templates
+)
+
+
+def warm_email_templates() -> int:
+    """
+    Compile every email template up front
+    
+    Returns:
+        Number of templates compiled
+    """
+    names = email_templates.list_templates(extensions=["html", "txt"])
+    for name in names:
+        email_templates.get_template(name)
+    
+    logger.info(f"Compiled {len(names)} email templates")
+    return len(names)
+
+
+def render_email_template(name: str, **context) -> Tuple[str, Optional[str]]:
+    """
+    Render the HTML and plain text variants of an email template
+    
+    Args:
+        name: Template name without extension, e.g. "verification"
+        **context: Template variables
+        
+    Returns:
+        Rendered HTML and text (None if the template has no .txt variant)
+    """
+    html_content = email_templates.get_template(f"{name}.html").render(**context)
+    
+    try:
+        text_content = email_templates.get_template(f"{name}.txt").render(**context)
+    except TemplateNotFound:
+        text_content = None
+    
+    return html_content, text_content
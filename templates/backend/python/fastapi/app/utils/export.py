@@ -0,0 +1,67 @@
+"""
+Streaming NDJSON/CSV export of query results
+
+Rows are read through a server-side cursor in batches of fetch_size and
+serialized one batch at a time, so memory use depends on the batch size and
+not on the number of exported rows. The session's identity map holds
+loaded objects weakly, so a batch is released once it has been serialized.
+"""
+from typing import AsyncIterator, Dict, Type
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+import csv
+import io
+
+# Export format -> response media type
+EXPORT_MEDIA_TYPES: Dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+
+async def stream_export(
+    session: AsyncSession,
+    stmt: Select,
+    schema: Type[BaseModel],
+    export_format: str,
+    fetch_size: int
+) -> AsyncIterator[str]:
+    """
+    Serialize the rows of a select incrementally
+    
+    Args:
+        session: Session the rows are streamed from
+        stmt: Select returning ORM objects
+        schema: Pydantic schema (with from_attributes) each row is serialized with
+        export_format: Key of EXPORT_MEDIA_TYPES
+        fetch_size: Rows fetched and serialized per chunk
+    
+    Yields:
+        Chunks of the export body
+    """
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise ValueError(f"Unknown export format: {export_format}")
+    
+    fields = list(schema.model_fields)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    
+    if export_format == "csv":
+        writer.writeheader()
+        yield buffer.getvalue()
+    
+    result = await session.stream_scalars(stmt.execution_options(yield_per=fetch_size))
+    async for rows in result.partitions():
+        buffer.seek(0)
+        buffer.truncate()
+        
+        for row in rows:
+            item = schema.model_validate(row)
+            if export_format == "csv":
+                writer.writerow(item.model_dump(mode="json"))
+            else:
+                buffer.write(item.model_dump_json())
+                buffer.write("\n")
+        
+        yield buffer.getvalue()
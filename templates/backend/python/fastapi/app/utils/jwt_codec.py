@@ -0,0 +1,199 @@
+"""
+JWT codecs used by app.utils.security
+
+- JoseCodec: python-jose, supports every algorithm jose does
+- NativeCodec: lean stdlib implementation of HS256/HS384/HS512, plus EdDSA
+  (Ed25519) through the cryptography package
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import time
+
+from jose import JWTError, jwt
+
+from app.config import settings
+
+_HMAC_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512
+}
+
+_TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+class InvalidTokenError(Exception):
+    """Raised when a token cannot be decoded or verified"""
+
+
+class JWTCodec(ABC):
+    """Encodes and verifies signed JWTs for a single algorithm"""
+    
+    @abstractmethod
+    def encode(self, claims: Dict[str, Any]) -> str:
+        """
+        Sign claims into a compact JWT
+        
+        Args:
+            claims: Payload; datetime values of exp/iat/nbf are converted to timestamps
+            
+        Returns:
+            Encoded JWT
+        """
+    
+    @abstractmethod
+    def decode(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a compact JWT and return its payload
+        
+        Raises:
+            InvalidTokenError: If the signature, algorithm or exp/nbf is invalid
+        """
+
+
+class JoseCodec(JWTCodec):
+    """python-jose backed codec"""
+    
+    def __init__(self, algorithm: str, signing_key: str, verifying_key: Optional[str] = None):
+        self.algorithm = algorithm
+        self.signing_key = signing_key
+        self.verifying_key = verifying_key or signing_key
+    
+    def encode(self, claims: Dict[str, Any]) -> str:
+        return jwt.encode(claims, self.signing_key, algorithm=self.algorithm)
+    
+    def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            return jwt.decode(token, self.verifying_key, algorithms=[self.algorithm])
+        except JWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _timestamp(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple())
+    return value
+
+
+class NativeCodec(JWTCodec):
+    """
+    Stdlib HMAC codec with optional Ed25519 support
+    
+    The header segment is encoded once, and the keyed HMAC state is copied
+    per token instead of being rebuilt from the secret every time.
+    """
+    
+    def __init__(self, algorithm: str, signing_key: str, verifying_key: Optional[str] = None):
+        self.algorithm = algorithm
+        header = json.dumps({"alg": algorithm, "typ": "JWT"}, separators=(",", ":")).encode()
+        self._header_segment = _b64encode(header)
+        
+        if algorithm in _HMAC_DIGESTS:
+            self._hmac = hmac.new(signing_key.encode(), digestmod=_HMAC_DIGESTS[algorithm])
+            self._private_key = self._public_key = None
+        elif algorithm == "EdDSA":
+            from cryptography.hazmat.primitives.serialization import (
+                load_pem_private_key,
+                load_pem_public_key
+            )
+            
+            self._hmac = None
+            self._private_key = load_pem_private_key(signing_key.encode(), password=None)
+            self._public_key = (
+                load_pem_public_key(verifying_key.encode())
+                if verifying_key else self._private_key.public_key()
+            )
+        else:
+            raise ValueError(f"Unsupported JWT algorithm for native codec: {algorithm}")
+    
+    def _sign(self, signing_input: bytes) -> bytes:
+        if self._hmac is not None:
+            mac = self._hmac.copy()
+            mac.update(signing_input)
+            return mac.digest()
+        return self._private_key.sign(signing_input)
+    
+    def _verify(self, signing_input: bytes, signature: bytes) -> bool:
+        if self._hmac is not None:
+            return hmac.compare_digest(self._sign(signing_input), signature)
+        try:
+            self._public_key.verify(signature, signing_input)
+            return True
+        except Exception:
+            return False
+    
+    def encode(self, claims: Dict[str, Any]) -> str:
+        payload = {
+            key: _timestamp(value) if key in _TIME_CLAIMS else value
+            for key, value in claims.items()
+        }
+        payload_segment = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+        signing_input = self._header_segment + b"." + payload_segment
+        return (signing_input + b"." + _b64encode(self._sign(signing_input))).decode()
+    
+    def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            signing_input, signature_segment = token.rsplit(".", 1)
+            header_segment, payload_segment = signing_input.split(".")
+            header = json.loads(_b64decode(header_segment))
+            signature = _b64decode(signature_segment)
+        except (ValueError, TypeError) as e:
+            raise InvalidTokenError("Malformed token") from e
+        
+        if not isinstance(header, dict) or header.get("alg") != self.algorithm:
+            raise InvalidTokenError("Unexpected token algorithm")
+        
+        if not self._verify(signing_input.encode(), signature):
+            raise InvalidTokenError("Signature verification failed")
+        
+        try:
+            payload = json.loads(_b64decode(payload_segment))
+        except (ValueError, TypeError) as e:
+            raise InvalidTokenError("Malformed payload") from e
+        
+        if not isinstance(payload, dict):
+            raise InvalidTokenError("Malformed payload")
+        
+        now = time.time()
+        for claim in _TIME_CLAIMS:
+            if claim in payload and not isinstance(payload[claim], (int, float)):
+                raise InvalidTokenError(f"Invalid {claim} claim")
+        if "exp" in payload and payload["exp"] < now:
+            raise InvalidTokenError("Signature has expired")
+        if "nbf" in payload and payload["nbf"] > now:
+            raise InvalidTokenError("The token is not yet valid")
+        
+        return payload
+
+
+_CODECS = {
+    "jose": JoseCodec,
+    "native": NativeCodec
+}
+
+
+@lru_cache()
+def get_jwt_codec() -> JWTCodec:
+    """Get the codec selected by JWT_CODEC and ALGORITHM"""
+    codec_class = _CODECS.get(settings.JWT_CODEC)
+    if codec_class is None:
+        raise ValueError(f"Unknown JWT codec: {settings.JWT_CODEC}")
+    
+    if settings.ALGORITHM.startswith("HS"):
+        return codec_class(settings.ALGORITHM, settings.SECRET_KEY)
+    return codec_class(settings.ALGORITHM, settings.JWT_PRIVATE_KEY, settings.JWT_PUBLIC_KEY or None)
@@ -0,0 +1,171 @@
+"""
+Write-behind buffer for last login timestamps
+
+Logins record the timestamp in memory instead of writing the user row.
+A background task started from the application lifespan coalesces the
+timestamps per user and writes them with one bulk UPDATE every
+LAST_LOGIN_FLUSH_SECONDS, so stored values lag by at most that long (plus
+one flush). Pending timestamps are flushed on shutdown; a worker that is
+killed loses at most one interval of them.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.middleware.auth import invalidate_principal
+from app.models import User
+
+logger = logging.getLogger(__name__)
+
+# Users updated per UPDATE statement, bounded by driver parameter limits
+FLUSH_CHUNK_SIZE = 500
+
+
+class LastLoginBuffer:
+    """Coalesces last login timestamps and flushes them in bulk"""
+    
+    def __init__(
+        self,
+        session_factory: Optional[async_sessionmaker] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None
+    ):
+        """
+        Arguments default to the LAST_LOGIN_* settings and app.database.AsyncSessionLocal
+        """
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval or settings.LAST_LOGIN_FLUSH_SECONDS
+        self.max_pending = max_pending or settings.LAST_LOGIN_MAX_PENDING
+        self._pending: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._retry_at = 0.0  # After a failed flush, no early flushes before this (monotonic)
+        
+        # Metrics
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+    
+    @property
+    def session_factory(self) -> async_sessionmaker:
+        """Session factory, resolved lazily so SQL settings are only needed when used"""
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+    
+    def record(self, user_id: str, when: Optional[datetime] = None) -> None:
+        """Remember a login; repeated logins of a user before a flush collapse into one"""
+        when = when or datetime.utcnow()
+        previous = self._pending.get(user_id)
+        if previous is None or when > previous:
+            self._pending[user_id] = when
+        self.recorded += 1
+        
+        # A full buffer flushes early, unless the last flush failed: then the
+        # loop retries on its interval instead of on every login
+        if (
+            len(self._pending) >= self.max_pending
+            and self._wakeup is not None
+            and time.monotonic() >= self._retry_at
+        ):
+            self._wakeup.set()
+    
+    def start(self) -> None:
+        """Start the flush loop on the running event loop"""
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="last-login-flusher")
+    
+    async def stop(self) -> None:
+        """Stop the loop and flush what is still pending"""
+        if self._task is None:
+            return
+        
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                await self.flush()
+                self._retry_at = 0.0
+            except Exception as e:
+                logger.error(f"Failed to flush last login timestamps: {e}", exc_info=True)
+                self._retry_at = time.monotonic() + self.flush_interval
+                if not self._stopping:
+                    self._wakeup.clear()
+            
+            if self._stopping:
+                return
+    
+    async def flush(self) -> int:
+        """
+        Write all pending timestamps
+        
+        Timestamps that fail to write are kept for the next flush unless a
+        newer login replaced them in the meantime.
+        
+        Returns:
+            Number of users updated
+        """
+        if not self._pending:
+            return 0
+        
+        pending, self._pending = self._pending, {}
+        items = list(pending.items())
+        
+        try:
+            async with self.session_factory() as session:
+                for start in range(0, len(items), FLUSH_CHUNK_SIZE):
+                    await session.execute(self._update_statement(items[start:start + FLUSH_CHUNK_SIZE]))
+                await session.commit()
+        except Exception:
+            for user_id, when in items:
+                if user_id not in self._pending:
+                    self._pending[user_id] = when
+            raise
+        
+        for user_id, _ in items:
+            invalidate_principal(user_id)
+        
+        self.flushed += len(items)
+        self.flushes += 1
+        return len(items)
+    
+    @staticmethod
+    def _update_statement(items: List[Tuple[str, datetime]]):
+        """One UPDATE setting each user's own timestamp through a CASE on the id"""
+        timestamps = dict(items)
+        return (
+            update(User)
+            .where(User.id.in_(list(timestamps)))
+            .values(last_login=case(timestamps, value=User.id))
+            .execution_options(synchronize_session=False)
+        )
+    
+    def stats(self) -> Dict[str, int]:
+        """Buffer and flush counters"""
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "flushes": self.flushes
+        }
+
+
+last_login_buffer = LastLoginBuffer()
@@ -0,0 +1,340 @@
+"""
+Lightweight in-process metric primitives
+
+Metrics are registered in a Registry as families of labelled children and
+rendered in the Prometheus text format. Children are updated from the event
+loop thread only (no locks), so updates cost a dict lookup and a few
+increments.
+
+With several worker processes, each worker publishes a snapshot of its
+registry to METRICS_DIR every METRICS_PUBLISH_SECONDS; a scrape is answered
+by one worker from all snapshots, so the totals cover every worker.
+"""
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import json
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets for sub-millisecond operations (token decoding, cached lookups)
+FAST_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed upper bounds
+    
+    observe() is a bisect and two increments, cheap enough for hot paths.
+    """
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets: List[float] = sorted(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float) -> None:
+        """Record a value"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Cumulative bucket counts keyed by upper bound, plus sum and count"""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else repr(float(bound))] = cumulative
+        return {"buckets": buckets, "sum": self.sum, "count": self.count}
+
+
+class Counter:
+    """Monotonically increasing value"""
+    
+    def __init__(self):
+        self.value = 0.0
+    
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+    
+    def snapshot(self) -> float:
+        return self.value
+
+
+class Gauge:
+    """Value that goes up and down"""
+    
+    def __init__(self):
+        self.value = 0.0
+    
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+    
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+    
+    def set(self, value: float) -> None:
+        self.value = value
+    
+    def snapshot(self) -> float:
+        return self.value
+
+
+class MetricFamily:
+    """A named metric with one child per combination of label values"""
+    
+    def __init__(self, name: str, documentation: str, kind: str, label_names: Sequence[str], factory: Callable):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.label_names = tuple(label_names)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], Any] = {}
+    
+    def labels(self, *values: str):
+        """Child for the given label values (in label_names order), created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {values}")
+            child = self._children[values] = self._factory()
+        return child
+    
+    def collect(self) -> Dict[str, Any]:
+        """JSON-serializable snapshot of every child"""
+        return {
+            "type": self.kind,
+            "help": self.documentation,
+            "labels": list(self.label_names),
+            "samples": [[list(values), child.snapshot()] for values, child in self._children.items()]
+        }
+
+
+class Registry:
+    """Metric families of this process"""
+    
+    def __init__(self):
+        self.families: Dict[str, MetricFamily] = {}
+    
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        if family.name in self.families:
+            raise ValueError(f"Metric already registered: {family.name}")
+        self.families[family.name] = family
+        return family
+    
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "counter", labels, Counter))
+    
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "gauge", labels, Gauge))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "histogram", labels, lambda: Histogram(buckets)))
+    
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of every family, keyed by name"""
+        return {name: family.collect() for name, family in self.families.items()}
+
+
+def merge_collections(collections: Sequence[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Sum the samples of several processes' collections, series by series"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for collection in collections:
+        for name, family in collection.items():
+            target = merged.setdefault(name, {**family, "samples": {}})
+            for values, value in family["samples"]:
+                key = tuple(values)
+                current = target["samples"].get(key)
+                if current is None:
+                    if isinstance(value, dict):
+                        value = {"buckets": dict(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+                    target["samples"][key] = value
+                elif isinstance(value, dict):
+                    current["sum"] += value["sum"]
+                    current["count"] += value["count"]
+                    for bound, count in value["buckets"].items():
+                        current["buckets"][bound] = current["buckets"].get(bound, 0) + count
+                else:
+                    target["samples"][key] = current + value
+    
+    for family in merged.values():
+        family["samples"] = [[list(key), value] for key, value in family["samples"].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_prometheus(collection: Dict[str, Dict[str, Any]]) -> str:
+    """Render a collection in the Prometheus text exposition format"""
+    lines = []
+    for name, family in sorted(collection.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        names = family["labels"]
+        for values, value in family["samples"]:
+            if family["type"] == "histogram":
+                for bound, count in value["buckets"].items():
+                    lines.append(f"{name}_bucket{_format_labels(names, values, ('le', bound))} {count}")
+                lines.append(f"{name}_sum{_format_labels(names, values)} {repr(float(value['sum']))}")
+                lines.append(f"{name}_count{_format_labels(names, values)} {value['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(names, values)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsDirectory:
+    """
+    Registry snapshots of all worker processes on the host
+    
+    Every worker writes <path>/<pid>.json. Snapshots of exited workers
+    (recycled by the server) are folded into archive.json with their gauges
+    dropped, so counters and histograms keep their totals. Collection is
+    serialized with a file lock on POSIX.
+    """
+    
+    ARCHIVE = "archive.json"
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def _write(self, filename: str, collection: Dict[str, Any]) -> None:
+        target = os.path.join(self.path, filename)
+        temporary = f"{target}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(collection, file)
+        os.replace(temporary, target)
+    
+    def _read(self, filename: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.path, filename)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+    
+    def publish(self, registry: Registry) -> None:
+        """Write this process's snapshot"""
+        os.makedirs(self.path, exist_ok=True)
+        self._write(f"{os.getpid()}.json", registry.collect())
+    
+    def clear(self) -> None:
+        """Remove every snapshot (on server start, before workers are forked)"""
+        if os.path.isdir(self.path):
+            for filename in os.listdir(self.path):
+                if filename.endswith(".json"):
+                    os.remove(os.path.join(self.path, filename))
+    
+    def collect(self, registry: Registry) -> Dict[str, Dict[str, Any]]:
+        """Publish this process's snapshot and merge those of every worker"""
+        self.publish(registry)
+        collections = []
+        
+        with open(os.path.join(self.path, ".lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.lockf(lock, fcntl.LOCK_EX)
+            try:
+                archive = self._read(self.ARCHIVE) or {}
+                archive_changed = False
+                
+                for filename in os.listdir(self.path):
+                    stem, extension = os.path.splitext(filename)
+                    if extension != ".json" or not stem.isdigit():
+                        continue
+                    snapshot = self._read(filename)
+                    if snapshot is None:
+                        continue
+                    
+                    if _process_alive(int(stem)):
+                        collections.append(snapshot)
+                    else:
+                        counters = {name: family for name, family in snapshot.items() if family["type"] != "gauge"}
+                        archive = merge_collections([archive, counters])
+                        archive_changed = True
+                        os.remove(os.path.join(self.path, filename))
+                
+                if archive_changed:
+                    self._write(self.ARCHIVE, archive)
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(lock, fcntl.LOCK_UN)
+        
+        return merge_collections([archive] + collections)
+
+
+class MetricsPublisher:
+    """Publishes the registry to a MetricsDirectory on an interval"""
+    
+    def __init__(self, registry: Registry, directory: MetricsDirectory, interval: float):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start the publish loop on the running event loop"""
+        self._task = asyncio.create_task(self._run(), name="metrics-publisher")
+    
+    async def stop(self) -> None:
+        """Stop the loop and publish a final snapshot"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.directory.publish(self.registry)
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.directory.publish(self.registry)
+            except OSError as e:
+                logger.error(f"Failed to publish metrics: {e}")
+
+
+registry = Registry()
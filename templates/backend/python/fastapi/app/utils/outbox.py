@@ -0,0 +1,232 @@
+"""
+Transactional email outbox and background dispatcher
+
+Handlers add an outbox row in the same transaction as the user change and
+return as soon as it commits. The dispatcher, started from the application
+lifespan, delivers due messages with bounded concurrency, retries failures
+with exponential backoff and dead-letters messages that keep failing.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+import asyncio
+import json
+import logging
+
+from app.config import settings
+from app.models import EmailOutbox
+from app.utils.email import send_verification_email, send_password_reset_email
+
+logger = logging.getLogger(__name__)
+
+# Outbox template name -> sender called as sender(to_email, **payload)
+EMAIL_SENDERS: Dict[str, Callable[..., Awaitable[None]]] = {
+    "verification": send_verification_email,
+    "password_reset": send_password_reset_email
+}
+
+# Claimed messages are retried by any worker once this lease runs out
+CLAIM_LEASE_SECONDS = 300
+
+
+def enqueue_email(db: AsyncSession, to_email: str, template: str, payload: Dict[str, Any]) -> EmailOutbox:
+    """
+    Add an email to the outbox as part of the caller's transaction
+    
+    Nothing is sent until the caller commits; call email_dispatcher.notify()
+    afterwards to deliver without waiting for the next poll.
+    
+    Args:
+        db: Database session of the current request
+        to_email: Recipient email address
+        template: Key of EMAIL_SENDERS
+        payload: Template context, must be JSON serializable
+    
+    Returns:
+        The pending outbox row
+    """
+    if template not in EMAIL_SENDERS:
+        raise ValueError(f"Unknown email template: {template}")
+    
+    message = EmailOutbox(
+        to_email=to_email,
+        template=template,
+        payload=json.dumps(payload),
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.add(message)
+    return message
+
+
+class EmailDispatcher:
+    """Background task draining the email outbox"""
+    
+    def __init__(
+        self,
+        session_factory: Optional[async_sessionmaker] = None,
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        backoff: Optional[float] = None,
+        backoff_max: Optional[float] = None
+    ):
+        """
+        Arguments default to the EMAIL_* settings and app.database.AsyncSessionLocal
+        """
+        self._session_factory = session_factory
+        self.concurrency = concurrency or settings.EMAIL_DISPATCH_CONCURRENCY
+        self.batch_size = batch_size or settings.EMAIL_DISPATCH_BATCH_SIZE
+        self.poll_interval = poll_interval or settings.EMAIL_DISPATCH_POLL_SECONDS
+        self.max_attempts = max_attempts or settings.EMAIL_MAX_ATTEMPTS
+        self.backoff = backoff or settings.EMAIL_RETRY_BACKOFF_SECONDS
+        self.backoff_max = backoff_max or settings.EMAIL_RETRY_BACKOFF_MAX_SECONDS
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+    
+    @property
+    def session_factory(self) -> async_sessionmaker:
+        """Session factory, resolved lazily so SQL settings are only needed when used"""
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+    
+    def start(self) -> None:
+        """Start the dispatcher loop on the running event loop"""
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="email-dispatcher")
+    
+    async def stop(self) -> None:
+        """Finish in-flight deliveries and stop the loop"""
+        if self._task is None:
+            return
+        
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+    
+    def notify(self) -> None:
+        """Wake the dispatcher after committing new outbox rows"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                delivered = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Email dispatcher iteration failed: {e}", exc_info=True)
+                delivered = 0
+            
+            # A full batch means more messages are probably due
+            if delivered >= self.batch_size:
+                continue
+            
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+    
+    async def dispatch_once(self) -> int:
+        """
+        Claim and deliver one batch of due messages
+        
+        Returns:
+            Number of messages attempted
+        """
+        messages = await self._claim_batch()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def deliver(message: EmailOutbox):
+            async with semaphore:
+                await self._deliver(message)
+        
+        await asyncio.gather(*(deliver(message) for message in messages))
+        return len(messages)
+    
+    async def _claim_batch(self) -> List[EmailOutbox]:
+        """
+        Lease due messages so other workers skip them
+        
+        Due rows are locked with SELECT ... FOR UPDATE SKIP LOCKED and leased
+        with a single conditional UPDATE, so concurrent dispatchers never
+        deliver the same message twice within a lease. Without row locks
+        (SQLite), a dispatcher that lost some rows to another one keeps only
+        those carrying its own lease.
+        """
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+        due = EmailOutbox.status.in_(("pending", "sending")) & (EmailOutbox.next_attempt_at <= now)
+        
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(EmailOutbox.id)
+                .where(due)
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            candidate_ids = result.scalars().all()
+            if not candidate_ids:
+                return []
+            
+            result = await session.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(candidate_ids), due)
+                .values(status="sending", next_attempt_at=lease_until)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            
+            claimed = select(EmailOutbox).where(EmailOutbox.id.in_(candidate_ids))
+            if result.rowcount != len(candidate_ids):
+                claimed = claimed.where(EmailOutbox.status == "sending", EmailOutbox.next_attempt_at == lease_until)
+            result = await session.execute(claimed)
+            return list(result.scalars().all())
+    
+    def _retry_delay(self, attempts: int) -> float:
+        """Exponential backoff after the given number of failed attempts"""
+        return min(self.backoff * (2 ** (attempts - 1)), self.backoff_max)
+    
+    async def _deliver(self, message: EmailOutbox) -> None:
+        """Send one message and record the outcome"""
+        error: Optional[str] = None
+        try:
+            sender = EMAIL_SENDERS[message.template]
+            await sender(message.to_email, **json.loads(message.payload))
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        
+        attempts = message.attempts + 1
+        now = datetime.utcnow()
+        
+        if error is None:
+            # Drop the token once it has been delivered
+            values = {"status": "sent", "attempts": attempts, "sent_at": now, "payload": "{}", "last_error": None}
+        elif attempts >= self.max_attempts:
+            logger.error(f"Dead-lettering {message.template} email to {message.to_email} after {attempts} attempts: {error}")
+            values = {"status": "dead", "attempts": attempts, "last_error": error}
+        else:
+            delay = self._retry_delay(attempts)
+            logger.warning(f"Failed to send {message.template} email to {message.to_email}, retrying in {delay:.0f}s: {error}")
+            values = {
+                "status": "pending",
+                "attempts": attempts,
+                "last_error": error,
+                "next_attempt_at": now + timedelta(seconds=delay)
+            }
+        
+        async with self.session_factory() as session:
+            await session.execute(update(EmailOutbox).where(EmailOutbox.id == message.id).values(**values))
+            await session.commit()
+
+
+email_dispatcher = EmailDispatcher()
@@ -0,0 +1,100 @@
+"""
+Keyset (cursor) pagination helpers
+
+A page is selected with a row-value comparison on an ordered, unique key
+instead of OFFSET, so the database seeks straight to the first row through
+an index no matter how deep the page is, and rows inserted or deleted
+between requests never shift or repeat results.
+"""
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from sqlalchemy import Select, literal, tuple_
+import base64
+import json
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+    pass
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode the key values of the last row of a page as an opaque cursor
+    
+    Args:
+        values: Key values in key order; datetimes are kept as ISO strings
+    
+    Returns:
+        URL-safe cursor string
+    """
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, datetime_positions: Sequence[int] = ()) -> List[Any]:
+    """
+    Decode a cursor created by encode_cursor
+    
+    Args:
+        cursor: Cursor string from a previous page
+        datetime_positions: Indexes of the values to parse back into datetimes
+    
+    Returns:
+        Key values in key order
+    
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list):
+            raise ValueError("cursor is not a list")
+        for position in datetime_positions:
+            values[position] = datetime.fromisoformat(values[position])
+    except (ValueError, TypeError, IndexError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}") from e
+    return values
+
+
+def keyset_page(stmt: Select, keys: Sequence[Any], after: Optional[Sequence[Any]], limit: int) -> Select:
+    """
+    Restrict a select to the page following the given key values
+    
+    One extra row is fetched so page_cursor can tell whether another page
+    follows without a COUNT query.
+    
+    Args:
+        stmt: Select statement to paginate
+        keys: Ordered key columns; together they must be unique and indexed
+        after: Key values of the last row of the previous page, None for the first page
+        limit: Page size
+    
+    Returns:
+        The paginated select
+    """
+    if after is not None:
+        bound = [literal(value, type_=key.type) for key, value in zip(keys, after)]
+        stmt = stmt.where(tuple_(*keys) > tuple_(*bound))
+    return stmt.order_by(*keys).limit(limit + 1)
+
+
+def page_cursor(rows: Sequence[Any], key_names: Sequence[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Split the rows fetched by keyset_page into the page and the next cursor
+    
+    Args:
+        rows: Rows returned by the keyset_page select
+        key_names: Attribute names of the key columns, in key order
+        limit: Page size passed to keyset_page
+    
+    Returns:
+        Rows of the page and the cursor of the next page (None on the last page)
+    """
+    page = list(rows[:limit])
+    if len(rows) <= limit:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor([getattr(last, name) for name in key_names])
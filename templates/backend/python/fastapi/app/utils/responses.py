@@ -0,0 +1,63 @@
+"""
+Fast JSON responses
+
+FastJSONResponse is the application's default response class. It encodes
+content with the encoder selected by JSON_ENCODER:
+
+- orjson: orjson when installed, pydantic otherwise
+- pydantic: pydantic_core.to_json, always available with pydantic v2
+- json: the stdlib encoder of the plain JSONResponse
+"""
+from functools import lru_cache
+from typing import Any, Callable
+import json
+import logging
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json, to_jsonable_python
+
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _orjson_dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=to_jsonable_python, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _stdlib_dumps(content: Any) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+_ENCODERS = {
+    "orjson": _orjson_dumps,
+    "pydantic": to_json,
+    "json": _stdlib_dumps
+}
+
+
+@lru_cache()
+def get_json_encoder() -> Callable[[Any], bytes]:
+    """Get the encoder selected by JSON_ENCODER"""
+    name = settings.JSON_ENCODER
+    if name == "orjson" and orjson is None:
+        logger.warning("orjson is not installed, encoding JSON responses with pydantic")
+        name = "pydantic"
+    
+    encoder = _ENCODERS.get(name)
+    if encoder is None:
+        raise ValueError(f"Unknown JSON encoder: {settings.JSON_ENCODER}")
+    return encoder
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with the JSON_ENCODER encoder"""
+    
+    def render(self, content: Any) -> bytes:
+        return get_json_encoder()(content)
+
@@ -2,13 +2,91 @@
 Security utilities for password hashing and verification
 """
 from passlib.context import CryptContext
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List, Tuple, TypeVar
 from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.jwt_codec import InvalidTokenError, get_jwt_codec
+from app.utils.metrics import FAST_BUCKETS, registry
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Calibration bounds
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+ARGON2_MEMORY_COST = 65536  # KiB
+ARGON2_MAX_TIME_COST = 10
+_CALIBRATION_PASSWORD = "Calibration-Password-123"
+
+
+def _cost_params(rounds: int) -> Dict[str, Any]:
+    """
+    Context settings for a given cost (bcrypt rounds or argon2 time_cost)
+    
+    The cost is also the minimum, so needs_update() flags weaker stored hashes.
+    """
+    scheme = settings.PASSWORD_HASH_SCHEME
+    params = {f"{scheme}__rounds": rounds, f"{scheme}__min_rounds": rounds}
+    if scheme == "argon2":
+        params["argon2__memory_cost"] = ARGON2_MEMORY_COST
+    return params
+
+
+def _default_hash_params() -> Dict[str, Any]:
+    """Hashing parameters used when calibration is disabled"""
+    if settings.PASSWORD_HASH_SCHEME == "argon2":
+        return {"argon2__memory_cost": ARGON2_MEMORY_COST}
+    return _cost_params(settings.BCRYPT_ROUNDS)
+
+
+def _build_context(params: Dict[str, Any]) -> CryptContext:
+    """Build the hashing context; hashes in any other scheme are marked deprecated"""
+    schemes = [settings.PASSWORD_HASH_SCHEME]
+    if settings.PASSWORD_HASH_SCHEME != "bcrypt":
+        schemes.append("bcrypt")
+    return CryptContext(schemes=schemes, deprecated="auto", **params)
+
 
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_hash_params: Dict[str, Any] = _default_hash_params()
+pwd_context = _build_context(_hash_params)
+
+# Verified token payloads keyed by token digest
+token_cache: TTLCache[Any] = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_NEGATIVE_TTL_SECONDS
+)
+_INVALID_TOKEN = object()
+
+# Password hashing pool (created lazily on first use)
+_hash_executor: Optional[Executor] = None
+_hash_pending: int = 0
+
+password_hash_seconds = registry.histogram(
+    "password_hash_seconds",
+    "Time to hash or verify one password in the hashing pool, excluding queueing",
+    labels=("operation",)
+)
+token_decode_seconds = registry.histogram(
+    "token_decode_seconds",
+    "decode_token latency by token cache outcome",
+    labels=("cache",),
+    buckets=FAST_BUCKETS
+)
+_token_decode_hit = token_decode_seconds.labels("hit")
+_token_decode_miss = token_decode_seconds.labels("miss")
+
+
+class PasswordHashingBusyError(Exception):
+    """Raised when the password hashing queue is full"""
 
 
 def hash_password(password: str) -> str:
@@ -21,6 +99,220 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash several passwords in one call (one pool job per slice in bulk imports)"""
+    return [hash_password(password) for password in passwords]
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a stored hash uses an outdated scheme or cost"""
+    return pwd_context.needs_update(hashed_password)
+
+
+def configure_password_hashing(params: Dict[str, Any]) -> None:
+    """
+    Apply hashing parameters to the password context
+    
+    Also used as the initializer of process pool workers so they hash
+    with the same parameters as the parent process.
+    
+    Args:
+        params: CryptContext keyword settings, e.g. {"bcrypt__rounds": 12}
+    """
+    global _hash_params, pwd_context
+    
+    _hash_params = dict(params)
+    pwd_context = _build_context(_hash_params)
+
+
+def get_password_hashing_params() -> Dict[str, Any]:
+    """Get the hashing parameters currently in use"""
+    return {"scheme": settings.PASSWORD_HASH_SCHEME, **_hash_params}
+
+
+def _time_hash(context: CryptContext) -> float:
+    """Time a single hash with the given context, in seconds"""
+    start = time.perf_counter()
+    context.hash(_CALIBRATION_PASSWORD)
+    return time.perf_counter() - start
+
+
+def calibrate_password_hashing(target_ms: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Pick the hashing cost closest to a target per-hash latency on this host
+    
+    Bcrypt rounds double the work per step, so the cost is raised from the
+    minimum until the next step would overshoot the target. Argon2 keeps a
+    fixed memory cost and raises time_cost until the target is reached.
+    
+    Args:
+        target_ms: Target latency per hash (defaults to PASSWORD_HASH_TARGET_MS)
+        
+    Returns:
+        Chosen parameters and the measured latency
+    """
+    target = (target_ms or settings.PASSWORD_HASH_TARGET_MS) / 1000
+    
+    if settings.PASSWORD_HASH_SCHEME == "argon2":
+        time_cost = 1
+        elapsed = _time_hash(_build_context(_cost_params(time_cost)))
+        while elapsed < target and time_cost < ARGON2_MAX_TIME_COST:
+            time_cost += 1
+            elapsed = _time_hash(_build_context(_cost_params(time_cost)))
+        params = _cost_params(time_cost)
+    else:
+        rounds = BCRYPT_MIN_ROUNDS
+        elapsed = _time_hash(_build_context(_cost_params(rounds)))
+        while elapsed * 2 <= target and rounds < BCRYPT_MAX_ROUNDS:
+            rounds += 1
+            elapsed *= 2
+        params = _cost_params(rounds)
+        elapsed = _time_hash(_build_context(params))
+    
+    configure_password_hashing(params)
+    # Recreate process workers with the new parameters
+    shutdown_hash_executor()
+    
+    report = {**get_password_hashing_params(), "measured_ms": round(elapsed * 1000, 1)}
+    logger.info(f"Password hashing calibrated: {report}")
+    return report
+
+
+def _hash_worker_count() -> int:
+    """Number of workers in the password hashing pool"""
+    return settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+
+
+def get_hash_executor() -> Executor:
+    """
+    Get the executor used for password hashing, creating it on first use
+    
+    Returns:
+        Thread or process pool, depending on PASSWORD_HASH_EXECUTOR
+    """
+    global _hash_executor
+    
+    if _hash_executor is None:
+        workers = _hash_worker_count()
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=configure_password_hashing,
+                initargs=(_hash_params,)
+            )
+        else:
+            _hash_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+    
+    return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    """Shut down the password hashing pool"""
+    global _hash_executor
+    
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True, cancel_futures=True)
+        _hash_executor = None
+
+
+def _timed_call(func: Callable[..., T], *args: Any) -> Tuple[T, float]:
+    """Call func and return its result with its duration, measured in the pool worker"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+async def _run_in_hash_pool(func: Callable[..., T], *args: Any, operation: str, passwords: int = 1) -> T:
+    """
+    Run a blocking hashing function in the password hashing pool
+    
+    Args:
+        func: Hashing function
+        *args: Its arguments
+        operation: password_hash_seconds label ("hash" or "verify")
+        passwords: Number of passwords func handles; each is timed at an equal share
+    
+    Raises:
+        PasswordHashingBusyError: If the workers and the queue are all busy
+    """
+    global _hash_pending
+    
+    if _hash_pending >= _hash_worker_count() + settings.PASSWORD_HASH_QUEUE_SIZE:
+        raise PasswordHashingBusyError("Password hashing queue is full")
+    
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        result, seconds = await loop.run_in_executor(get_hash_executor(), _timed_call, func, *args)
+    finally:
+        _hash_pending -= 1
+    
+    # Observed here, on the event loop, so process pool workers are timed too
+    timer = password_hash_seconds.labels(operation)
+    for _ in range(passwords):
+        timer.observe(seconds / passwords)
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password in the hashing pool without blocking the event loop"""
+    return await _run_in_hash_pool(hash_password, password, operation="hash")
+
+
+async def hash_passwords_async(passwords: List[str], busy_retry_seconds: float = 0.05) -> List[str]:
+    """
+    Hash a batch of passwords across all hashing workers
+    
+    The batch is split into one job per worker, so it takes at most that
+    many queue slots. When the queue is full the batch waits and retries
+    instead of failing, letting interactive logins go first.
+    """
+    workers = _hash_worker_count()
+    slice_size = -(-len(passwords) // workers) or 1
+    slices = [passwords[i:i + slice_size] for i in range(0, len(passwords), slice_size)]
+    
+    async def hash_slice(batch: List[str]) -> List[str]:
+        while True:
+            try:
+                return await _run_in_hash_pool(hash_passwords, batch, operation="hash", passwords=len(batch))
+            except PasswordHashingBusyError:
+                await asyncio.sleep(busy_retry_seconds)
+    
+    results = await asyncio.gather(*(hash_slice(batch) for batch in slices))
+    return [hashed for batch in results for hashed in batch]
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the hashing pool without blocking the event loop"""
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password, operation="verify")
+
+
+def build_token_data(user: Any) -> Dict[str, Any]:
+    """
+    Build the token payload for a user
+    
+    Always carries the token version so tokens can be revoked. Authorization
+    claims are embedded when AUTH_TOKEN_CLAIMS is enabled or AUTH_MODE is
+    "stateless", letting role checks skip the database.
+    
+    Args:
+        user: User model instance
+        
+    Returns:
+        Data to pass to create_access_token / create_refresh_token
+    """
+    data = {"sub": user.email, "user_id": user.id, "ver": user.token_version or 0}
+    
+    if settings.AUTH_TOKEN_CLAIMS or settings.AUTH_MODE == "stateless":
+        data.update({
+            "is_active": bool(user.is_active),
+            "is_verified": bool(user.is_verified),
+            "is_superuser": bool(user.is_superuser)
+        })
+    
+    return data
+
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
     Create JWT access token
@@ -45,7 +337,7 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
         "type": "access"
     })
     
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    encoded_jwt = get_jwt_codec().encode(to_encode)
     return encoded_jwt
 
 
@@ -68,25 +360,59 @@ def create_refresh_token(data: Dict[str, Any]) -> str:
         "type": "refresh"
     })
     
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    encoded_jwt = get_jwt_codec().encode(to_encode)
     return encoded_jwt
 
 
+def verify_token(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Verify a JWT signature and claims without consulting the token cache
+    
+    Args:
+        token: JWT token to decode
+        
+    Returns:
+        Decoded token payload or None if invalid
+    """
+    try:
+        return get_jwt_codec().decode(token)
+    except InvalidTokenError:
+        return None
+
+
 def decode_token(token: str) -> Optional[Dict[str, Any]]:
     """
     Decode and verify JWT token
     
+    Verified payloads are cached until the token's exp, and invalid tokens
+    for TOKEN_CACHE_NEGATIVE_TTL_SECONDS, keyed by a digest of the token.
+    
     Args:
         token: JWT token to decode
         
     Returns:
         Decoded token payload or None if invalid
     """
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    start = time.perf_counter()
+    key = hashlib.sha256(token.encode()).digest()
+    cached = token_cache.get(key)
+    
+    if cached is not None:
+        payload = None if cached is _INVALID_TOKEN else dict(cached)
+        _token_decode_hit.observe(time.perf_counter() - start)
         return payload
-    except JWTError:
-        return None
+    
+    payload = verify_token(token)
+    
+    if payload is None:
+        token_cache.set(key, _INVALID_TOKEN, ttl=settings.TOKEN_CACHE_NEGATIVE_TTL_SECONDS)
+    else:
+        exp = payload.get("exp")
+        if exp is not None and exp - time.time() > 0:
+            token_cache.set(key, dict(payload), ttl=exp - time.time())
+    
+    _token_decode_miss.observe(time.perf_counter() - start)
+    return payload
 
 
 def create_email_verification_token(email: str) -> str:
@@ -108,7 +434,7 @@ def create_email_verification_token(email: str) -> str:
         "iat": datetime.utcnow()
     }
     
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return get_jwt_codec().encode(to_encode)
 
 
 def create_password_reset_token(email: str) -> str:
@@ -130,4 +456,4 @@ def create_password_reset_token(email: str) -> str:
         "iat": datetime.utcnow()
     }
     
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return get_jwt_codec().encode(to_encode)
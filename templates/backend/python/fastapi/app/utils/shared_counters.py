@@ -0,0 +1,226 @@
+"""
+Counters shared by all worker processes on a host
+
+A fixed-size hash table lives in a memory-mapped file. Every key maps to a
+bucket of slots; a bucket is updated under an fcntl byte-range lock on its
+region of the file, so read-modify-write updates are atomic across
+processes while different buckets are updated in parallel. The file
+outlives worker restarts, so counters do too. POSIX only.
+"""
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple, Union
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Header: magic, slot count
+_HEADER = struct.Struct("<8sQ")
+_MAGIC = b"SHCNT001"
+# Slot: key hash (0 = empty), value, timestamp
+_SLOT = struct.Struct("<Qdd")
+BUCKET_SLOTS = 8
+
+# update() callback: (value, stamp, found) -> (value, stamp)
+Updater = Callable[[float, float, bool], Tuple[float, float]]
+
+
+def _key_hash(key: str) -> int:
+    """Stable across processes (unlike hash()); never 0, which marks empty slots"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") | 1
+
+
+class SharedCounterTable:
+    """Memory-mapped table of (value, timestamp) pairs keyed by string"""
+    
+    def __init__(self, path: str, slots: int = 65536):
+        """
+        Args:
+            path: File backing the table; created if missing
+            slots: Table capacity, rounded up to whole buckets. When a bucket
+                is full, the entry with the oldest timestamp is evicted.
+        """
+        if fcntl is None:
+            raise RuntimeError("Shared counters need fcntl (POSIX); use in-memory storage instead")
+        self.path = path
+        self.buckets = max(1, -(-slots // BUCKET_SLOTS))
+        self.slots = self.buckets * BUCKET_SLOTS
+        self._bucket_bytes = BUCKET_SLOTS * _SLOT.size
+        self._size = _HEADER.size + self.buckets * self._bucket_bytes
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+    
+    def _open(self) -> None:
+        """Map the file, (re)initializing it if its layout does not match"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        
+        fcntl.lockf(fd, fcntl.LOCK_EX, _HEADER.size, 0)
+        try:
+            header = os.pread(fd, _HEADER.size, 0)
+            if len(header) < _HEADER.size or _HEADER.unpack(header) != (_MAGIC, self.slots) \
+                    or os.fstat(fd).st_size != self._size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self._size)
+                os.pwrite(fd, _HEADER.pack(_MAGIC, self.slots), 0)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, _HEADER.size, 0)
+        
+        self._fd = fd
+        self._map = mmap.mmap(fd, self._size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self._pid = os.getpid()
+    
+    def _ensure_open(self) -> None:
+        # Reopen in forked children (e.g. preloaded apps) so locks belong to this process
+        if self._pid != os.getpid():
+            self._open()
+    
+    @contextmanager
+    def _bucket(self, bucket: int) -> Iterator[int]:
+        """Lock a bucket and yield its file offset"""
+        offset = _HEADER.size + bucket * self._bucket_bytes
+        with self._lock:
+            self._ensure_open()
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._bucket_bytes, offset)
+            try:
+                yield offset
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._bucket_bytes, offset)
+    
+    def update(self, key: str, updater: Updater) -> Tuple[float, float]:
+        """
+        Atomically replace the value and timestamp of a key
+        
+        Args:
+            key: Counter key
+            updater: Called with the current value, timestamp and whether the
+                key exists ((0, 0, False) otherwise); returns the new pair
+        
+        Returns:
+            The stored (value, timestamp)
+        """
+        key_hash = _key_hash(key)
+        with self._bucket(key_hash % self.buckets) as offset:
+            slot_offset, found = self._find(offset, key_hash)
+            _, value, stamp = _SLOT.unpack_from(self._map, slot_offset) if found else (0, 0.0, 0.0)
+            value, stamp = updater(value, stamp, found)
+            _SLOT.pack_into(self._map, slot_offset, key_hash, value, stamp)
+            return value, stamp
+    
+    def get(self, key: str) -> Optional[Tuple[float, float]]:
+        """Current (value, timestamp) of a key, or None"""
+        key_hash = _key_hash(key)
+        with self._bucket(key_hash % self.buckets) as offset:
+            slot_offset, found = self._find(offset, key_hash)
+            if not found:
+                return None
+            _, value, stamp = _SLOT.unpack_from(self._map, slot_offset)
+            return value, stamp
+    
+    def delete(self, key: str) -> None:
+        """Remove a key"""
+        key_hash = _key_hash(key)
+        with self._bucket(key_hash % self.buckets) as offset:
+            slot_offset, found = self._find(offset, key_hash)
+            if found:
+                _SLOT.pack_into(self._map, slot_offset, 0, 0.0, 0.0)
+    
+    def clear(self) -> int:
+        """
+        Remove every key
+        
+        Returns:
+            Number of keys removed
+        """
+        removed = 0
+        for bucket in range(self.buckets):
+            with self._bucket(bucket) as offset:
+                for slot in range(BUCKET_SLOTS):
+                    slot_offset = offset + slot * _SLOT.size
+                    if _SLOT.unpack_from(self._map, slot_offset)[0]:
+                        _SLOT.pack_into(self._map, slot_offset, 0, 0.0, 0.0)
+                        removed += 1
+        return removed
+    
+    def _find(self, offset: int, key_hash: int) -> Tuple[int, bool]:
+        """
+        Slot of a key within its locked bucket
+        
+        Returns:
+            Offset of the key's slot and True, or of a free (or evicted) slot and False
+        """
+        free: Optional[int] = None
+        oldest: Tuple[float, int] = (float("inf"), offset)
+        
+        for slot in range(BUCKET_SLOTS):
+            slot_offset = offset + slot * _SLOT.size
+            slot_hash, _, stamp = _SLOT.unpack_from(self._map, slot_offset)
+            if slot_hash == key_hash:
+                return slot_offset, True
+            if slot_hash == 0:
+                if free is None:
+                    free = slot_offset
+            elif stamp < oldest[0]:
+                oldest = (stamp, slot_offset)
+        
+        return (free if free is not None else oldest[1]), False
+    
+    def close(self) -> None:
+        """Unmap the file (the counters stay in it)"""
+        with self._lock:
+            if self._map is not None and self._pid == os.getpid():
+                self._map.close()
+                os.close(self._fd)
+            self._map = None
+            self._fd = None
+            self._pid = None
+
+
+class LocalCounterTable:
+    """Per-process stand-in for SharedCounterTable where fcntl is unavailable"""
+    
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+    
+    def update(self, key: str, updater: Updater) -> Tuple[float, float]:
+        with self._lock:
+            entry = self._entries.get(key)
+            value, stamp = updater(*(entry or (0.0, 0.0)), entry is not None)
+            self._entries[key] = (value, stamp)
+            return value, stamp
+    
+    def get(self, key: str) -> Optional[Tuple[float, float]]:
+        return self._entries.get(key)
+    
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+    
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+    
+    def close(self) -> None:
+        pass
+
+
+def open_counter_table(path: str, slots: int = 65536) -> Union[SharedCounterTable, LocalCounterTable]:
+    """Shared table at path, or a per-process one (with a warning) on platforms without fcntl"""
+    if fcntl is None:
+        logger.warning(f"fcntl unavailable, counters in {path} are kept per process instead")
+        return LocalCounterTable()
+    return SharedCounterTable(path, slots=slots)
@@ -0,0 +1,225 @@
+"""
+Pool of persistent, authenticated SMTP connections
+
+Opening an SMTP session costs a TCP handshake, TLS and AUTH round trips.
+The pool keeps up to SMTP_POOL_SIZE sessions open and reuses them across
+messages, checks connections that sat idle with NOOP before reuse, closes
+them after SMTP_POOL_IDLE_SECONDS and reconnects once if a send fails on a
+dropped connection.
+"""
+from email.message import Message
+from typing import Any, Dict, List, Optional
+import aiosmtplib
+import asyncio
+import logging
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledConnection:
+    """An open SMTP client and its usage counters"""
+    
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """Bounded pool of reusable SMTP connections"""
+    
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        healthcheck_after: Optional[float] = None
+    ):
+        """
+        Arguments default to the SMTP_POOL_* settings
+        """
+        self.size = size or settings.SMTP_POOL_SIZE
+        self.idle_timeout = idle_timeout or settings.SMTP_POOL_IDLE_SECONDS
+        self.healthcheck_after = healthcheck_after or settings.SMTP_POOL_HEALTHCHECK_SECONDS
+        self._semaphore = asyncio.Semaphore(self.size)
+        self._idle: List[_PooledConnection] = []
+        self._reaper: Optional[asyncio.Task] = None
+        
+        # Metrics
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.reconnects = 0
+        self.messages_sent = 0
+        self.send_failures = 0
+        self.max_messages_per_connection = 0
+    
+    async def open(self) -> None:
+        """Start closing idle connections in the background"""
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_idle(), name="smtp-pool-reaper")
+    
+    async def close(self) -> None:
+        """Stop the reaper and close every idle connection"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await self._discard(connection, graceful=True)
+    
+    async def _connect(self) -> _PooledConnection:
+        """Open and authenticate a new SMTP session"""
+        client = aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USER or None,
+            password=settings.SMTP_PASSWORD or None,
+            use_tls=settings.SMTP_USE_TLS,
+            timeout=settings.SMTP_TIMEOUT_SECONDS
+        )
+        await client.connect()
+        self.connections_opened += 1
+        return _PooledConnection(client)
+    
+    async def _discard(self, connection: _PooledConnection, graceful: bool = False) -> None:
+        """Close a connection, sending QUIT when it is still usable"""
+        self.connections_closed += 1
+        self.max_messages_per_connection = max(self.max_messages_per_connection, connection.messages_sent)
+        try:
+            if graceful and connection.client.is_connected:
+                await connection.client.quit()
+            else:
+                connection.client.close()
+        except Exception:
+            connection.client.close()
+    
+    async def _acquire(self) -> _PooledConnection:
+        """Get a healthy idle connection or open a new one (holds a pool slot)"""
+        await self._semaphore.acquire()
+        try:
+            while self._idle:
+                connection = self._idle.pop()
+                idle_for = time.monotonic() - connection.last_used
+                
+                if idle_for > self.idle_timeout or not connection.client.is_connected:
+                    await self._discard(connection)
+                    continue
+                
+                if idle_for > self.healthcheck_after:
+                    try:
+                        await connection.client.noop()
+                    except Exception:
+                        await self._discard(connection)
+                        continue
+                
+                return connection
+            
+            return await self._connect()
+        except BaseException:
+            self._semaphore.release()
+            raise
+    
+    def _release(self, connection: _PooledConnection) -> None:
+        """Return a connection to the pool and free its slot"""
+        connection.last_used = time.monotonic()
+        self._idle.append(connection)
+        self._semaphore.release()
+    
+    async def send(self, message: Message) -> None:
+        """
+        Send a message over a pooled connection
+        
+        If the connection turns out to be dropped, the message is retried
+        once on a fresh connection.
+        
+        Raises:
+            aiosmtplib.SMTPException: If the server rejects the message
+        """
+        connection = await self._acquire()
+        
+        for attempt in range(2):
+            try:
+                await connection.client.send_message(message)
+            except aiosmtplib.SMTPResponseException:
+                # Server answered; the session itself is still usable
+                self.send_failures += 1
+                try:
+                    await connection.client.rset()
+                except Exception:
+                    await self._discard(connection)
+                    self._semaphore.release()
+                    raise
+                self._release(connection)
+                raise
+            except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPTimeoutError, ConnectionError):
+                await self._discard(connection)
+                if attempt == 1:
+                    self.send_failures += 1
+                    self._semaphore.release()
+                    raise
+                try:
+                    connection = await self._connect()
+                except BaseException:
+                    self.send_failures += 1
+                    self._semaphore.release()
+                    raise
+                self.reconnects += 1
+                continue
+            except BaseException:
+                self.send_failures += 1
+                await self._discard(connection)
+                self._semaphore.release()
+                raise
+            
+            connection.messages_sent += 1
+            self.messages_sent += 1
+            self._release(connection)
+            return
+    
+    async def _reap_idle(self) -> None:
+        """Periodically close connections idle longer than the timeout"""
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            now = time.monotonic()
+            expired = [c for c in self._idle if now - c.last_used > self.idle_timeout]
+            for connection in expired:
+                self._idle.remove(connection)
+                await self._discard(connection, graceful=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Connection and per-connection message counters"""
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "connections_opened": self.connections_opened,
+            "connections_closed": self.connections_closed,
+            "reconnects": self.reconnects,
+            "messages_sent": self.messages_sent,
+            "send_failures": self.send_failures,
+            "messages_per_connection": (
+                round(self.messages_sent / self.connections_opened, 2) if self.connections_opened else 0
+            ),
+            "max_messages_per_connection": max(
+                [self.max_messages_per_connection] + [c.messages_sent for c in self._idle]
+            )
+        }
+
+
+smtp_pool = SMTPConnectionPool()
+
+
+async def init_email_pool():
+    """Start the SMTP connection pool"""
+    await smtp_pool.open()
+
+
+async def close_email_pool():
+    """Close pooled SMTP connections"""
+    await smtp_pool.close()
@@ -0,0 +1,217 @@
+"""
+Bulk user import from streamed NDJSON or CSV uploads
+
+Records are validated with the registration schema and processed in
+chunks: one IN query per unique column checks existing users, passwords
+are hashed across the hashing pool, and the chunk is inserted with a single
+executemany INSERT and commit.
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Union
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+import csv
+import json
+import uuid
+
+from app.models import User
+from app.schemas import UserCreate
+from app.utils.security import hash_passwords_async
+
+# Upload content type -> record format
+IMPORT_FORMATS: Dict[str, str] = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv"
+}
+
+
+def _decode_line(line: bytes) -> Union[str, ValueError]:
+    try:
+        return line.rstrip(b"\r").decode("utf-8")
+    except UnicodeDecodeError as e:
+        return ValueError(f"Invalid UTF-8 at byte {e.start}")
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Union[str, ValueError]]:
+    """
+    Split a streamed UTF-8 body into lines as it arrives
+    
+    The body is split on newline bytes, which never occur inside a UTF-8
+    sequence, and each line is decoded on its own. A line that is not valid
+    UTF-8 is yielded as a ValueError so only that row fails.
+    """
+    pending = b""
+    async for chunk in stream:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield _decode_line(line)
+    if pending:
+        yield _decode_line(pending)
+
+
+async def iter_records(stream: AsyncIterator[bytes], import_format: str) -> AsyncIterator[Any]:
+    """
+    Parse a streamed upload into raw records
+    
+    CSV uploads need a header row; quoted fields cannot span lines.
+    Lines that fail to parse are yielded as ValueError instances so they
+    are reported against their row.
+    """
+    header: Optional[List[str]] = None
+    
+    async for line in iter_lines(stream):
+        if isinstance(line, ValueError):
+            yield line
+            continue
+        if not line.strip():
+            continue
+        
+        if import_format == "ndjson":
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Record must be a JSON object")
+                yield record
+            except ValueError as e:
+                yield ValueError(f"Invalid JSON: {e}")
+            continue
+        
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        yield {name: value or None for name, value in zip(header, values)}
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" if e["loc"] else e["msg"]
+        for e in error.errors()
+    )
+
+
+class UserImporter:
+    """Imports user records chunk by chunk and builds the per-row report"""
+    
+    def __init__(self, db: AsyncSession, chunk_size: int):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.results: List[Dict[str, Any]] = []
+        self.created = 0
+        self._seen_emails: Set[str] = set()
+        self._seen_usernames: Set[str] = set()
+    
+    def _fail(self, row: int, error: str, email: Optional[str] = None) -> None:
+        self.results.append({"row": row, "status": "error", "email": email, "error": error})
+    
+    async def run(self, records: AsyncIterator[Any]) -> Dict[str, Any]:
+        """
+        Import every record of the upload
+        
+        Returns:
+            Counts and one result per row, in row order
+        """
+        chunk: List[Tuple[int, UserCreate]] = []
+        row = 0
+        
+        async for record in records:
+            row += 1
+            if isinstance(record, Exception):
+                self._fail(row, str(record))
+                continue
+            try:
+                chunk.append((row, UserCreate(**record)))
+            except (ValidationError, TypeError) as e:
+                message = _validation_message(e) if isinstance(e, ValidationError) else str(e)
+                email = record.get("email")
+                self._fail(row, message, email if isinstance(email, str) else None)
+                continue
+            
+            if len(chunk) >= self.chunk_size:
+                await self._import_chunk(chunk)
+                chunk = []
+        
+        if chunk:
+            await self._import_chunk(chunk)
+        
+        self.results.sort(key=lambda result: result["row"])
+        return {
+            "created": self.created,
+            "failed": len(self.results) - self.created,
+            "results": self.results
+        }
+    
+    async def _existing(self, column, values: Set[str]) -> Set[str]:
+        """Values of a unique column that are already taken, in one IN query"""
+        if not values:
+            return set()
+        result = await self.db.execute(select(column).where(column.in_(values)))
+        return set(result.scalars().all())
+    
+    async def _import_chunk(self, chunk: List[Tuple[int, UserCreate]]) -> None:
+        emails = {user.email for _, user in chunk}
+        usernames = {user.username for _, user in chunk if user.username}
+        taken_emails = await self._existing(User.email, emails)
+        taken_usernames = await self._existing(User.username, usernames)
+        
+        accepted: List[Tuple[int, UserCreate]] = []
+        for row, user in chunk:
+            if user.email in taken_emails or user.email in self._seen_emails:
+                self._fail(row, "Email already registered", user.email)
+            elif user.username and (user.username in taken_usernames or user.username in self._seen_usernames):
+                self._fail(row, "Username already taken", user.email)
+            else:
+                self._seen_emails.add(user.email)
+                if user.username:
+                    self._seen_usernames.add(user.username)
+                accepted.append((row, user))
+        
+        if not accepted:
+            return
+        
+        hashed = await hash_passwords_async([user.password for _, user in accepted])
+        values = [
+            {
+                "id": str(uuid.uuid4()),
+                "email": user.email,
+                "username": user.username,
+                "full_name": user.full_name,
+                "hashed_password": hashed_password,
+                "is_active": True,
+                "is_verified": False
+            }
+            for (_, user), hashed_password in zip(accepted, hashed)
+        ]
+        
+        try:
+            await self.db.execute(insert(User), values)
+            await self.db.commit()
+        except IntegrityError:
+            # A concurrent registration took a value; fall back to row by row
+            await self.db.rollback()
+            await self._insert_rows(accepted, values)
+            return
+        
+        for (row, user), value in zip(accepted, values):
+            self._created(row, user.email, value["id"])
+    
+    async def _insert_rows(self, accepted: List[Tuple[int, UserCreate]], values: List[Dict[str, Any]]) -> None:
+        for (row, user), value in zip(accepted, values):
+            try:
+                await self.db.execute(insert(User), [value])
+                await self.db.commit()
+            except IntegrityError:
+                await self.db.rollback()
+                self._fail(row, "Email or username already taken", user.email)
+                continue
+            self._created(row, user.email, value["id"])
+    
+    def _created(self, row: int, email: str, user_id: str) -> None:
+        self.created += 1
+        self.results.append({"row": row, "status": "created", "email": email, "id": user_id})
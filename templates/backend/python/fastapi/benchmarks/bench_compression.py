@@ -0,0 +1,84 @@
+"""
+Benchmark: CPU time vs bytes saved by each coding/level on user list payloads
+Run with: python -m benchmarks.bench_compression
+"""
+from datetime import datetime, timedelta
+import os
+import time
+import uuid
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("DATABASE_TYPE", "sqlite")
+
+from app.middleware.compression import BrotliEncoder, GzipEncoder, brotli  # noqa: E402
+from app.schemas import UserPage, UserResponse  # noqa: E402
+
+PAGE_SIZES = (10, 100, 1000)
+EXPORT_ROWS = 10000
+EXPORT_CHUNK_ROWS = 1000  # USER_EXPORT_FETCH_SIZE
+MIN_SECONDS = 0.5
+
+
+def make_user(i: int) -> UserResponse:
+    created_at = datetime(2024, 1, 1) + timedelta(minutes=i)
+    return UserResponse(
+        id=str(uuid.uuid4()),
+        email=f"user{i}@example.com",
+        username=f"user{i}",
+        full_name=f"User Number {i}",
+        is_active=True,
+        is_verified=i % 3 != 0,
+        is_superuser=False,
+        oauth_provider="google" if i % 5 == 0 else None,
+        created_at=created_at,
+        last_login=created_at + timedelta(hours=i % 48)
+    )
+
+
+def codings():
+    """(label, encoder factory) for every coding and level worth considering"""
+    variants = [(f"gzip -{level}", lambda level=level: GzipEncoder(level)) for level in (1, 6, 9)]
+    if brotli is not None:
+        variants += [(f"br q{quality}", lambda quality=quality: BrotliEncoder(quality)) for quality in (1, 4, 6, 11)]
+    return variants
+
+
+def measure(new_encoder, chunks) -> tuple:
+    """Compressed size and seconds per body, compressing chunk by chunk like the middleware"""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        encoder = new_encoder()
+        size = sum(len(encoder.compress(chunk, final=i == len(chunks) - 1)) for i, chunk in enumerate(chunks))
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return size, elapsed / runs
+
+
+def report(title: str, chunks) -> None:
+    raw = sum(len(chunk) for chunk in chunks)
+    print(f"\n{title}: {raw:,} bytes")
+    print(f"{'coding':<10} {'bytes':>10} {'ratio':>7} {'us/body':>10} {'MB/s':>8}")
+    for label, new_encoder in codings():
+        size, seconds = measure(new_encoder, chunks)
+        print(f"{label:<10} {size:>10,} {raw / size:>6.1f}x {seconds * 1e6:>10.0f} {raw / seconds / 1e6:>8.0f}")
+
+
+def main():
+    users = [make_user(i) for i in range(max(PAGE_SIZES + (EXPORT_ROWS,)))]
+    if brotli is None:
+        print("brotli is not installed, gzip only")
+    
+    for size in PAGE_SIZES:
+        body = UserPage(items=users[:size], next_cursor="cursor").model_dump_json().encode()
+        report(f"GET /api/users?limit={size}", [body])
+    
+    lines = [user.model_dump_json().encode() + b"\n" for user in users[:EXPORT_ROWS]]
+    chunks = [b"".join(lines[i:i + EXPORT_CHUNK_ROWS]) for i in range(0, EXPORT_ROWS, EXPORT_CHUNK_ROWS)]
+    report(f"GET /api/users/export, {EXPORT_ROWS} rows streamed in {len(chunks)} flushed chunks", chunks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: per-request cost of JSONResponse vs FastJSONResponse
+Run with: python -m benchmarks.bench_json_response
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import asyncio
+import os
+import time
+import uuid
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("DATABASE_TYPE", "sqlite")
+
+from fastapi import APIRouter, FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from httpx import AsyncClient  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.schemas import UserPage, UserResponse  # noqa: E402
+from app.utils.responses import FastJSONResponse, get_json_encoder  # noqa: E402
+
+REQUESTS = 2000
+PAGE_SIZE = 100
+
+
+def make_user(i: int) -> SimpleNamespace:
+    """Stand-in for an ORM row, including a column the schema drops"""
+    created_at = datetime(2024, 1, 1) + timedelta(minutes=i)
+    return SimpleNamespace(
+        id=str(uuid.uuid4()),
+        email=f"user{i}@example.com",
+        username=f"user{i}",
+        full_name=f"User {i}",
+        hashed_password="$2b$12$" + "x" * 53,
+        is_active=True,
+        is_verified=i % 2 == 0,
+        is_superuser=False,
+        oauth_provider=None,
+        created_at=created_at,
+        last_login=created_at + timedelta(days=1)
+    )
+
+
+USERS = [make_user(i) for i in range(PAGE_SIZE)]
+
+
+def make_app(response_class) -> FastAPI:
+    app = FastAPI(default_response_class=response_class)
+    router = APIRouter()
+    
+    @router.get("/me", response_model=UserResponse)
+    async def me():
+        return USERS[0]
+    
+    @router.get("/users", response_model=UserPage)
+    async def users():
+        return {"items": USERS, "next_cursor": "cursor"}
+    
+    @router.get("/health")
+    async def health():
+        return {"status": "healthy", "checked_at": datetime.utcnow()}
+    
+    app.include_router(router)
+    return app
+
+
+async def per_request(app: FastAPI, path: str) -> float:
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get(path)
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            await client.get(path)
+        return (time.perf_counter() - start) / REQUESTS
+
+
+async def main():
+    variants = [("JSONResponse", None)] + [(f"Fast ({name})", name) for name in ("json", "pydantic", "orjson")]
+    paths = ["/me", "/users", "/health"]
+    
+    print(f"{REQUESTS} requests per cell, /users returns {PAGE_SIZE} users; us/request")
+    print(f"{'response class':<20}" + "".join(f"{path:>16}" for path in paths))
+    baseline = {}
+    for label, encoder in variants:
+        if encoder is None:
+            app = make_app(JSONResponse)
+        else:
+            settings.JSON_ENCODER = encoder
+            get_json_encoder.cache_clear()
+            app = make_app(FastJSONResponse)
+        
+        cells = []
+        for path in paths:
+            cost = await per_request(app, path)
+            baseline.setdefault(path, cost)
+            cells.append(f"{cost * 1e6:7.1f} {cost / baseline[path]:3.2f}x")
+        print(f"{label:<20}" + "".join(f"{cell:>16}" for cell in cells))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
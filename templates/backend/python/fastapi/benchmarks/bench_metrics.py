@@ -0,0 +1,131 @@
+"""
+Benchmark: overhead of request, timer and SQL statement metrics, and scrape cost
+Run with: python -m benchmarks.bench_metrics
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("DATABASE_TYPE", "sqlite")
+
+from fastapi import FastAPI, Request  # noqa: E402
+from httpx import AsyncClient  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from app.database import instrument_engine  # noqa: E402
+from app.middleware.metrics import MetricsMiddleware  # noqa: E402
+from app.utils.metrics import (  # noqa: E402
+    MetricsDirectory,
+    Registry,
+    merge_collections,
+    registry,
+    render_prometheus
+)
+
+REQUESTS = 5000
+OBSERVATIONS = 1000000
+STATEMENTS = 20000
+WORKERS = 8
+
+
+def bare_app() -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/api/users/{user_id}")
+    async def get_user(request: Request, user_id: str):
+        return {"id": user_id}
+    
+    return app
+
+
+def metrics_app() -> FastAPI:
+    app = bare_app()
+    app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def run_requests(app: FastAPI) -> float:
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        for i in range(100):
+            await client.get(f"/api/users/{i}")
+        start = time.perf_counter()
+        for i in range(REQUESTS):
+            await client.get(f"/api/users/{i}")
+        return (time.perf_counter() - start) / REQUESTS
+
+
+def bench_observe() -> None:
+    histogram = Registry().histogram("bench_seconds", "Benchmark", labels=("route",))
+    child = histogram.labels("/api/users/{user_id}")
+    
+    start = time.perf_counter()
+    for _ in range(OBSERVATIONS):
+        child.observe(0.0042)
+    bound = (time.perf_counter() - start) / OBSERVATIONS
+    
+    start = time.perf_counter()
+    for _ in range(OBSERVATIONS):
+        histogram.labels("/api/users/{user_id}").observe(0.0042)
+    looked_up = (time.perf_counter() - start) / OBSERVATIONS
+    
+    print(f"\nHistogram.observe: {bound * 1e9:.0f} ns, with labels() lookup {looked_up * 1e9:.0f} ns")
+
+
+async def run_statements(instrumented: bool) -> float:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    if instrumented:
+        instrument_engine(engine, "primary")
+    
+    async with engine.connect() as connection:
+        for _ in range(100):
+            await connection.execute(text("SELECT 1"))
+        start = time.perf_counter()
+        for _ in range(STATEMENTS):
+            await connection.execute(text("SELECT 1"))
+        elapsed = (time.perf_counter() - start) / STATEMENTS
+    
+    await engine.dispose()
+    return elapsed
+
+
+def bench_scrape() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        metrics_directory = MetricsDirectory(directory)
+        start = time.perf_counter()
+        collection = metrics_directory.collect(registry)
+        collected = time.perf_counter() - start
+    
+    # Other workers' snapshots are the same size as ours
+    start = time.perf_counter()
+    body = render_prometheus(merge_collections([collection] * WORKERS))
+    merged = time.perf_counter() - start
+    
+    print(f"\nScrape: publish and collect {collected * 1e3:.2f} ms, merge and render {WORKERS} workers "
+          f"{merged * 1e3:.2f} ms, {len(body):,} bytes")
+
+
+async def main():
+    print(f"{REQUESTS} requests per variant")
+    baseline = None
+    for label, app in [("no metrics", bare_app()), ("MetricsMiddleware", metrics_app())]:
+        per_request = await run_requests(app)
+        baseline = baseline or per_request
+        print(f"{label:<18} {per_request * 1e6:8.1f} us/request  overhead {(per_request - baseline) * 1e6:+6.1f} us")
+    
+    bench_observe()
+    
+    print(f"\n{STATEMENTS} SELECT 1 on in-memory SQLite")
+    plain = await run_statements(instrumented=False)
+    timed = await run_statements(instrumented=True)
+    print(f"{'no listeners':<18} {plain * 1e6:8.1f} us/statement")
+    print(f"{'instrument_engine':<18} {timed * 1e6:8.1f} us/statement  overhead {(timed - plain) * 1e6:+6.1f} us")
+    
+    bench_scrape()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+Benchmark: OFFSET vs keyset pagination of the users listing at increasing depth
+Run with: python -m benchmarks.bench_pagination
+"""
+from datetime import datetime, timedelta, timezone
+import asyncio
+import os
+import time
+import uuid
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("DATABASE_TYPE", "sqlite")
+
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.models import User  # noqa: E402
+from app.routes.users import USER_PAGE_KEYS  # noqa: E402
+from app.utils.pagination import keyset_page  # noqa: E402
+
+USERS = 200000
+PAGE_SIZE = 100
+DEPTHS = [0, 1000, 10000, 50000, 100000, 199000]
+REPEAT = 20
+DB_PATH = "./benchmark_pagination.db"
+
+
+async def populate(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "email": f"user{i}@example.com",
+                "hashed_password": "x",
+                "created_at": start + timedelta(milliseconds=i // 2),
+            }
+            for i in range(USERS)
+        ]
+        for offset in range(0, USERS, 10000):
+            await conn.execute(insert(User), rows[offset:offset + 10000])
+
+
+async def timed(session: AsyncSession, stmt) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = await session.execute(stmt)
+        result.scalars().all()
+        session.expunge_all()
+    return (time.perf_counter() - start) / REPEAT
+
+
+async def main():
+    engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}")
+    print(f"Populating {USERS} users...")
+    await populate(engine)
+    
+    print(f"{'depth':>8} {'offset ms':>10} {'keyset ms':>10}")
+    async with AsyncSession(engine) as session:
+        for depth in DEPTHS:
+            # Key of the row just before the page, as a cursor would carry it
+            after = None
+            if depth:
+                result = await session.execute(
+                    select(*USER_PAGE_KEYS).order_by(*USER_PAGE_KEYS).offset(depth - 1).limit(1)
+                )
+                after = list(result.one())
+            
+            offset_stmt = keyset_page(select(User), USER_PAGE_KEYS, None, PAGE_SIZE).offset(depth)
+            keyset_stmt = keyset_page(select(User), USER_PAGE_KEYS, after, PAGE_SIZE)
+            
+            offset_ms = await timed(session, offset_stmt) * 1000
+            keyset_ms = await timed(session, keyset_stmt) * 1000
+            print(f"{depth:>8} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+    
+    await engine.dispose()
+    os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""
+Benchmark: event-loop latency of /api/health while logins are hashing passwords
+Run with: python -m benchmarks.bench_password_hashing
+"""
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("DATABASE_TYPE", "sqlite")
+
+from httpx import AsyncClient, ASGITransport  # noqa: E402
+
+from main import app  # noqa: E402
+from app.utils.security import (  # noqa: E402
+    hash_password,
+    verify_password,
+    verify_password_async,
+    shutdown_hash_executor
+)
+
+CONCURRENT_LOGINS = 32
+HEALTH_PROBES = 50
+
+
+async def _blocking_login(hashed: str):
+    """Simulate the old login path: bcrypt on the event loop"""
+    verify_password("Benchmark123", hashed)
+
+
+async def _pooled_login(hashed: str):
+    """Simulate the new login path: bcrypt in the hashing pool"""
+    await verify_password_async("Benchmark123", hashed)
+
+
+async def _probe_health(client: AsyncClient) -> list:
+    """Measure /api/health latency while logins are in flight"""
+    latencies = []
+    for _ in range(HEALTH_PROBES):
+        start = time.perf_counter()
+        await client.get("/api/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0)
+    return latencies
+
+
+async def run(label: str, login):
+    hashed = hash_password("Benchmark123")
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        logins = [asyncio.create_task(login(hashed)) for _ in range(CONCURRENT_LOGINS)]
+        latencies = await _probe_health(client)
+        await asyncio.gather(*logins)
+    
+    latencies.sort()
+    print(
+        f"{label:<10} /api/health p50={statistics.median(latencies):8.2f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:8.2f}ms "
+        f"max={latencies[-1]:8.2f}ms"
+    )
+
+
+async def main():
+    print(f"{CONCURRENT_LOGINS} concurrent logins, {HEALTH_PROBES} health probes")
+    await run("blocking", _blocking_login)
+    await run("pooled", _pooled_login)
+    shutdown_hash_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
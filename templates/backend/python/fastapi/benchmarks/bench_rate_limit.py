@@ -0,0 +1,83 @@
+"""
+Benchmark: per-request overhead of RateLimitMiddleware vs slowapi decorators
+Run with: python -m benchmarks.bench_rate_limit
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("DATABASE_TYPE", "sqlite")
+
+from fastapi import FastAPI, Request, Response  # noqa: E402
+from httpx import AsyncClient  # noqa: E402
+from slowapi import Limiter  # noqa: E402
+from slowapi.util import get_remote_address  # noqa: E402
+
+from app.middleware.rate_limit import RateLimitMiddleware, TokenBuckets  # noqa: E402
+from app.utils.shared_counters import SharedCounterTable  # noqa: E402
+
+REQUESTS = 5000
+RATE = "1000000/minute"
+
+
+def bare_app() -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/ping")
+    async def ping(request: Request):
+        return {"ok": True}
+    
+    return app
+
+
+def slowapi_app(storage_uri: str) -> FastAPI:
+    app = FastAPI()
+    limiter = Limiter(key_func=get_remote_address, storage_uri=storage_uri, headers_enabled=True)
+    app.state.limiter = limiter
+    
+    # headers_enabled injects X-RateLimit-* into the response parameter
+    @app.get("/ping")
+    @limiter.limit(RATE)
+    async def ping(request: Request, response: Response):
+        return {"ok": True}
+    
+    return app
+
+
+def middleware_app(path: str) -> FastAPI:
+    app = bare_app()
+    app.add_middleware(RateLimitMiddleware, limits={}, default=RATE, buckets=TokenBuckets(SharedCounterTable(path)))
+    return app
+
+
+async def run(app: FastAPI) -> float:
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get("/ping")
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            await client.get("/ping")
+        return (time.perf_counter() - start) / REQUESTS
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        apps = [
+            ("no limiter", bare_app()),
+            ("slowapi memory", slowapi_app("memory://")),
+            ("middleware", middleware_app(f"{directory}/buckets")),
+        ]
+        
+        baseline = None
+        print(f"{REQUESTS} requests per variant")
+        for label, app in apps:
+            per_request = await run(app)
+            baseline = baseline or per_request
+            print(f"{label:<16} {per_request * 1e6:8.1f} us/request  overhead {(per_request - baseline) * 1e6:+7.1f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
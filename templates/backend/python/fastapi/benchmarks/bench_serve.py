@@ -0,0 +1,105 @@
+"""
+Benchmark: throughput of the previous launcher (uvicorn.run, one process) vs app.serve
+Run with: python -m benchmarks.bench_serve
+"""
+from multiprocessing import Pool
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+CLIENT_PROCESSES = min(8, os.cpu_count() or 1)
+CONNECTIONS_PER_CLIENT = 16
+DURATION = 10.0
+PATH = "/api/health"
+
+PREVIOUS_LAUNCHER = "import uvicorn; uvicorn.run('main:app', host='127.0.0.1', port={port})"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port: int, directory: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark-secret-key-" + "x" * 32),
+        "DATABASE_URL": f"sqlite:///{directory}/benchmark.db",
+        "DATABASE_TYPE": "sqlite",
+        "DEBUG": "False",
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_PORT": str(port),
+        # Measure the server, not the rate limiter
+        "RATE_LIMIT_PER_MINUTE": "1000000000",
+        "RATE_LIMIT_BUCKETS_PATH": f"{directory}/buckets",
+    }
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}{PATH}").status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not start: {' '.join(command)}")
+
+
+async def _drive(url: str, duration: float) -> int:
+    limits = httpx.Limits(max_connections=CONNECTIONS_PER_CLIENT)
+    async with httpx.AsyncClient(limits=limits) as client:
+        deadline = time.monotonic() + duration
+        
+        async def connection() -> int:
+            done = 0
+            while time.monotonic() < deadline:
+                response = await client.get(url)
+                done += response.status_code == 200
+            return done
+        
+        return sum(await asyncio.gather(*(connection() for _ in range(CONNECTIONS_PER_CLIENT))))
+
+
+def drive(url: str) -> int:
+    return asyncio.run(_drive(url, DURATION))
+
+
+def measure(port: int) -> float:
+    url = f"http://127.0.0.1:{port}{PATH}"
+    asyncio.run(_drive(url, 1.0))  # Warm up every worker
+    with Pool(CLIENT_PROCESSES) as pool:
+        completed = sum(pool.map(drive, [url] * CLIENT_PROCESSES))
+    return completed / DURATION
+
+
+def main():
+    launchers = [
+        ("uvicorn.run (previous)", lambda port: [sys.executable, "-c", PREVIOUS_LAUNCHER.format(port=port)]),
+        ("python -m app.serve", lambda port: [sys.executable, "-m", "app.serve"]),
+    ]
+    
+    print(f"GET {PATH}: {CLIENT_PROCESSES} client processes x {CONNECTIONS_PER_CLIENT} connections, {DURATION:g}s each")
+    baseline = None
+    for label, command in launchers:
+        with tempfile.TemporaryDirectory() as directory:
+            port = free_port()
+            process = start_server(command(port), port, directory)
+            try:
+                throughput = measure(port)
+            finally:
+                process.terminate()
+                process.wait()
+        baseline = baseline or throughput
+        print(f"{label:<24} {throughput:10.0f} req/s  {throughput / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Benchmark: cached vs uncached access token verification
+Run with: python -m benchmarks.bench_token_cache
+"""
+import os
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("DATABASE_TYPE", "sqlite")
+
+from app.utils.security import create_access_token, decode_token, verify_token  # noqa: E402
+
+ITERATIONS = 50000
+
+
+def run(label: str, func, token: str):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func(token)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {ITERATIONS / elapsed:12,.0f} ops/s  {elapsed / ITERATIONS * 1e6:8.2f} us/op")
+
+
+def main():
+    token = create_access_token({"sub": "bench@example.com", "user_id": "bench-user"})
+    print(f"{ITERATIONS} verifications of one token")
+    run("uncached", verify_token, token)
+    run("cached", decode_token, token)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: bulk import vs one registration per user
+Run with: python -m benchmarks.bench_user_import
+"""
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("DATABASE_TYPE", "sqlite")
+os.environ.setdefault("BCRYPT_ROUNDS", "10")
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.routes.auth import register  # noqa: E402
+from app.schemas import UserCreate  # noqa: E402
+from app.utils.security import shutdown_hash_executor  # noqa: E402
+from app.utils.user_import import UserImporter, iter_records  # noqa: E402
+
+USERS = 500
+CHUNK_SIZE = 500
+DB_PATH = "./benchmark_import.db"
+
+
+def records(prefix: str):
+    return [
+        {"email": f"{prefix}{i}@example.com", "password": "Password123", "username": f"{prefix}{i}"}
+        for i in range(USERS)
+    ]
+
+
+async def per_request(engine) -> float:
+    start = time.perf_counter()
+    for record in records("register"):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await register(UserCreate(**record), db=session)
+    return time.perf_counter() - start
+
+
+async def bulk(engine) -> float:
+    body = "\n".join(json.dumps(record) for record in records("bulk")).encode()
+    
+    async def stream():
+        for i in range(0, len(body), 65536):
+            yield body[i:i + 65536]
+    
+    start = time.perf_counter()
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        report = await UserImporter(session, CHUNK_SIZE).run(iter_records(stream(), "ndjson"))
+    elapsed = time.perf_counter() - start
+    assert report["created"] == USERS, report["failed"]
+    return elapsed
+
+
+async def main():
+    engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    
+    print(f"{USERS} users, bcrypt rounds {os.environ['BCRYPT_ROUNDS']}, {os.cpu_count()} CPUs")
+    for label, func in [("per-request", per_request), ("bulk", bulk)]:
+        elapsed = await func(engine)
+        print(f"{label:<12} {USERS / elapsed:10,.1f} rows/s  {elapsed:8.2f} s")
+    
+    await engine.dispose()
+    shutdown_hash_executor()
+    os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,18 +2,38 @@
 FastAPI Application Entry Point
 Production-grade backend with authentication, rate limiting, and security best practices
 """
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 from contextlib import asynccontextmanager
 import logging
 
 from app.config import settings
-from app.database import init_db, close_db
+from app.database import init_db, close_db, get_pool_stats
+from app.utils.security import (
+    PasswordHashingBusyError,
+    calibrate_password_hashing,
+    get_password_hashing_params,
+    shutdown_hash_executor,
+    token_cache
+)
 from app.routes import auth, users
+from app.middleware.auth import get_current_superuser, principal_cache, verify_metrics_token
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.utils.outbox import email_dispatcher
+from app.utils.smtp_pool import init_email_pool, close_email_pool, smtp_pool
+from app.utils.email_templates import warm_email_templates
+from app.utils.last_login import last_login_buffer
+from app.utils.responses import FastJSONResponse
+from app.utils.metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    MetricsDirectory,
+    MetricsPublisher,
+    registry,
+    render_prometheus
+)
 
 # Configure logging
 logging.basicConfig(
@@ -22,8 +42,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Rate limiter
-limiter = Limiter(key_func=get_remote_address)
+# Each worker publishes its metrics to METRICS_DIR so any worker can answer a
+# scrape for all of them
+metrics_directory = MetricsDirectory(settings.METRICS_DIR) if settings.METRICS_DIR else None
+metrics_publisher = (
+    MetricsPublisher(registry, metrics_directory, settings.METRICS_PUBLISH_SECONDS)
+    if metrics_directory else None
+)
 
 
 @asynccontextmanager
@@ -38,15 +63,46 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to initialize database: {e}")
         raise
     
+    if settings.PASSWORD_HASH_CALIBRATE:
+        calibrate_password_hashing()
+    logger.info(f"Password hashing parameters: {get_password_hashing_params()}")
+    
+    warm_email_templates()
+    await init_email_pool()
+    email_dispatcher.start()
+    logger.info("Email dispatcher started")
+    last_login_buffer.start()
+    if settings.METRICS_ENABLED and metrics_publisher:
+        metrics_publisher.start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down FastAPI application...")
+    await email_dispatcher.stop()
+    logger.info("Email dispatcher stopped")
+    
+    # Flush buffered last login timestamps before the engine is disposed
+    await last_login_buffer.stop()
+    logger.info(f"Last login buffer flushed: {last_login_buffer.stats()}")
+    
     try:
         await close_db()
         logger.info("Database connections closed")
     except Exception as e:
         logger.error(f"Error closing database: {e}")
+    
+    try:
+        await close_email_pool()
+        logger.info("SMTP connections closed")
+    except Exception as e:
+        logger.error(f"Error closing SMTP connections: {e}")
+    
+    shutdown_hash_executor()
+    
+    # Last, so the final snapshot includes the shutdown work
+    if metrics_publisher:
+        await metrics_publisher.stop()
 
 
 # Create FastAPI app
@@ -56,12 +112,15 @@ app = FastAPI(
     version=settings.VERSION,
     docs_url="/docs" if settings.DEBUG else None,  # Disable docs in production
     redoc_url="/redoc" if settings.DEBUG else None,
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
-# Add rate limiting
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Response compression (innermost, so it sees the bodies produced by the routes)
+app.add_middleware(CompressionMiddleware)
+
+# Token-bucket rate limiting (added before CORS so 429 responses carry CORS headers)
+app.add_middleware(RateLimitMiddleware)
 
 # CORS Middleware
 app.add_middleware(
@@ -70,9 +129,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset"]
+    expose_headers=["X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset", "ETag", "Last-Modified"]
 )
 
+# Request metrics (outermost, so latency covers every other middleware and
+# requests they reject are counted)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+
+# Password hashing pool saturation handler
+@app.exception_handler(PasswordHashingBusyError)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusyError):
+    """Shed load when the password hashing queue is full"""
+    logger.warning(f"Password hashing queue full: {request.url.path}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"}
+    )
+
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -100,8 +176,7 @@ app.include_router(users.router, prefix="/api/users", tags=["Users"])
 
 # Health check endpoints
 @app.get("/", tags=["Root"])
-@limiter.limit(f"{settings.RATE_LIMIT_PER_MINUTE}/minute")
-async def root(request: Request):
+async def root():
     """Root endpoint"""
     return {
         "message": "FastAPI Backend is running",
@@ -111,8 +186,7 @@ async def root(request: Request):
 
 
 @app.get("/health", tags=["Health"])
-@limiter.limit(f"{settings.RATE_LIMIT_PER_MINUTE}/minute")
-async def health_check(request: Request):
+async def health_check():
     """Health check endpoint for load balancers and monitoring"""
     return {
         "status": "healthy",
@@ -126,11 +200,32 @@ async def api_health():
     return {"status": "ok"}
 
 
+@app.get("/api/health/db", tags=["Health"], dependencies=[Depends(get_current_superuser)])
+async def db_stats():
+    """SQL connection pool and write-behind counters for this worker (superuser only)"""
+    return {"pool": get_pool_stats(), "last_login": last_login_buffer.stats()}
+
+
+@app.get("/api/health/email", tags=["Health"], dependencies=[Depends(get_current_superuser)])
+async def email_stats():
+    """SMTP connection pool counters for this worker (superuser only)"""
+    return {"smtp_pool": smtp_pool.stats()}
+
+
+@app.get("/api/health/cache", tags=["Health"], dependencies=[Depends(get_current_superuser)])
+async def cache_stats():
+    """In-process cache counters for this worker (superuser only)"""
+    return {"principal": principal_cache.stats(), "token": token_cache.stats()}
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_metrics_token)])
+    async def metrics():
+        """Prometheus scrape endpoint, covering every worker on the host when METRICS_DIR is set"""
+        collection = metrics_directory.collect(registry) if metrics_directory else registry.collect()
+        return Response(render_prometheus(collection), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=settings.DEBUG
-    )
+    from app.serve import serve
+    serve(app)
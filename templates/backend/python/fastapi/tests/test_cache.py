@@ -0,0 +1,62 @@
+"""
+Tests for in-process caches
+Run with: pytest
+"""
+from app.utils.cache import TTLCache
+
+
+class FakeClock:
+    """Manually advanced clock"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_hit_and_miss():
+    """Test hit and miss counters"""
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_expiry():
+    """Test that entries expire after their TTL"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, timer=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+    
+    clock.now = 15
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_ttl_cache_lru_eviction():
+    """Test that the least recently used entry is evicted"""
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_invalidation():
+    """Test explicit invalidation"""
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.pop("a")
+    
+    assert cache.get("a") is None
+    assert len(cache) == 0
@@ -0,0 +1,154 @@
+"""
+Tests for the response compression middleware
+Run with: pytest
+"""
+import asyncio
+import gzip
+import zlib
+
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from httpx import AsyncClient
+import pytest
+
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware, select_encoding
+
+PAYLOAD = b'{"email":"user@example.com","is_active":true}' * 100
+
+
+def make_app(encodings=("gzip",)) -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/large")
+    async def large():
+        return Response(PAYLOAD, media_type="application/json", headers={"ETag": '"v1"'})
+    
+    @app.get("/small")
+    async def small():
+        return Response(b'{"ok":true}', media_type="application/json")
+    
+    @app.get("/image")
+    async def image():
+        return Response(PAYLOAD, media_type="image/png")
+    
+    @app.get("/encoded")
+    async def encoded():
+        return Response(gzip.compress(PAYLOAD), media_type="application/json", headers={"Content-Encoding": "gzip"})
+    
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(5):
+                yield PAYLOAD
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+    
+    app.add_middleware(CompressionMiddleware, encodings=list(encodings), minimum_size=1024, excluded_types=["image/"])
+    return app
+
+
+def test_select_encoding():
+    """Test that server preference applies among the codings the client accepts"""
+    assert select_encoding("gzip, deflate, br", ["br", "gzip"]) == "br"
+    assert select_encoding("gzip;q=0.5, br;q=0", ["br", "gzip"]) == "gzip"
+    assert select_encoding("*", ["gzip"]) == "gzip"
+    assert select_encoding("gzip;q=0, *", ["gzip"]) is None
+    assert select_encoding("identity", ["gzip"]) is None
+    assert select_encoding("", ["gzip"]) is None
+
+
+@pytest.mark.asyncio
+async def test_large_response_compressed():
+    """Test that large bodies are gzipped with updated length, Vary and a weak ETag"""
+    async with AsyncClient(app=make_app(), base_url="http://test") as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+    
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == 'W/"v1"'
+    assert int(response.headers["Content-Length"]) < len(PAYLOAD) / 10
+    assert response.content == PAYLOAD
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path, accept_encoding, content_encoding", [
+    ("/small", "gzip", None),
+    ("/image", "gzip", None),
+    ("/encoded", "gzip", "gzip"),  # Set by the route, not compressed again
+    ("/large", "identity", None),
+    ("/large", "gzip;q=0", None),
+])
+async def test_left_uncompressed(path, accept_encoding, content_encoding):
+    """Test that small, excluded, already encoded and unaccepted responses pass through"""
+    async with AsyncClient(app=make_app(), base_url="http://test") as client:
+        response = await client.get(path, headers={"Accept-Encoding": accept_encoding})
+    
+    assert response.headers.get("Content-Encoding") == content_encoding
+    assert "Vary" not in response.headers
+    assert response.content == (b'{"ok":true}' if path == "/small" else PAYLOAD)
+
+
+@pytest.mark.asyncio
+async def test_streaming_compressed_incrementally():
+    """Test that every streamed chunk is compressed and flushed as it arrives"""
+    app = make_app()
+    messages = []
+    requested = False
+    
+    async def receive():
+        # Hand over the request once, then wait like a client that stays connected
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+    
+    async def send(message):
+        messages.append(message)
+    
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/stream",
+        "raw_path": b"/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    
+    start = messages[0]
+    headers = dict(start["headers"])
+    bodies = [m["body"] for m in messages[1:] if m["type"] == "http.response.body"]
+    
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    # One compressed piece per chunk (each decodable so far), plus the end of the stream
+    assert len([body for body in bodies if body]) >= 5
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decompressor.decompress(bodies[0]) == PAYLOAD
+    assert gzip.decompress(b"".join(bodies)) == PAYLOAD * 5
+
+
+@pytest.mark.asyncio
+async def test_brotli_preferred():
+    """Test that brotli is used when installed and accepted"""
+    pytest.importorskip("brotli")
+    async with AsyncClient(app=make_app(encodings=("br", "gzip")), base_url="http://test") as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+    
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.content == PAYLOAD
+
+
+def test_brotli_dropped_when_missing(monkeypatch):
+    """Test that br is not offered without the brotli package"""
+    monkeypatch.setattr(compression, "brotli", None)
+    middleware = CompressionMiddleware(None, encodings=["br", "gzip"])
+    
+    assert middleware.encodings == ["gzip"]
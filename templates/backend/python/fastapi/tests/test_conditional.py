@@ -0,0 +1,169 @@
+"""
+Tests for conditional GET (ETag / Last-Modified) on the user profile endpoints
+Run with: pytest
+"""
+from datetime import timedelta
+from email.utils import format_datetime
+import time
+
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import pytest
+import pytest_asyncio
+
+from app.database import Base, get_read_db
+from app.middleware.auth import get_current_superuser, get_current_user
+from app.models import User
+from app.routes import auth, users
+from app.schemas import TokenData
+from app.utils.conditional import user_validators
+from app.utils.responses import FastJSONResponse
+
+REQUESTS = 200
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'conditional.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def user(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = User(
+            email="poll@example.com",
+            username="poll",
+            full_name="Polling User",
+            hashed_password="x",
+            is_verified=True
+        )
+        session.add(user)
+        await session.commit()
+    return user
+
+
+def make_app(engine, user) -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.include_router(auth.router, prefix="/api/auth")
+    app.include_router(users.router, prefix="/api/users")
+    
+    async def read_db():
+        async with AsyncSession(engine) as session:
+            yield session
+    
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_current_superuser] = lambda: TokenData(email="admin@example.com", user_id="admin")
+    app.dependency_overrides[get_read_db] = read_db
+    return app
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/api/auth/me", "/api/users/me", "/api/users/{id}"])
+async def test_if_none_match(engine, user, path):
+    """Test that a matching ETag gets an empty 304 and a stale one the full profile"""
+    url = path.format(id=user.id)
+    async with AsyncClient(app=make_app(engine, user), base_url="http://test") as client:
+        first = await client.get(url)
+        etag = first.headers["ETag"]
+        
+        assert first.status_code == 200
+        assert first.json()["email"] == "poll@example.com"
+        assert etag.startswith('W/"')
+        assert first.headers["Cache-Control"] == "private, no-cache"
+        
+        cached = await client.get(url, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["ETag"] == etag
+        
+        stale = await client.get(url, headers={"If-None-Match": 'W/"stale", "other"'})
+        assert stale.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_if_modified_since(engine, user):
+    """Test Last-Modified validation, and that If-None-Match takes precedence"""
+    async with AsyncClient(app=make_app(engine, user), base_url="http://test") as client:
+        last_modified = (await client.get("/api/users/me")).headers["Last-Modified"]
+        earlier = format_datetime(user_validators(user)[1] - timedelta(seconds=5), usegmt=True)
+        
+        current = await client.get("/api/users/me", headers={"If-Modified-Since": last_modified})
+        outdated = await client.get("/api/users/me", headers={"If-Modified-Since": earlier})
+        both = await client.get(
+            "/api/users/me",
+            headers={"If-Modified-Since": last_modified, "If-None-Match": 'W/"stale"'}
+        )
+        invalid = await client.get("/api/users/me", headers={"If-Modified-Since": "yesterday"})
+    
+    assert current.status_code == 304
+    assert outdated.status_code == 200
+    assert both.status_code == 200
+    assert invalid.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_etag_changes_on_write(engine, user):
+    """Test that any UPDATE of the row, including bulk ones, changes the ETag"""
+    etag, _ = user_validators(user)
+    
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await session.execute(update(User).where(User.id == user.id).values(full_name="Renamed"))
+        await session.commit()
+        updated = await session.get(User, user.id)
+    
+    assert updated.updated_at is not None
+    assert user_validators(updated)[0] != etag
+    
+    async with AsyncClient(app=make_app(engine, updated), base_url="http://test") as client:
+        response = await client.get("/api/users/me", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["full_name"] == "Renamed"
+
+
+@pytest.mark.asyncio
+async def test_polling_savings(engine, user, monkeypatch):
+    """Measure bytes and latency of polling /me with and without revalidation"""
+    serialized = 0
+    render = FastJSONResponse.render
+    
+    def counting_render(self, content):
+        nonlocal serialized
+        serialized += 1
+        return render(self, content)
+    
+    monkeypatch.setattr(FastJSONResponse, "render", counting_render)
+    
+    async with AsyncClient(app=make_app(engine, user), base_url="http://test") as client:
+        etag = (await client.get("/api/users/me")).headers["ETag"]
+        
+        async def poll(headers):
+            transferred = 0
+            start = time.perf_counter()
+            for _ in range(REQUESTS):
+                response = await client.get("/api/users/me", headers=headers)
+                transferred += len(response.content)
+            return transferred, (time.perf_counter() - start) / REQUESTS
+        
+        serialized = 0
+        full_bytes, full_latency = await poll({})
+        full_serialized = serialized
+        
+        serialized = 0
+        cached_bytes, cached_latency = await poll({"If-None-Match": etag})
+    
+    print(
+        f"\n{REQUESTS} polls of /api/users/me: "
+        f"200s {full_bytes} body bytes, {full_latency * 1e6:.0f} us/request; "
+        f"304s {cached_bytes} body bytes, {cached_latency * 1e6:.0f} us/request"
+    )
+    
+    assert full_serialized == REQUESTS
+    assert serialized == 0
+    assert cached_bytes == 0
+    assert full_bytes > REQUESTS * 100
@@ -0,0 +1,119 @@
+"""
+Tests for read replica routing and session write tracking
+Run with: pytest
+"""
+from types import SimpleNamespace
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import pytest
+
+from app import database
+from app.database import (
+    Base,
+    ReplicaPool,
+    RoutingSession,
+    get_db,
+    get_read_db,
+    has_pending_writes,
+    stream_session
+)
+from app.models import User
+
+
+def test_replica_pool_round_robin_and_ejection():
+    """Test that replicas rotate and ejected ones are skipped"""
+    pool = ReplicaPool(["replica-a", "replica-b", "replica-c"], eject_seconds=60)
+    
+    assert [pool.choose() for _ in range(4)] == [0, 1, 2, 0]
+    
+    pool.eject(1)
+    assert [pool.choose() for _ in range(3)] == [2, 0, 2]
+    assert pool.stats()["healthy"] == 2
+
+
+def test_replica_pool_all_ejected():
+    """Test that no replica is chosen when all are ejected"""
+    pool = ReplicaPool(["replica-a"], eject_seconds=60)
+    pool.eject(0)
+    
+    assert pool.choose() is None
+
+
+def test_routing_session_read_your_writes(tmp_path):
+    """Test that reads move to the primary after a commit in the same request"""
+    primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    request_state = SimpleNamespace()
+    session = RoutingSession(info={
+        "request_state": request_state,
+        "primary_engine": primary,
+        "read_engine": replica,
+        "replica_index": 0,
+    })
+    
+    assert session.get_bind() is replica.sync_engine
+    
+    request_state.read_your_writes = True
+    assert session.get_bind() is primary.sync_engine
+    assert session.info["replica_index"] is None
+
+
+@pytest.mark.asyncio
+async def test_has_pending_writes(tmp_path):
+    """Test that only sessions with uncommitted writes need the trailing commit"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'writes.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        assert not has_pending_writes(session)
+        
+        user = User(email="writes@example.com", hashed_password="x")
+        session.add(user)
+        assert has_pending_writes(session)
+        
+        await session.flush()
+        assert has_pending_writes(session)
+        
+        await session.commit()
+        assert not has_pending_writes(session)
+        
+        await session.execute(update(User).where(User.id == user.id).values(full_name="Writes"))
+        assert has_pending_writes(session)
+        
+        await session.rollback()
+        assert not has_pending_writes(session)
+    
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_session_savings_counted_per_request(tmp_path, monkeypatch):
+    """Test that skipped commits and autocommit reads are counted, but streamed reads are not"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'savings.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(engine, expire_on_commit=False))
+    monkeypatch.setattr(database, "primary_read_engine", engine.execution_options(isolation_level="AUTOCOMMIT"))
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database.replica_pool, "engines", [])
+    request = SimpleNamespace(state=SimpleNamespace(), method="GET", url=SimpleNamespace(path="/users"))
+    
+    async def run(dependency):
+        sessions = dependency(request)
+        session = await anext(sessions)
+        await session.execute(select(User))
+        with pytest.raises(StopAsyncIteration):
+            await anext(sessions)
+    
+    await run(get_db)
+    assert request.state.db_commits_skipped == 1
+    
+    await run(get_read_db)
+    assert request.state.db_round_trips_saved == 2
+    
+    async with stream_session(request) as session:
+        await session.execute(select(User))
+    assert "round_trips_saved" not in session.info
+    
+    await engine.dispose()
@@ -0,0 +1,133 @@
+"""
+Compatibility tests shared by every JWT codec
+Run with: pytest
+"""
+from datetime import datetime, timedelta
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.serialization import (
+    Encoding,
+    NoEncryption,
+    PrivateFormat,
+    PublicFormat
+)
+import pytest
+
+from app.config import settings
+from app.utils import jwt_codec
+from app.utils.jwt_codec import InvalidTokenError, JoseCodec, NativeCodec
+
+SECRET = "test-secret-key-" + "x" * 32
+
+
+def ed25519_keys():
+    """Generate a PEM encoded Ed25519 key pair"""
+    private_key = Ed25519PrivateKey.generate()
+    private_pem = private_key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption()).decode()
+    public_pem = private_key.public_key().public_bytes(Encoding.PEM, PublicFormat.SubjectPublicKeyInfo).decode()
+    return private_pem, public_pem
+
+
+PRIVATE_PEM, PUBLIC_PEM = ed25519_keys()
+
+# Codec class, algorithm, signing key, verifying key (python-jose has no EdDSA)
+CODECS = [
+    (JoseCodec, "HS256", SECRET, None),
+    (NativeCodec, "HS256", SECRET, None),
+    (NativeCodec, "EdDSA", PRIVATE_PEM, PUBLIC_PEM),
+]
+
+
+@pytest.fixture(params=CODECS, ids=lambda params: f"{params[0].__name__}-{params[1]}")
+def codec(request):
+    codec_class, algorithm, signing_key, verifying_key = request.param
+    return codec_class(algorithm, signing_key, verifying_key)
+
+
+def other_key_codec(codec):
+    """Codec of the same type and algorithm with an unrelated key"""
+    if codec.algorithm == "EdDSA":
+        return type(codec)("EdDSA", ed25519_keys()[0])
+    return type(codec)(codec.algorithm, "another-secret")
+
+
+def test_round_trip(codec):
+    """Test that claims survive encoding, with datetimes as timestamps"""
+    exp = datetime.utcnow() + timedelta(minutes=5)
+    payload = codec.decode(codec.encode({"sub": "test@example.com", "exp": exp, "type": "access"}))
+    
+    assert payload["sub"] == "test@example.com"
+    assert payload["type"] == "access"
+    assert isinstance(payload["exp"], int)
+
+
+def test_rejects_tampered_signature(codec):
+    """Test that a modified payload fails verification"""
+    token = codec.encode({"sub": "test@example.com"})
+    header, _, signature = token.split(".")
+    forged = codec.encode({"sub": "admin@example.com"}).split(".")[1]
+    
+    with pytest.raises(InvalidTokenError):
+        codec.decode(f"{header}.{forged}.{signature}")
+
+
+def test_rejects_expired(codec):
+    """Test that expired tokens are rejected"""
+    token = codec.encode({"sub": "test@example.com", "exp": datetime.utcnow() - timedelta(minutes=1)})
+    
+    with pytest.raises(InvalidTokenError):
+        codec.decode(token)
+
+
+def test_rejects_wrong_key(codec):
+    """Test that tokens signed with another key are rejected"""
+    token = other_key_codec(codec).encode({"sub": "test@example.com"})
+    
+    with pytest.raises(InvalidTokenError):
+        codec.decode(token)
+
+
+def test_rejects_malformed(codec):
+    """Test that garbage input raises InvalidTokenError"""
+    with pytest.raises(InvalidTokenError):
+        codec.decode("not.a-token")
+
+
+@pytest.mark.parametrize("encoder,decoder", [(JoseCodec, NativeCodec), (NativeCodec, JoseCodec)])
+def test_cross_compatible(encoder, decoder):
+    """Test that tokens issued by one codec are accepted by the other"""
+    token = encoder("HS256", SECRET).encode({"sub": "test@example.com", "user_id": "user-1"})
+    
+    assert decoder("HS256", SECRET).decode(token)["user_id"] == "user-1"
+
+
+def test_eddsa_public_key_derived_from_private_key():
+    """Test that a codec given only the private key verifies tokens of one given both"""
+    derived = NativeCodec("EdDSA", PRIVATE_PEM)
+    explicit = NativeCodec("EdDSA", PRIVATE_PEM, PUBLIC_PEM)
+    
+    assert derived.decode(explicit.encode({"sub": "test@example.com"}))["sub"] == "test@example.com"
+    assert explicit.decode(derived.encode({"sub": "test@example.com"}))["sub"] == "test@example.com"
+
+
+def test_eddsa_rejects_hmac_token():
+    """Test that an EdDSA codec refuses tokens with another algorithm in the header"""
+    token = NativeCodec("HS256", SECRET).encode({"sub": "test@example.com"})
+    
+    with pytest.raises(InvalidTokenError):
+        NativeCodec("EdDSA", PRIVATE_PEM).decode(token)
+
+
+def test_get_jwt_codec_eddsa_from_settings(monkeypatch):
+    """Test that JWT_PRIVATE_KEY alone configures the native EdDSA codec"""
+    monkeypatch.setattr(settings, "JWT_CODEC", "native")
+    monkeypatch.setattr(settings, "ALGORITHM", "EdDSA")
+    monkeypatch.setattr(settings, "JWT_PRIVATE_KEY", PRIVATE_PEM)
+    monkeypatch.setattr(settings, "JWT_PUBLIC_KEY", "")
+    jwt_codec.get_jwt_codec.cache_clear()
+    
+    try:
+        token = jwt_codec.get_jwt_codec().encode({"sub": "test@example.com"})
+    finally:
+        jwt_codec.get_jwt_codec.cache_clear()
+    
+    assert NativeCodec("EdDSA", PRIVATE_PEM, PUBLIC_PEM).decode(token)["sub"] == "test@example.com"
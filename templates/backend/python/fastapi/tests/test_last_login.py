@@ -0,0 +1,100 @@
+"""
+Tests for the last login write-behind buffer
+Run with: pytest
+"""
+from datetime import datetime, timedelta
+import asyncio
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import pytest
+
+from app.database import Base
+from app.models import User
+from app.utils.last_login import LastLoginBuffer
+
+
+@pytest.mark.asyncio
+async def test_logins_are_coalesced_into_one_update(tmp_path):
+    """Test that buffered logins are written with a single UPDATE, keeping the latest per user"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'logins.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    
+    async with session_factory() as session:
+        users = [User(email=f"login{i}@example.com", hashed_password="x") for i in range(3)]
+        session.add_all(users)
+        await session.commit()
+    
+    buffer = LastLoginBuffer(session_factory=session_factory, flush_interval=60, max_pending=100)
+    start = datetime(2024, 1, 1, 8, 0, 0)
+    for minute in range(10):
+        for user in users:
+            buffer.record(user.id, start + timedelta(minutes=minute))
+    buffer.record(users[0].id, start)  # Out-of-order login does not move it back
+    
+    statements = []
+    
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+    
+    assert await buffer.flush() == 3
+    assert statements == ["UPDATE"]
+    assert buffer.stats() == {"pending": 0, "recorded": 31, "flushed": 3, "flushes": 1}
+    
+    async with session_factory() as session:
+        result = await session.execute(select(User.last_login))
+        assert set(result.scalars().all()) == {start + timedelta(minutes=9)}
+    
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending(tmp_path):
+    """Test that stopping the buffer writes timestamps recorded since the last flush"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'logins.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    
+    async with session_factory() as session:
+        user = User(email="shutdown@example.com", hashed_password="x")
+        session.add(user)
+        await session.commit()
+    
+    buffer = LastLoginBuffer(session_factory=session_factory, flush_interval=3600)
+    buffer.start()
+    buffer.record(user.id)
+    await buffer.stop()
+    
+    async with session_factory() as session:
+        result = await session.execute(select(User.last_login).where(User.id == user.id))
+        assert result.scalar_one() is not None
+    
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_backs_off(tmp_path):
+    """Test that a full buffer does not retry on every login while the database is failing"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'logins.db'}")
+    buffer = LastLoginBuffer(
+        session_factory=async_sessionmaker(engine, expire_on_commit=False),
+        flush_interval=3600,
+        max_pending=2
+    )
+    buffer.start()
+    
+    buffer.record("user-1")
+    buffer.record("user-2")  # Full: wakes the loop, the flush fails
+    for _ in range(10):
+        await asyncio.sleep(0.01)
+    assert buffer.stats()["pending"] == 2
+    
+    for i in range(3, 20):
+        buffer.record(f"user-{i}")
+    assert not buffer._wakeup.is_set()
+    
+    buffer._task.cancel()
+    await engine.dispose()
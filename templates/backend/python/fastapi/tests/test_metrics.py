@@ -0,0 +1,249 @@
+"""
+Tests for the metrics registry, worker aggregation and request metrics
+Run with: pytest
+"""
+import json
+import os
+
+from fastapi import FastAPI, HTTPException
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import pytest
+import pytest_asyncio
+
+import main
+from app.config import settings
+from app.database import Base, db_execute_seconds, get_db, instrument_engine
+from app.middleware.auth import principal_cache
+from app.middleware.metrics import MetricsMiddleware, http_request_duration_seconds, http_requests_total
+from app.models import User
+from app.utils import email, security
+from app.utils.metrics import MetricsDirectory, Registry, merge_collections, render_prometheus
+from app.utils.smtp_pool import smtp_pool
+
+DEAD_PID = 999999999
+
+
+def make_registry() -> Registry:
+    registry = Registry()
+    registry.counter("jobs_total", "Jobs run", labels=("queue",)).labels("email").inc(3)
+    registry.gauge("jobs_running", "Jobs running").labels().set(2)
+    registry.histogram("job_seconds", "Job duration", buckets=(0.1, 1.0)).labels().observe(0.5)
+    return registry
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        if item_id == "missing":
+            raise HTTPException(status_code=404, detail="Not found")
+        return {"id": item_id}
+    
+    app.add_middleware(MetricsMiddleware)
+    return app
+
+
+def test_render_prometheus():
+    """Test the text exposition of counters, gauges and cumulative histogram buckets"""
+    body = render_prometheus(make_registry().collect())
+    
+    assert "# TYPE jobs_total counter" in body
+    assert 'jobs_total{queue="email"} 3' in body
+    assert "jobs_running 2" in body
+    assert 'job_seconds_bucket{le="0.1"} 0' in body
+    assert 'job_seconds_bucket{le="1.0"} 1' in body
+    assert 'job_seconds_bucket{le="+Inf"} 1' in body
+    assert "job_seconds_sum 0.5" in body
+    assert "job_seconds_count 1" in body
+
+
+def test_duplicate_metric_rejected():
+    """Test that a metric name can only be registered once"""
+    registry = make_registry()
+    
+    with pytest.raises(ValueError):
+        registry.counter("jobs_total", "Jobs run")
+
+
+def test_merge_collections():
+    """Test that worker collections are summed series by series"""
+    merged = merge_collections([make_registry().collect(), make_registry().collect()])
+    
+    assert merged["jobs_total"]["samples"] == [[["email"], 6]]
+    assert merged["jobs_running"]["samples"] == [[[], 4]]
+    histogram = merged["job_seconds"]["samples"][0][1]
+    assert histogram["count"] == 2
+    assert histogram["buckets"] == {"0.1": 0, "1.0": 2, "+Inf": 2}
+
+
+def test_directory_archives_exited_workers(tmp_path):
+    """Test that an exited worker's counters are kept and its gauges dropped"""
+    directory = MetricsDirectory(str(tmp_path))
+    with open(tmp_path / f"{DEAD_PID}.json", "w") as file:
+        json.dump(make_registry().collect(), file)
+    
+    collection = directory.collect(make_registry())
+    
+    assert collection["jobs_total"]["samples"] == [[["email"], 6]]
+    assert collection["jobs_running"]["samples"] == [[[], 2]]
+    assert not (tmp_path / f"{DEAD_PID}.json").exists()
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+    
+    # Archived totals survive later scrapes
+    collection = directory.collect(make_registry())
+    assert collection["jobs_total"]["samples"] == [[["email"], 6]]
+
+
+@pytest.mark.asyncio
+async def test_request_metrics_use_route_template():
+    """Test that requests are labelled by route template and counted by status"""
+    duration = http_request_duration_seconds.labels("GET", "/items/{item_id}")
+    ok = http_requests_total.labels("GET", "/items/{item_id}", "200")
+    not_found = http_requests_total.labels("GET", "/items/{item_id}", "404")
+    unmatched = http_requests_total.labels("GET", "unmatched", "404")
+    before = (duration.count, ok.value, not_found.value, unmatched.value)
+    
+    async with AsyncClient(app=make_app(), base_url="http://test") as client:
+        await client.get("/items/1")
+        await client.get("/items/2")
+        await client.get("/items/missing")
+        await client.get("/nowhere")
+    
+    after = (duration.count, ok.value, not_found.value, unmatched.value)
+    assert [a - b for a, b in zip(after, before)] == [3, 2, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_statement_timer():
+    """Test that SQL statements are timed by engine and statement type"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine, "primary")
+    selects = db_execute_seconds.labels("primary", "SELECT")
+    other = db_execute_seconds.labels("primary", "OTHER")
+    before = (selects.count, other.count)
+    
+    async with engine.connect() as connection:
+        await connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        await connection.execute(text("SELECT 1"))
+        await connection.execute(text("select x FROM t"))
+    await engine.dispose()
+    
+    assert (selects.count - before[0], other.count - before[1]) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_password_hash_timer():
+    """Test that hashing and verification are timed per password"""
+    hashes = security.password_hash_seconds.labels("hash")
+    verifies = security.password_hash_seconds.labels("verify")
+    before = (hashes.count, verifies.count)
+    
+    hashed = await security.hash_password_async("TestPass123")
+    await security.hash_passwords_async(["TestPass123", "OtherPass123"])
+    await security.verify_password_async("TestPass123", hashed)
+    
+    assert (hashes.count - before[0], verifies.count - before[1]) == (3, 1)
+    assert hashes.sum > 0
+
+
+def test_token_decode_timer():
+    """Test that decode_token is timed by token cache outcome"""
+    hits = security.token_decode_seconds.labels("hit")
+    misses = security.token_decode_seconds.labels("miss")
+    before = (hits.count, misses.count)
+    token = security.create_access_token({"sub": "timer@example.com", "user_id": "timer"})
+    
+    security.decode_token(token)
+    security.decode_token(token)
+    security.decode_token(token)
+    
+    assert (hits.count - before[0], misses.count - before[1]) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_email_send_timer(monkeypatch):
+    """Test that SMTP sends are timed by outcome"""
+    sent = email.email_send_seconds.labels("sent")
+    failed = email.email_send_seconds.labels("failed")
+    before = (sent.count, failed.count)
+    outcomes = [None, OSError("connection refused")]
+    
+    async def send(message):
+        outcome = outcomes.pop(0)
+        if outcome is not None:
+            raise outcome
+    
+    monkeypatch.setattr(settings, "SMTP_REQUIRE_AUTH", False)
+    monkeypatch.setattr(smtp_pool, "send", send)
+    await email.send_email("timer@example.com", "Subject", "<p>Body</p>")
+    with pytest.raises(OSError):
+        await email.send_email("timer@example.com", "Subject", "<p>Body</p>")
+    
+    assert (sent.count - before[0], failed.count - before[1]) == (1, 1)
+
+
+@pytest_asyncio.fixture
+async def metrics_client(tmp_path, monkeypatch):
+    """Client for the application's /metrics route, with users in a temporary database"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'metrics.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    async def db():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+    
+    monkeypatch.setattr(main, "metrics_directory", None)
+    main.app.dependency_overrides[get_db] = db
+    principal_cache.clear()
+    async with AsyncClient(app=main.app, base_url="http://test") as client:
+        client.engine = engine
+        yield client
+    main.app.dependency_overrides.pop(get_db)
+    principal_cache.clear()
+    await engine.dispose()
+
+
+async def _user_token(engine, email: str, is_superuser: bool) -> str:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = User(email=email, hashed_password="x", is_superuser=is_superuser)
+        session.add(user)
+        await session.commit()
+    return security.create_access_token(security.build_token_data(user))
+
+
+@pytest.mark.asyncio
+async def test_metrics_route_requires_token(metrics_client, monkeypatch):
+    """Test that /metrics answers only the configured METRICS_TOKEN"""
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    
+    missing = await metrics_client.get("/metrics")
+    wrong = await metrics_client.get("/metrics", headers={"Authorization": "Bearer wrong"})
+    scrape = await metrics_client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    
+    assert missing.status_code == 401
+    assert wrong.status_code == 401
+    assert scrape.status_code == 200
+    assert scrape.headers["content-type"].startswith("text/plain")
+    assert "# TYPE http_requests_total counter" in scrape.text
+    assert 'http_requests_total{method="GET",route="/metrics",status="401"}' in scrape.text
+
+
+@pytest.mark.asyncio
+async def test_metrics_route_without_token_requires_superuser(metrics_client, monkeypatch):
+    """Test that an empty METRICS_TOKEN does not leave /metrics open"""
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    user = await _user_token(metrics_client.engine, "user@example.com", is_superuser=False)
+    admin = await _user_token(metrics_client.engine, "admin@example.com", is_superuser=True)
+    
+    anonymous = await metrics_client.get("/metrics")
+    regular = await metrics_client.get("/metrics", headers={"Authorization": f"Bearer {user}"})
+    superuser = await metrics_client.get("/metrics", headers={"Authorization": f"Bearer {admin}"})
+    
+    assert anonymous.status_code == 401
+    assert regular.status_code == 403
+    assert superuser.status_code == 200
+    assert "# TYPE password_hash_seconds histogram" in superuser.text
@@ -0,0 +1,170 @@
+"""
+Tests for email templates and the outbox dispatcher against a local SMTP stand-in
+Run with: pytest
+"""
+from datetime import datetime
+import json
+import socket
+import pytest
+import pytest_asyncio
+from aiosmtpd.controller import Controller
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models import EmailOutbox
+from app.utils.outbox import EmailDispatcher, enqueue_email
+from app.utils.smtp_pool import smtp_pool
+from app.utils.email_templates import render_email_template
+
+
+class RecordingHandler:
+    """SMTP handler that keeps every received message"""
+    
+    def __init__(self):
+        self.messages = []
+    
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    port = _free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", port)
+    monkeypatch.setattr(settings, "SMTP_USER", "")
+    monkeypatch.setattr(settings, "SMTP_PASSWORD", "")
+    monkeypatch.setattr(settings, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_REQUIRE_AUTH", False)
+    yield handler
+    controller.stop()
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def close_smtp_pool():
+    """Drop pooled connections so each test connects to its own server"""
+    yield
+    await smtp_pool.close()
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'outbox.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _queue(session_factory, template="verification"):
+    async with session_factory() as session:
+        message = enqueue_email(session, "test@example.com", template, {"token": "abc"})
+        await session.commit()
+        return message.id
+
+
+async def _load(session_factory, message_id):
+    async with session_factory() as session:
+        result = await session.execute(select(EmailOutbox).where(EmailOutbox.id == message_id))
+        return result.scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_dispatch_delivers_over_pooled_connection(smtp_server, session_factory):
+    """Test that queued emails are delivered once, marked sent and share a connection"""
+    message_id = await _queue(session_factory)
+    dispatcher = EmailDispatcher(session_factory=session_factory)
+    
+    assert await dispatcher.dispatch_once() == 1
+    assert await dispatcher.dispatch_once() == 0
+    
+    # A second message reuses the pooled connection
+    await _queue(session_factory)
+    opened = smtp_pool.connections_opened
+    assert await dispatcher.dispatch_once() == 1
+    assert smtp_pool.connections_opened == opened
+    
+    message = await _load(session_factory, message_id)
+    assert message.status == "sent"
+    assert message.payload == "{}"
+    assert len(smtp_server.messages) == 2
+    assert smtp_server.messages[0].rcpt_tos == ["test@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_dispatch_retries_then_dead_letters(monkeypatch, session_factory):
+    """Test backoff after a failure and dead-lettering after max attempts"""
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", 1)  # Nothing listens here
+    monkeypatch.setattr(settings, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_REQUIRE_AUTH", False)
+    message_id = await _queue(session_factory)
+    dispatcher = EmailDispatcher(session_factory=session_factory, max_attempts=2, backoff=60)
+    
+    await dispatcher.dispatch_once()
+    message = await _load(session_factory, message_id)
+    assert message.status == "pending"
+    assert message.attempts == 1
+    assert message.next_attempt_at > datetime.utcnow()
+    
+    # Not due yet
+    assert await dispatcher.dispatch_once() == 0
+    
+    async with session_factory() as session:
+        stored = await session.get(EmailOutbox, message_id)
+        stored.next_attempt_at = datetime.utcnow()
+        await session.commit()
+    
+    await dispatcher.dispatch_once()
+    message = await _load(session_factory, message_id)
+    assert message.status == "dead"
+    assert message.last_error
+
+
+@pytest.mark.asyncio
+async def test_dispatch_keeps_messages_without_smtp_credentials(monkeypatch, session_factory):
+    """Test that a message is retried, not marked sent, when credentials are missing"""
+    monkeypatch.setattr(settings, "SMTP_REQUIRE_AUTH", True)
+    monkeypatch.setattr(settings, "SMTP_USER", "")
+    message_id = await _queue(session_factory)
+    dispatcher = EmailDispatcher(session_factory=session_factory, backoff=60)
+    
+    assert await dispatcher.dispatch_once() == 1
+    message = await _load(session_factory, message_id)
+    assert message.status == "pending"
+    assert "credentials" in message.last_error
+    assert json.loads(message.payload) == {"token": "abc"}
+
+
+@pytest.mark.asyncio
+async def test_dispatch_claims_whole_batch(smtp_server, session_factory):
+    """Test that one dispatch leases and delivers every due message in the batch"""
+    for _ in range(3):
+        await _queue(session_factory)
+    dispatcher = EmailDispatcher(session_factory=session_factory, batch_size=2)
+    
+    assert await dispatcher.dispatch_once() == 2
+    assert await dispatcher.dispatch_once() == 1
+    assert await dispatcher.dispatch_once() == 0
+    assert len(smtp_server.messages) == 3
+
+
+def test_email_templates_render_html_and_text():
+    """Test that both variants render and HTML is autoescaped"""
+    html_content, text_content = render_email_template("verification", verification_url="https://x/?a=1&b=2")
+    
+    assert "Verify Your Email Address" in html_content
+    assert "https://x/?a=1&amp;b=2" in html_content
+    assert "https://x/?a=1&b=2" in text_content
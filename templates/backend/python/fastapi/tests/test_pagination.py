@@ -0,0 +1,70 @@
+"""
+Tests for keyset pagination
+Run with: pytest
+"""
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import pytest
+
+from app.database import Base
+from app.models import User
+from app.routes.users import USER_PAGE_KEYS
+from app.utils.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_page, page_cursor
+
+KEY_NAMES = [key.key for key in USER_PAGE_KEYS]
+
+
+def test_cursor_round_trip():
+    """Test that cursors decode back to the encoded key values"""
+    created_at = datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+    cursor = encode_cursor([created_at, "user-id"])
+    
+    assert "=" not in cursor
+    assert decode_cursor(cursor, datetime_positions=(0,)) == [created_at, "user-id"]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(["not-a-date", "id"]), encode_cursor([])])
+def test_invalid_cursor(cursor):
+    """Test that malformed cursors are rejected"""
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, datetime_positions=(0,))
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_are_complete_and_stable(tmp_path):
+    """Test that paging visits every user once, including ties and concurrent inserts"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pages.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    async with AsyncSession(engine) as session:
+        # Groups of three users share a creation time
+        session.add_all([
+            User(email=f"user{i}@example.com", hashed_password="x", created_at=start + timedelta(seconds=i // 3))
+            for i in range(25)
+        ])
+        await session.commit()
+    
+    seen = []
+    after = None
+    async with AsyncSession(engine) as session:
+        while True:
+            result = await session.execute(keyset_page(select(User), USER_PAGE_KEYS, after, 4))
+            page, cursor = page_cursor(result.scalars().all(), KEY_NAMES, 4)
+            seen.extend(user.email for user in page)
+            
+            if len(seen) == 8:
+                # Rows created before the cursor must not shift later pages
+                session.add(User(email="early@example.com", hashed_password="x", created_at=start - timedelta(days=1)))
+                await session.commit()
+            
+            if cursor is None:
+                break
+            after = decode_cursor(cursor, datetime_positions=(0,))
+    
+    assert len(seen) == 25
+    assert set(seen) == {f"user{i}@example.com" for i in range(25)}
+    
+    await engine.dispose()
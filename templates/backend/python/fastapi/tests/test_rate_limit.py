@@ -0,0 +1,98 @@
+"""
+Tests for the token-bucket rate limiting middleware
+Run with: pytest
+"""
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+import pytest
+
+from app.middleware.rate_limit import RateLimitMiddleware, TokenBuckets, parse_rate
+from app.utils.security import create_access_token
+from app.utils.shared_counters import LocalCounterTable
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/api/auth/login")
+    async def login():
+        return {"ok": True}
+    
+    @app.get("/other")
+    async def other():
+        return {"ok": True}
+    
+    app.add_middleware(
+        RateLimitMiddleware,
+        limits={"/api/auth/login": "2/minute"},
+        default="100/minute",
+        buckets=TokenBuckets(LocalCounterTable())
+    )
+    return app
+
+
+def test_parse_rate():
+    """Test rate strings with and without a period multiple"""
+    assert parse_rate("10/minute") == (10, 60)
+    assert parse_rate("100/5minutes") == (100, 300)
+    with pytest.raises(ValueError):
+        parse_rate("ten per minute")
+
+
+def test_bucket_refills_over_time():
+    """Test that tokens are taken and refilled at capacity/period"""
+    buckets = TokenBuckets(LocalCounterTable())
+    
+    assert buckets.take("key", 2, 60, now=0) == (True, 1)
+    assert buckets.take("key", 2, 60, now=0) == (True, 0)
+    assert buckets.take("key", 2, 60, now=1)[0] is False
+    assert buckets.take("key", 2, 60, now=31)[0] is True
+
+
+@pytest.mark.asyncio
+async def test_route_limit_and_headers():
+    """Test that a route limit is enforced per client with X-RateLimit headers"""
+    async with AsyncClient(app=make_app(), base_url="http://test") as client:
+        responses = [await client.get("/api/auth/login") for _ in range(3)]
+        
+        assert [r.status_code for r in responses] == [200, 200, 429]
+        assert responses[0].headers["X-RateLimit-Limit"] == "2"
+        assert responses[1].headers["X-RateLimit-Remaining"] == "0"
+        assert int(responses[2].headers["Retry-After"]) > 0
+        
+        # Other routes have their own bucket
+        assert (await client.get("/other")).status_code == 200
+
+
+def _bearer(user_id: str) -> dict:
+    token = create_access_token({"sub": f"{user_id}@example.com", "user_id": user_id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+async def test_ip_and_user_buckets():
+    """Test that a request needs a token from both its IP and its user bucket"""
+    app = make_app()
+    first_ip = AsyncClient(transport=ASGITransport(app=app, client=("10.0.0.1", 1000)), base_url="http://test")
+    second_ip = AsyncClient(transport=ASGITransport(app=app, client=("10.0.0.2", 1000)), base_url="http://test")
+    
+    async with first_ip, second_ip:
+        # New tokens do not reset the IP bucket
+        assert (await first_ip.get("/api/auth/login", headers=_bearer("alice"))).status_code == 200
+        assert (await first_ip.get("/api/auth/login", headers=_bearer("bob"))).status_code == 200
+        assert (await first_ip.get("/api/auth/login", headers=_bearer("carol"))).status_code == 429
+        
+        # New addresses do not reset the user bucket
+        assert (await second_ip.get("/api/auth/login", headers=_bearer("alice"))).status_code == 200
+        response = await second_ip.get("/api/auth/login", headers=_bearer("alice"))
+        assert response.status_code == 429
+        
+        assert response.headers["X-RateLimit-Remaining"] == "0"
+
+
+def test_polled_me_has_its_own_limit():
+    """Test that polling /api/auth/me does not use up the other auth routes"""
+    middleware = RateLimitMiddleware(FastAPI(), buckets=TokenBuckets(LocalCounterTable()))
+    
+    assert middleware._route("/api/auth/me") == ("/api/auth/me", 120, 60)
+    assert middleware._route("/api/auth/refresh") == ("/api/auth", 30, 60)
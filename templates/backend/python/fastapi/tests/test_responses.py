@@ -0,0 +1,114 @@
+"""
+Tests for the fast JSON response class
+Run with: pytest
+"""
+from datetime import datetime
+from types import SimpleNamespace
+import json
+import uuid
+
+from fastapi import APIRouter, FastAPI
+from httpx import AsyncClient
+import pytest
+
+from app.config import settings
+from app.schemas import UserResponse
+from app.utils import responses
+from app.utils.responses import FastJSONResponse, get_json_encoder
+
+
+@pytest.fixture(params=["orjson", "pydantic", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(settings, "JSON_ENCODER", request.param)
+    get_json_encoder.cache_clear()
+    yield request.param
+    get_json_encoder.cache_clear()
+
+
+def make_user() -> SimpleNamespace:
+    return SimpleNamespace(
+        id="user-1",
+        email="user@example.com",
+        username="user",
+        full_name=None,
+        hashed_password="secret-hash",
+        is_active=True,
+        is_verified=False,
+        is_superuser=False,
+        oauth_provider=None,
+        created_at=datetime(2024, 1, 2, 3, 4, 5),
+        last_login=None
+    )
+
+
+def make_app() -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse)
+    router = APIRouter()
+    user = make_user()
+    
+    @router.get("/me", response_model=UserResponse)
+    async def me():
+        return user
+    
+    @router.get("/me/partial", response_model=UserResponse, response_model_exclude_none=True)
+    async def me_partial():
+        return user
+    
+    @router.get("/plain")
+    async def plain():
+        return {"id": uuid.UUID(int=1), "at": datetime(2024, 1, 2), "ok": True}
+    
+    app.include_router(router)
+    return app
+
+
+def test_encoders_agree_with_stdlib(encoder):
+    """Test that every encoder produces the same document as the stdlib encoder"""
+    content = {"name": "Zoë", "count": 3, "ratio": 0.5, "tags": ["a", "b"], "none": None}
+    
+    assert json.loads(FastJSONResponse(content).body) == content
+
+
+def test_unknown_encoder(monkeypatch):
+    """Test that an unknown JSON_ENCODER is rejected"""
+    monkeypatch.setattr(settings, "JSON_ENCODER", "yaml")
+    get_json_encoder.cache_clear()
+    try:
+        with pytest.raises(ValueError):
+            get_json_encoder()
+    finally:
+        get_json_encoder.cache_clear()
+
+
+def test_orjson_falls_back_to_pydantic(monkeypatch):
+    """Test that the orjson setting works without orjson installed"""
+    monkeypatch.setattr(settings, "JSON_ENCODER", "orjson")
+    monkeypatch.setattr(responses, "orjson", None)
+    get_json_encoder.cache_clear()
+    try:
+        assert json.loads(FastJSONResponse({"a": 1}).body) == {"a": 1}
+    finally:
+        get_json_encoder.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_response_model_encoded(encoder):
+    """Test that response models are filtered and serialized like the default JSONResponse"""
+    app = make_app()
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/me")
+        partial = await client.get("/me/partial")
+        plain = await client.get("/plain")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    body = response.json()
+    assert "hashed_password" not in body
+    assert body["created_at"] == "2024-01-02T03:04:05"
+    assert body == UserResponse.model_validate(make_user()).model_dump(mode="json")
+    
+    assert "last_login" not in partial.json()
+    assert plain.json() == {"id": str(uuid.UUID(int=1)), "at": "2024-01-02T00:00:00", "ok": True}
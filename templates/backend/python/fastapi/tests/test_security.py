@@ -0,0 +1,248 @@
+"""
+Tests for password hashing and token utilities
+Run with: pytest
+"""
+import asyncio
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.config import settings
+from app.database import Base
+from app.middleware.auth import get_current_principal, get_current_user, principal_cache, revoke_tokens
+from app.models import User
+from app.routes.users import change_password
+from app.schemas import ChangePassword
+from app.utils import security
+from app.utils.security import (
+    hash_password_async,
+    verify_password_async,
+    PasswordHashingBusyError
+)
+
+
+@pytest.mark.asyncio
+async def test_async_hash_and_verify():
+    """Test hashing and verification through the hashing pool"""
+    hashed = await hash_password_async("TestPass123")
+    assert await verify_password_async("TestPass123", hashed)
+    assert not await verify_password_async("WrongPass123", hashed)
+
+
+@pytest.mark.asyncio
+async def test_hash_queue_full(monkeypatch):
+    """Test that hashing is rejected once the queue is full"""
+    monkeypatch.setattr(settings, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_QUEUE_SIZE", 0)
+    
+    first = asyncio.create_task(hash_password_async("TestPass123"))
+    await asyncio.sleep(0)
+    
+    with pytest.raises(PasswordHashingBusyError):
+        await hash_password_async("TestPass123")
+    
+    await first
+    assert security._hash_pending == 0
+
+
+def test_calibration_picks_bounded_rounds(monkeypatch):
+    """Test that calibration stays within bounds and flags old hashes"""
+    monkeypatch.setattr(settings, "PASSWORD_HASH_SCHEME", "bcrypt")
+    old_params = security.get_password_hashing_params()
+    old_hash = security.pwd_context.handler("bcrypt").using(
+        rounds=security.BCRYPT_MIN_ROUNDS - 1
+    ).hash("TestPass123")
+    
+    try:
+        report = security.calibrate_password_hashing(target_ms=1)
+        assert report["bcrypt__rounds"] == security.BCRYPT_MIN_ROUNDS
+        assert report["measured_ms"] > 0
+        assert security.password_needs_rehash(old_hash)
+        assert security.verify_password("TestPass123", old_hash)
+    finally:
+        old_params.pop("scheme")
+        security.configure_password_hashing(old_params)
+
+
+def test_token_claims_round_trip(monkeypatch):
+    """Test that authorization claims and token version survive encoding"""
+    monkeypatch.setattr(settings, "AUTH_TOKEN_CLAIMS", True)
+    user = SimpleNamespace(
+        id="user-1",
+        email="test@example.com",
+        is_active=True,
+        is_verified=False,
+        is_superuser=True,
+        token_version=3
+    )
+    
+    payload = security.decode_token(security.create_access_token(security.build_token_data(user)))
+    
+    assert payload["ver"] == 3
+    assert payload["is_superuser"] is True
+    assert payload["is_verified"] is False
+
+
+def test_token_cache_positive_and_negative():
+    """Test that valid and invalid tokens are served from the token cache"""
+    security.token_cache.clear()
+    token = security.create_access_token({"sub": "test@example.com", "user_id": "user-1"})
+    
+    first = security.decode_token(token)
+    second = security.decode_token(token)
+    assert first == second
+    assert security.token_cache.stats()["hits"] >= 1
+    
+    hits = security.token_cache.hits
+    assert security.decode_token("not-a-token") is None
+    assert security.decode_token("not-a-token") is None
+    assert security.token_cache.hits == hits + 1
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'auth.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    principal_cache.clear()
+    yield engine
+    principal_cache.clear()
+    await engine.dispose()
+
+
+async def _create_user(engine, **values) -> User:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = User(email="claims@example.com", hashed_password=security.hash_password("TestPass123"), **values)
+        session.add(user)
+        await session.commit()
+        return user
+
+
+def _bearer(user: User) -> HTTPAuthorizationCredentials:
+    token = security.create_access_token(security.build_token_data(user))
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def _count_queries(engine):
+    statements = []
+    
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_stateless_principal_answered_from_claims(monkeypatch, engine):
+    """Test that stateless mode skips the database once the token version is cached"""
+    monkeypatch.setattr(settings, "AUTH_MODE", "stateless")
+    user = await _create_user(engine, is_superuser=True)
+    credentials = _bearer(user)
+    
+    async with AsyncSession(engine) as db:
+        await get_current_principal(credentials, db)  # Caches the token version
+    
+    statements = _count_queries(engine)
+    async with AsyncSession(engine) as db:
+        principal = await get_current_principal(credentials, db)
+    
+    assert statements == []
+    assert principal.user_id == user.id
+    assert principal.is_superuser is True
+    assert principal.is_verified is False
+
+
+@pytest.mark.asyncio
+async def test_token_version_bump_revokes_access_token(engine):
+    """Test that changing the password rejects access tokens issued before it"""
+    user = await _create_user(engine)
+    credentials = _bearer(user)
+    
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        current_user = await get_current_user(credentials, db)
+        await change_password(
+            ChangePassword(current_password="TestPass123", new_password="NewPass1234"),
+            current_user=current_user,
+            db=db
+        )
+    
+    async with AsyncSession(engine) as db:
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_principal(credentials, db)
+    
+    assert exc_info.value.status_code == 401
+    assert exc_info.value.detail == "Token has been revoked"
+
+
+@pytest.mark.asyncio
+async def test_tokens_without_claims_use_database(monkeypatch, engine):
+    """Test that tokens issued with AUTH_TOKEN_CLAIMS disabled read the flags from the user row"""
+    monkeypatch.setattr(settings, "AUTH_TOKEN_CLAIMS", False)
+    user = await _create_user(engine, is_verified=True)
+    credentials = _bearer(user)
+    assert "is_superuser" not in security.decode_token(credentials.credentials)
+    
+    monkeypatch.setattr(settings, "AUTH_MODE", "stateless")
+    statements = _count_queries(engine)
+    async with AsyncSession(engine) as db:
+        principal = await get_current_principal(credentials, db)
+    
+    assert len(statements) == 1
+    assert principal.is_verified is True
+    assert principal.is_superuser is False
+
+
+async def _bump_elsewhere(engine, user: User) -> None:
+    """Bump the token version the way another worker would, leaving this worker's cache stale"""
+    async with AsyncSession(engine) as session:
+        await session.execute(update(User).where(User.id == user.id).values(token_version=User.token_version + 1))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("auth_mode", ["database", "stateless"])
+async def test_newer_token_reloads_stale_principal(monkeypatch, engine, auth_mode):
+    """Test that a token issued after another worker bumped the version is accepted"""
+    monkeypatch.setattr(settings, "AUTH_MODE", auth_mode)
+    user = await _create_user(engine)
+    old_credentials = _bearer(user)
+    
+    async with AsyncSession(engine) as db:
+        await get_current_principal(old_credentials, db)  # Caches version 0
+    
+    await _bump_elsewhere(engine, user)
+    user.token_version = 1
+    
+    async with AsyncSession(engine) as db:
+        principal = await get_current_principal(_bearer(user), db)
+    assert principal.user_id == user.id
+    
+    # The reload refreshed the cache, so the old token is now rejected
+    async with AsyncSession(engine) as db:
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_principal(old_credentials, db)
+    assert exc_info.value.detail == "Token has been revoked"
+
+
+@pytest.mark.asyncio
+async def test_token_version_bumped_in_sql(engine):
+    """Test that revoking from a stale snapshot still moves the version forward"""
+    user = await _create_user(engine)
+    
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        current_user = await get_current_user(_bearer(user), db)  # Caches version 0
+    
+    await _bump_elsewhere(engine, user)
+    
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        current_user = await get_current_user(_bearer(user), db)  # Stale, version 0
+        revoke_tokens(current_user)
+        await db.commit()
+    
+    async with AsyncSession(engine) as session:
+        assert (await session.get(User, user.id)).token_version == 2
@@ -0,0 +1,53 @@
+"""
+Tests for the counters shared by worker processes
+Run with: pytest
+"""
+import multiprocessing
+
+from app.utils.shared_counters import SharedCounterTable
+
+WORKERS = 4
+HITS_PER_WORKER = 100
+
+
+def _add(value: float, stamp: float, found: bool):
+    return value + 1, stamp
+
+
+def _hit(path: str) -> None:
+    """Worker process: increment one shared counter"""
+    table = SharedCounterTable(path, slots=64)
+    for _ in range(HITS_PER_WORKER):
+        table.update("client", _add)
+
+
+def test_update_get_delete(tmp_path):
+    """Test updating, reading, deleting and clearing keys"""
+    table = SharedCounterTable(str(tmp_path / "counters"), slots=64)
+    
+    assert table.slots == 64
+    assert table.get("key") is None
+    assert table.update("key", lambda value, stamp, found: (5, 1.0)) == (5, 1.0)
+    assert table.update("key", _add) == (6, 1.0)
+    assert table.get("key") == (6, 1.0)
+    
+    table.delete("key")
+    assert table.get("key") is None
+    
+    table.update("a", _add)
+    table.update("b", _add)
+    assert table.clear() == 2
+
+
+def test_updates_are_atomic_across_processes(tmp_path):
+    """Test that worker processes share one counter and lose no increments"""
+    path = str(tmp_path / "counters")
+    context = multiprocessing.get_context("spawn")
+    
+    workers = [context.Process(target=_hit, args=(path,)) for _ in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+    
+    assert SharedCounterTable(path, slots=64).get("client")[0] == WORKERS * HITS_PER_WORKER
@@ -0,0 +1,105 @@
+"""
+Tests for the batch user lookup
+Run with: pytest
+"""
+from fastapi import FastAPI
+from httpx import AsyncClient
+from pydantic import ValidationError
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import pytest
+import pytest_asyncio
+
+from app.config import settings
+from app.database import Base, get_read_db
+from app.middleware.auth import get_current_principal
+from app.models import User
+from app.routes import users
+from app.schemas import TokenData, UserBatchRequest
+
+
+def test_batch_ids_are_deduplicated_in_order():
+    """Test that repeated ids are looked up once, keeping their order"""
+    batch = UserBatchRequest(ids=["b", "a", "b", "c", "a"])
+    
+    assert batch.ids == ["b", "a", "c"]
+
+
+@pytest.mark.parametrize("count", [0, settings.USER_BATCH_MAX_IDS + 1])
+def test_batch_size_is_limited(count):
+    """Test that empty and oversized batches are rejected"""
+    with pytest.raises(ValidationError):
+        UserBatchRequest(ids=[f"id-{i}" for i in range(count)])
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'batch.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        session.add_all([User(id=f"user-{i}", email=f"batch{i}@example.com", hashed_password="x") for i in range(3)])
+        await session.commit()
+    yield engine
+    await engine.dispose()
+
+
+def make_app(engine, is_superuser=True) -> FastAPI:
+    app = FastAPI()
+    app.include_router(users.router, prefix="/api/users")
+    
+    async def read_db():
+        async with AsyncSession(engine) as session:
+            yield session
+    
+    # get_current_superuser itself still runs on top of this principal
+    app.dependency_overrides[get_current_principal] = lambda: TokenData(
+        email="admin@example.com", user_id="admin", is_active=True, is_superuser=is_superuser
+    )
+    app.dependency_overrides[get_read_db] = read_db
+    return app
+
+
+def record_statements(engine):
+    """Collect every SQL statement sent to the database"""
+    statements = []
+    
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_single_query(engine):
+    """Test that the endpoint answers with one IN query, users keyed by id and the missing ids"""
+    statements = record_statements(engine)
+    
+    async with AsyncClient(app=make_app(engine), base_url="http://test") as client:
+        response = await client.post("/api/users/batch", json={"ids": ["user-2", "nope", "user-0", "user-2"]})
+    
+    assert response.status_code == 200
+    body = response.json()
+    assert sorted(body["users"]) == ["user-0", "user-2"]
+    assert body["users"]["user-2"]["email"] == "batch2@example.com"
+    assert body["missing"] == ["nope"]
+    assert len(statements) == 1
+    assert " IN " in statements[0]
+
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_guards(engine):
+    """Test that non-superusers get 403 and oversized batches 422, without querying"""
+    statements = record_statements(engine)
+    
+    async with AsyncClient(app=make_app(engine, is_superuser=False), base_url="http://test") as client:
+        response = await client.post("/api/users/batch", json={"ids": ["user-0"]})
+    assert response.status_code == 403
+    
+    ids = [f"user-{i}" for i in range(settings.USER_BATCH_MAX_IDS + 1)]
+    async with AsyncClient(app=make_app(engine), base_url="http://test") as client:
+        response = await client.post("/api/users/batch", json={"ids": ids})
+    assert response.status_code == 422
+    
+    assert statements == []
@@ -0,0 +1,95 @@
+"""
+Tests for the bulk user import
+Run with: pytest
+"""
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import json
+import pytest
+
+from app.database import Base
+from app.models import User
+from app.utils.security import verify_password
+from app.utils.user_import import UserImporter, iter_lines, iter_records
+
+
+async def _stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_across_chunks():
+    """Test that lines and multi-byte characters split across chunks are reassembled"""
+    body = "first\r\nsecönd\nlast".encode()
+    chunks = [body[i:i + 3] for i in range(0, len(body), 3)]
+    
+    assert [line async for line in iter_lines(_stream(*chunks))] == ["first", "secönd", "last"]
+
+
+@pytest.mark.asyncio
+async def test_import_report(tmp_path):
+    """Test that valid rows are created and every other row is reported"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'import.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    records = [
+        {"email": "new1@example.com", "password": "Password123", "username": "new1"},
+        {"email": "existing@example.com", "password": "Password123"},
+        {"email": "new2@example.com", "password": "weak"},
+        {"email": "new1@example.com", "password": "Password123"},
+        {"email": "new3@example.com", "password": "Password123", "username": "new1"},
+        {"email": "new4@example.com", "password": "Password123", "full_name": "New Four"},
+    ]
+    body = "\n".join(json.dumps(record) for record in records) + "\nnot json\n"
+    
+    async with AsyncSession(engine) as session:
+        session.add(User(email="existing@example.com", hashed_password="x"))
+        await session.commit()
+        
+        importer = UserImporter(session, chunk_size=2)
+        report = await importer.run(iter_records(_stream(body.encode()), "ndjson"))
+        
+        statuses = [(result["row"], result["status"]) for result in report["results"]]
+        assert statuses == [
+            (1, "created"), (2, "error"), (3, "error"), (4, "error"), (5, "error"), (6, "created"), (7, "error")
+        ]
+        assert report["created"] == 2
+        assert report["failed"] == 5
+        assert report["results"][1]["error"] == "Email already registered"
+        assert report["results"][4]["error"] == "Username already taken"
+        
+        result = await session.execute(select(func.count()).select_from(User))
+        assert result.scalar_one() == 3
+        
+        result = await session.execute(select(User).where(User.email == "new4@example.com"))
+        user = result.scalar_one()
+        assert user.full_name == "New Four"
+        assert verify_password("Password123", user.hashed_password)
+    
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_invalid_utf8_fails_only_its_row():
+    """Test that an undecodable line is reported as an error record instead of aborting the import"""
+    body = b'{"email": "a@example.com"}\n{"email": "\xff@example.com"}\n{"email": "b@example.com"}\n'
+    
+    records = [record async for record in iter_records(_stream(body[:20], body[20:]), "ndjson")]
+    
+    assert records[0] == {"email": "a@example.com"}
+    assert isinstance(records[1], ValueError)
+    assert "Invalid UTF-8" in str(records[1])
+    assert records[2] == {"email": "b@example.com"}
+
+
+@pytest.mark.asyncio
+async def test_import_csv_records():
+    """Test that CSV uploads are parsed by header and empty cells become None"""
+    body = b"email,password,username\na@example.com,Password123,\nbroken\n"
+    
+    records = [record async for record in iter_records(_stream(body), "csv")]
+    
+    assert records[0] == {"email": "a@example.com", "password": "Password123", "username": None}
+    assert isinstance(records[1], ValueError)
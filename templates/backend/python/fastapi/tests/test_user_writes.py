@@ -0,0 +1,104 @@
+"""
+Tests for constraint-driven uniqueness on user writes
+Run with: pytest
+"""
+from fastapi import HTTPException
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import pytest
+import pytest_asyncio
+
+from app.database import Base
+from app.models import User
+from app.routes.auth import register
+from app.routes.users import update_current_user
+from app.schemas import UserCreate, UserUpdate
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'writes.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+def record_statements(engine):
+    """Collect every SQL statement sent to the database"""
+    statements = []
+    
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+    
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_register_round_trips(engine):
+    """Test that registering sends only the INSERTs (was SELECT, SELECT, INSERT, INSERT, SELECT)"""
+    statements = record_statements(engine)
+    
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = await register(
+            UserCreate(email="writes@example.com", username="writes", password="Password123"),
+            db=session
+        )
+    
+    assert statements == ["INSERT", "INSERT"]  # users, email_outbox
+    assert user.id and user.created_at is not None
+    assert user.is_verified is False
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("email, username, detail", [
+    ("taken@example.com", "other", "Email already registered"),
+    ("other@example.com", "taken", "Username already taken"),
+])
+async def test_register_duplicate(engine, email, username, detail):
+    """Test that unique violations keep the existing 400 messages"""
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add(User(email="taken@example.com", username="taken", hashed_password="x"))
+        await session.commit()
+        
+        with pytest.raises(HTTPException) as exc_info:
+            await register(UserCreate(email=email, username=username, password="Password123"), db=session)
+    
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == detail
+
+
+@pytest.mark.asyncio
+async def test_update_round_trips(engine):
+    """Test that a profile update sends one UPDATE (was SELECT, SELECT, UPDATE, SELECT)"""
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add_all([
+            User(email="me@example.com", username="me", hashed_password="x"),
+            User(email="taken@example.com", username="taken", hashed_password="x"),
+        ])
+        await session.commit()
+        
+        result = await session.execute(select(User).where(User.email == "me@example.com"))
+        current_user = result.scalar_one()
+        statements = record_statements(engine)
+        
+        updated = await update_current_user(
+            UserUpdate(username="me2", full_name="Me"),
+            current_user=current_user,
+            db=session
+        )
+        
+        assert statements == ["UPDATE"]
+        assert updated.username == "me2"
+        assert updated.updated_at is not None
+        
+        # An email change also revokes tokens; the SELECT reads back the version the database computed
+        statements.clear()
+        updated = await update_current_user(UserUpdate(email="me2@example.com"), current_user=updated, db=session)
+        assert statements == ["UPDATE", "SELECT"]
+        assert updated.token_version == 1
+        
+        with pytest.raises(HTTPException) as exc_info:
+            await update_current_user(UserUpdate(username="taken"), current_user=updated, db=session)
+        assert exc_info.value.detail == "Username already taken"